@@ -0,0 +1,257 @@
+"""Chunked, concurrent PostgREST writes with retry and bisection on failure."""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import httpx
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+logger = logging.getLogger(__name__)
+
+# PostgREST / Kong reject very large bodies; stay well under the limit.
+DEFAULT_MAX_ROWS = 500
+DEFAULT_MAX_BYTES = 512 * 1024
+DEFAULT_MAX_WORKERS = 4
+
+# Retries apply to whole chunks and only to transient errors. Only row-level
+# rejections (SQLSTATE class 22 data exception / 23 integrity violation) are
+# bisected, with each half tried once: isolating k bad rows in an n-row chunk
+# costs up to ~2*k*log2(n) requests, and up to 2n - 1 if every row is bad.
+# Transport errors, 5xx and auth failures fail the whole chunk instead.
+CHUNK_RETRIES = 1
+RETRY_BACKOFF_SECONDS = 0.5
+
+_ROW_ERROR_CODE = re.compile(r"^2[23][0-9A-Z]{3}$")
+# Server-reported SQLSTATE classes whose statement was rolled back, so a resend
+# can't duplicate rows: connection exception, transaction rollback (deadlock,
+# serialization), insufficient resources, operator intervention (statement timeout).
+_TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+# Raised before the request reached the server; always safe to resend.
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass
+class BatchResult:
+    table: str
+    rows_written: int = 0
+    rows_failed: int = 0
+    chunks: int = 0
+    requests: int = 0
+    latency_ms: float = 0.0
+    returned: list[dict] = field(default_factory=list)
+    failed_rows: list[dict] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+    def as_stats(self) -> dict:
+        return {
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "chunks": self.chunks,
+            "requests": self.requests,
+            "latency_ms": round(self.latency_ms, 1),
+        }
+
+
+def row_size_bytes(row: dict) -> int:
+    """Approximate JSON payload size of a single row."""
+    return len(json.dumps(row, default=str, separators=(",", ":")).encode("utf-8")) + 1
+
+
+def align_columns(rows: list[dict]) -> list[dict]:
+    """Give every row the union of keys so each chunk sends the same `columns`.
+
+    postgrest-py derives the `columns` param from the keys of the list it is given;
+    without this a chunk that happens to lack a key would leave that column untouched
+    where the unchunked request would have written NULL.
+    """
+    keys: list[str] = []
+    seen: set[str] = set()
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+    return [{key: row.get(key) for key in keys} for row in rows]
+
+
+def chunk_rows(
+    rows: list[dict],
+    max_rows: int = DEFAULT_MAX_ROWS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> list[list[dict]]:
+    """Split rows into contiguous chunks bounded by row count and payload bytes."""
+    chunks: list[list[dict]] = []
+    current: list[dict] = []
+    current_bytes = 2  # "[]"
+    for row in rows:
+        size = row_size_bytes(row)
+        if current and (len(current) >= max_rows or current_bytes + size > max_bytes):
+            chunks.append(current)
+            current = []
+            current_bytes = 2
+        current.append(row)
+        current_bytes += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _build_query(sb, table, chunk, *, upsert, on_conflict, returning):
+    method = ReturnMethod.representation if returning else ReturnMethod.minimal
+    if upsert:
+        query = sb.table(table).upsert(chunk, on_conflict=on_conflict or "", returning=method)
+    else:
+        query = sb.table(table).insert(chunk, returning=method)
+    if returning and returning != "*":
+        # The insert/upsert builders have no .select(); PostgREST honours ?select=
+        # on a representation response, so trim the payload to the needed columns.
+        columns = ",".join(c.strip() for c in returning.split(",") if c.strip())
+        query.request.params = query.request.params.add("select", columns)
+    return query
+
+
+@dataclass
+class _ChunkOutcome:
+    returned: list[dict] = field(default_factory=list)
+    written: int = 0
+    failed_rows: list[dict] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    requests: int = 0
+
+
+def is_row_error(error: Exception) -> bool:
+    """True for a PostgREST rejection caused by the row data (SQLSTATE 22xxx/23xxx)."""
+    return isinstance(error, APIError) and bool(_ROW_ERROR_CODE.match(str(error.code or "")))
+
+
+def _is_retryable(error: Exception, idempotent: bool) -> bool:
+    """Whether resending the chunk is safe and may succeed.
+
+    Timeouts, dropped connections and gateway 5xx are ambiguous: the write may
+    already have committed, so only idempotent writes (upserts) are resent.
+    """
+    if isinstance(error, _NOT_SENT_ERRORS):
+        return True
+    if isinstance(error, APIError):
+        code = error.code
+        if isinstance(code, int):  # non-JSON response, e.g. a 502/504 from the gateway
+            return idempotent and code >= 500
+        return str(code or "")[:2] in _TRANSIENT_SQLSTATE_CLASSES
+    return idempotent and isinstance(error, httpx.TransportError)
+
+
+def _fail_chunk(outcome, chunk, error, run_id, table) -> _ChunkOutcome:
+    if len(chunk) == 1:
+        logger.error(f"[{run_id}] {table}: row rejected: {error}")
+    else:
+        logger.error(f"[{run_id}] {table}: chunk of {len(chunk)} rows failed: {error}")
+    outcome.failed_rows.extend(chunk)
+    outcome.errors.append(str(error))
+    return outcome
+
+
+def _write_chunk(execute, chunk, retries, run_id, table, idempotent) -> _ChunkOutcome:
+    outcome = _ChunkOutcome()
+    last_error = None
+    for attempt in range(retries + 1):
+        outcome.requests += 1
+        try:
+            data = execute(chunk)
+            outcome.returned.extend(data)
+            outcome.written += len(chunk)
+            return outcome
+        except Exception as e:
+            last_error = e
+            if is_row_error(e) or not _is_retryable(e, idempotent):
+                break
+            if attempt < retries:
+                time.sleep(RETRY_BACKOFF_SECONDS * (attempt + 1))
+
+    if len(chunk) == 1 or not is_row_error(last_error):
+        return _fail_chunk(outcome, chunk, last_error, run_id, table)
+
+    mid = len(chunk) // 2
+    for half in (chunk[:mid], chunk[mid:]):
+        sub = _write_chunk(execute, half, 0, run_id, table, idempotent)
+        outcome.returned.extend(sub.returned)
+        outcome.written += sub.written
+        outcome.failed_rows.extend(sub.failed_rows)
+        outcome.errors.extend(sub.errors)
+        outcome.requests += sub.requests
+    return outcome
+
+
+def write_rows(
+    sb,
+    table: str,
+    rows: list[dict],
+    *,
+    upsert: bool = False,
+    on_conflict: str | None = None,
+    returning: str | None = None,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    retries: int = CHUNK_RETRIES,
+    run_id: str | None = None,
+) -> BatchResult:
+    """
+    Insert or upsert rows in size-bounded chunks, issuing chunks concurrently.
+
+    A chunk rejected for its row data is bisected until the offending rows are
+    isolated, so good rows are still written. Transient errors are retried
+    (plain inserts only when the request can't have reached the server); any
+    other failure fails the whole chunk. `returning` is None (minimal response), "*" or a
+    column list; returned rows come back in input order. Never raises.
+    """
+    result = BatchResult(table=table)
+    if not rows:
+        return result
+
+    chunks = chunk_rows(align_columns(rows), max_rows=max_rows, max_bytes=max_bytes)
+    result.chunks = len(chunks)
+
+    def execute(chunk):
+        query = _build_query(
+            sb, table, chunk, upsert=upsert, on_conflict=on_conflict, returning=returning
+        )
+        resp = query.execute()
+        return (resp.data or []) if returning else []
+
+    def run(chunk):
+        return _write_chunk(execute, chunk, retries, run_id, table, idempotent=upsert)
+
+    started = time.perf_counter()
+    if len(chunks) == 1 or max_workers <= 1:
+        outcomes = [run(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            outcomes = list(pool.map(run, chunks))
+    result.latency_ms = (time.perf_counter() - started) * 1000
+
+    for outcome in outcomes:
+        result.returned.extend(outcome.returned)
+        result.rows_written += outcome.written
+        result.failed_rows.extend(outcome.failed_rows)
+        result.errors.extend(outcome.errors)
+        result.requests += outcome.requests
+    result.rows_failed = len(result.failed_rows)
+    return result
+
+
+def merge_write_stats(stats: dict, result: BatchResult) -> dict:
+    """Accumulate a BatchResult into a {table: counters} dict (for run_log)."""
+    entry = stats.setdefault(
+        result.table,
+        {"rows_written": 0, "rows_failed": 0, "chunks": 0, "requests": 0, "latency_ms": 0.0},
+    )
+    for key, value in result.as_stats().items():
+        entry[key] = round(entry[key] + value, 1) if key == "latency_ms" else entry[key] + value
+    return stats
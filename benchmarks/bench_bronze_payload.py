@@ -0,0 +1,101 @@
+"""
+Bytes sent per run for Bronze persistence: full upsert vs. delta upsert + touch.
+
+Offline: builds a synthetic scraped catalogue, applies a change rate, and sizes
+the PostgREST requests each strategy would send (bodies plus IN-filter URLs).
+
+Usage:
+  python benchmarks/bench_bronze_payload.py
+  python benchmarks/bench_bronze_payload.py --items 20000 --change-rate 0.005
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from urllib.parse import quote
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from batch_writer import align_columns, chunk_rows  # noqa: E402
+from lambda_function import LINK_LOOKUP_CHUNK_SIZE, TOUCH_CHUNK_SIZE  # noqa: E402
+
+
+def synthetic_items(count, rng):
+    stores = [
+        "Broken Binding - To The Stars",
+        "Broken Binding - Dragon's Hoard",
+        "Folio Society - Sci-Fi & Fantasy",
+    ]
+    items = []
+    for i in range(count):
+        price = f"${rng.randint(30, 400)}.00"
+        items.append({
+            "name": f"Synthetic Title {i}; Books 1-3 - TBB Press Edition",
+            "price": price,
+            "store": rng.choice(stores),
+            "link": f"https://thebrokenbindingsub.com/products/synthetic-title-{i}-tbb-press-edition",
+            "in_stock": rng.random() < 0.4,
+            "author": f"Author {i % 500}",
+            "typed_price_cents": int(price.strip("$").replace(".", "")),
+        })
+    return items
+
+
+def body_bytes(rows):
+    return sum(
+        len(json.dumps(chunk, separators=(",", ":")).encode("utf-8"))
+        for chunk in chunk_rows(align_columns(rows))
+    ) if rows else 0
+
+
+def in_filter_url_bytes(links):
+    total = 0
+    for start in range(0, len(links), LINK_LOOKUP_CHUNK_SIZE):
+        chunk = links[start:start + LINK_LOOKUP_CHUNK_SIZE]
+        total += len("select=id,link&link=in.(" + ",".join(quote(link, safe="") for link in chunk) + ")")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--change-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = synthetic_items(args.items, rng)
+    changed = [i for i in items if rng.random() < args.change_rate]
+    changed_links = {i["link"] for i in changed}
+    unchanged_ids = [n for n, i in enumerate(items, 1) if i["link"] not in changed_links]
+
+    # Before: every row upserted, then an IN lookup over every link for IDs.
+    before_body = body_bytes(items)
+    before_url = in_filter_url_bytes([i["link"] for i in items])
+    before_requests = len(chunk_rows(items)) + -(-len(items) // LINK_LOOKUP_CHUNK_SIZE)
+
+    # After: only changed rows upserted (IDs returned), unchanged IDs touched via RPC.
+    after_body = body_bytes([{**i, "last_seen_at": "2026-01-01T00:00:00+00:00"} for i in changed])
+    touch_bodies = [
+        json.dumps({"p_item_ids": unchanged_ids[s:s + TOUCH_CHUNK_SIZE]}, separators=(",", ":"))
+        for s in range(0, len(unchanged_ids), TOUCH_CHUNK_SIZE)
+    ]
+    after_touch = sum(len(b.encode("utf-8")) for b in touch_bodies)
+    after_requests = (len(chunk_rows(changed)) if changed else 0) + len(touch_bodies)
+
+    before_total = before_body + before_url
+    after_total = after_body + after_touch
+    print(f"items={len(items)} changed={len(changed)} ({args.change_rate:.2%})")
+    print(f"before: {before_total:>10,} bytes  ({before_body:,} upsert body + {before_url:,} IN-filter URL), "
+          f"{before_requests} requests")
+    print(f"after:  {after_total:>10,} bytes  ({after_body:,} upsert body + {after_touch:,} touch body), "
+          f"{after_requests} requests")
+    if after_total:
+        print(f"reduction: {before_total / after_total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Scraper throughput against the local fixture server (no live site traffic).
+
+Runs broken_binding_checks and folio_society_checks, each in a fresh child
+process so peak RSS is per scraper, with every scraper session redirected to
+benchmarks/fixture_server. Reports products/sec, requests per product, TCP
+connections, p50/p95 fetch latency and peak RSS.
+
+--backends picks the scraper HTTP backend(s) (http_client.open_session):
+`requests` is served over HTTP/1.1 by FixtureServer, `http2` over h2c by
+H2FixtureServer, with the same fixtures and fault injection.
+
+Pacing comes from rate_limiter's per-host adaptive window; its retry/Retry-After
+sleeps are multiplied by --sleep-scale (default 0, so injected 429s cost a
+retry but no wall-clock wait).
+
+Fixtures, in order of preference:
+  --fixtures DIR       a recorded set (see `record` below) or any saved set
+  (default)            a synthetic set generated into a temp dir
+
+Usage:
+  python benchmarks/bench_scrapers.py
+  python benchmarks/bench_scrapers.py --latency-ms 80 --jitter-ms 30 --throttle-rate 0.02
+  python benchmarks/bench_scrapers.py --backends requests http2 --latency-ms 40
+  python benchmarks/bench_scrapers.py --fixtures benchmarks/fixtures/scrapers
+  python benchmarks/bench_scrapers.py record benchmarks/fixtures/scrapers   # hits the live sites once
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from fixture_server import (  # noqa: E402
+    FixtureServer,
+    FixtureStore,
+    H2FixtureServer,
+    record_fixtures,
+    redirect_sessions,
+    synthesize_fixtures,
+)
+
+SERVERS = {"requests": FixtureServer, "http2": H2FixtureServer}
+SCRAPERS = {
+    "broken_binding": ("scrapers.broken_binding_sf", "broken_binding_checks"),
+    "folio_society": ("scrapers.folio_society_sf", "folio_society_checks"),
+}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def _run_scraper(name, backend, port, sleep_scale, results):
+    import importlib
+
+    import http_client
+    import rate_limiter
+
+    os.environ[http_client.BACKEND_ENV] = backend
+
+    module_name, func_name = SCRAPERS[name]
+    module = importlib.import_module(module_name)
+    real_time = rate_limiter.time
+    rate_limiter.time = types.SimpleNamespace(
+        **{k: getattr(real_time, k) for k in ("time", "monotonic", "perf_counter")},
+        sleep=lambda seconds: real_time.sleep(seconds * sleep_scale) if sleep_scale else None,
+    )
+    with redirect_sessions(port) as latencies:
+        started = time.perf_counter()
+        products = getattr(module, func_name)()
+        elapsed = time.perf_counter() - started
+    results.put({
+        "scraper": name,
+        "backend": backend,
+        "products": len(products),
+        "seconds": elapsed,
+        "fetches": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    })
+
+
+def run_one(name, backend, server, sleep_scale):
+    server.reset_stats()
+    results = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_run_scraper, args=(name, backend, server.port, sleep_scale, results))
+    proc.start()
+    row = results.get()
+    proc.join()
+    products = max(row["products"], 1)
+    row.update({
+        "products_per_sec": row["products"] / max(row["seconds"], 1e-9),
+        "requests": server.requests,
+        "connections": server.connections,
+        "requests_per_product": server.requests / products,
+        "throttled": server.throttled,
+        "missing": server.missing,
+    })
+    return row
+
+
+def print_table(rows):
+    header = (
+        f"{'scraper':<16}{'backend':<10}{'products':>9}{'seconds':>9}{'prod/s':>9}{'requests':>10}"
+        f"{'req/prod':>9}{'conns':>7}{'429s':>6}{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(
+            f"{r['scraper']:<16}{r['backend']:<10}{r['products']:>9}{r['seconds']:>9.2f}{r['products_per_sec']:>9.1f}"
+            f"{r['requests']:>10}{r['requests_per_product']:>9.2f}{r['connections']:>7}{r['throttled']:>6}"
+            f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['peak_rss_mb']:>9.1f}"
+        )
+
+
+def cmd_run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.fixtures:
+            store = FixtureStore(args.fixtures)
+            if not len(store):
+                sys.exit(f"No fixtures in {args.fixtures} (expected index.json)")
+        else:
+            store = synthesize_fixtures(tmp, per_page=args.per_page, pages=args.pages)
+        print(f"Fixtures: {len(store)} URLs from {store.root}")
+        rows = []
+        for backend in args.backends:
+            server = SERVERS[backend](
+                store,
+                latency_ms=args.latency_ms,
+                jitter_ms=args.jitter_ms,
+                throttle_rate=args.throttle_rate,
+                retry_after=args.retry_after,
+            )
+            with server:
+                rows += [run_one(name, backend, server, args.sleep_scale) for name in args.scrapers]
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+        for r in rows:
+            if r["missing"]:
+                print(f"note: {r['scraper']}/{r['backend']} requested {r['missing']} URLs missing from the fixture set")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "record", "synth"])
+    parser.add_argument("path", nargs="?", help="fixture directory for record/synth")
+    parser.add_argument("--fixtures", help="serve this fixture directory instead of a synthetic set")
+    parser.add_argument("--scrapers", nargs="+", default=list(SCRAPERS), choices=list(SCRAPERS))
+    parser.add_argument("--backends", nargs="+", default=["requests"], choices=list(SERVERS),
+                        help="scraper HTTP backends to compare")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean injected server latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="latency standard deviation")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--sleep-scale", type=float, default=0.0, help="multiplier for retry backoff sleeps")
+    parser.add_argument("--per-page", type=int, default=24, help="synthetic products per collection page")
+    parser.add_argument("--pages", type=int, default=3, help="synthetic pages per collection")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.command in ("record", "synth"):
+        if not args.path:
+            parser.error(f"{args.command} needs a fixture directory")
+        if args.command == "record":
+            store = record_fixtures(args.path)
+        else:
+            store = synthesize_fixtures(args.path, per_page=args.per_page, pages=args.pages)
+        print(f"Wrote {len(store)} fixtures to {args.path}")
+        return
+    cmd_run(args)
+
+
+if __name__ == "__main__":
+    main()
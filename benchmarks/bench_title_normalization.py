@@ -0,0 +1,168 @@
+"""
+Silver title normalization: per-pattern re.sub loop vs. one compiled pass + memoization.
+
+Runs the original implementation (kept here as the reference) and the current
+silver_catalog functions over a title corpus, fails if any output differs, and
+times both. Each Silver upsert looks a title up several times (author override,
+work lookup, work insert), so both paths are timed at CALLS_PER_TITLE passes.
+
+Corpus, in order of preference:
+  --from-supabase      every items_seen.name (needs SUPABASE_URL + key in env)
+  --titles-file PATH   one title per line
+  (default)            synthetic titles with the retailer suffixes we strip
+
+Usage:
+  python benchmarks/bench_title_normalization.py
+  python benchmarks/bench_title_normalization.py --from-supabase
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import silver_catalog  # noqa: E402
+from silver_catalog import _CLEAN_TITLE_PATTERNS  # noqa: E402
+
+CALLS_PER_TITLE = 3
+PAGE_SIZE = 1000
+
+SUFFIXES = [
+    "", "", "", " - TBB Press Edition", " - 2nd Printing", " - Deluxe Edition with Slipcase",
+    "; Books 1-3", " - Signed & Numbered", " - Leftover Stock", " - Unsigned", " Box Set",
+    " - Sprayed Edges Special Edition", " - Preorder", " - Slightly Damaged",
+]
+
+
+# --- Reference (pre-optimization) implementation ----------------------------
+
+def reference_normalize_text(value):
+    if not value:
+        return None
+    cleaned = re.sub(r"[^a-z0-9]+", " ", (value or "").strip().lower())
+    return re.sub(r"\s+", " ", cleaned).strip() or None
+
+
+def reference_clean_title(title):
+    if not title:
+        return None
+    t = title
+    for pattern in _CLEAN_TITLE_PATTERNS:
+        t = re.sub(pattern, "", t, flags=re.IGNORECASE)
+    return re.sub(r"\s+", " ", t).strip(" -;") or None
+
+
+def reference_variants(title):
+    if not title:
+        return []
+    variants = []
+    for candidate in (title, reference_clean_title(title), title.split(";")[0].strip()):
+        if candidate and candidate not in variants:
+            variants.append(candidate)
+    return variants
+
+
+def reference_pass(titles):
+    return [
+        (reference_variants(t), [reference_normalize_text(v) for v in reference_variants(t)])
+        for t in titles
+    ]
+
+
+def current_pass(titles):
+    return [
+        (silver_catalog.title_lookup_variants(t),
+         [silver_catalog.normalize_title(v) for v in silver_catalog.title_lookup_variants(t)])
+        for t in titles
+    ]
+
+
+def clear_caches():
+    for fn in (silver_catalog.normalize_title, silver_catalog.clean_title,
+               silver_catalog._title_lookup_variants):
+        fn.cache_clear()
+
+
+# --- Corpus -----------------------------------------------------------------
+
+def synthetic_titles(count, rng):
+    words = ["The", "Dragon", "Empire", "Stars", "Night", "Blood", "Winter", "Crown", "Shadow", "Sea"]
+    titles = []
+    for i in range(count):
+        base = " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+        titles.append(f"{base} {i}{rng.choice(SUFFIXES)}")
+    # Stores relist the same book; roughly a third of scraped names repeat.
+    titles.extend(rng.choice(titles) for _ in range(count // 3))
+    rng.shuffle(titles)
+    return titles
+
+
+def supabase_titles():
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    sb = create_client(
+        os.environ["SUPABASE_URL"],
+        os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ["SUPABASE_KEY"],
+    )
+    titles, last_id = [], 0
+    while True:
+        rows = (
+            sb.table("items_seen").select("id,name").gt("id", last_id)
+            .order("id").limit(PAGE_SIZE).execute().data or []
+        )
+        titles.extend(r["name"] for r in rows if r.get("name"))
+        if len(rows) < PAGE_SIZE:
+            return titles
+        last_id = rows[-1]["id"]
+
+
+def timed(fn, titles, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        result = fn(titles)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--from-supabase", action="store_true")
+    parser.add_argument("--titles-file")
+    parser.add_argument("--items", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.from_supabase:
+        titles, source = supabase_titles(), "items_seen"
+    elif args.titles_file:
+        titles = [line.rstrip("\n") for line in Path(args.titles_file).read_text().splitlines()]
+        source = args.titles_file
+    else:
+        titles, source = synthetic_titles(args.items, random.Random(args.seed)), "synthetic"
+
+    ref_s, expected = timed(reference_pass, titles, CALLS_PER_TITLE)
+    clear_caches()
+    cold_s, actual = timed(current_pass, titles, 1)
+    clear_caches()
+    cur_s, actual = timed(current_pass, titles, CALLS_PER_TITLE)
+
+    mismatches = [t for t, e, a in zip(titles, expected, actual) if e != a]
+    print(f"Corpus: {len(titles)} titles ({len(set(titles))} distinct) from {source}")
+    print(f"  reference  {CALLS_PER_TITLE}x: {ref_s * 1000:9.1f} ms")
+    print(f"  current    1x: {cold_s * 1000:9.1f} ms  (cold cache)")
+    print(f"  current    {CALLS_PER_TITLE}x: {cur_s * 1000:9.1f} ms  ({ref_s / cur_s:.1f}x faster)")
+    print(f"  mismatches:    {len(mismatches)}")
+    for title in mismatches[:10]:
+        print(f"    {title!r}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
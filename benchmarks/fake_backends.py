@@ -0,0 +1,436 @@
+"""
+In-memory stand-ins for the Supabase client and SES used by lambda_function.
+
+FakeSupabase implements the slice of the supabase-py / postgrest query builder
+the Lambda and silver_catalog use: table().select/insert/upsert/update/delete
+with eq/neq/in_/is_/not_/gt/gte/lt/lte/order/range/limit, plus the RPCs
+touch_items_seen, refresh_gold_analytics, resolve_work_id (exact tiers) and
+claim_due_collections.
+Equality filters are served from lazily built hash indexes so lookups stay
+O(1) at synthetic scale.
+
+Every execute() can sleep `latency_ms` to model the PostgREST round trip and
+reports to `on_request(kind, nbytes)` so stage telemetry counts DB requests.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+# Columns that make up each table's upsert conflict target when none is given.
+DEFAULT_CONFLICT = {"profiles": ("id",), "run_log": ("run_id",)}
+# Tables keyed by uuid rather than bigserial.
+UUID_TABLES = {"profiles", "watchlist", "email_log"}
+
+
+@dataclass
+class FakeResponse:
+    data: list
+    count: int | None = None
+
+
+class _Params:
+    """Just enough of httpx.QueryParams for batch_writer's ?select= trim."""
+
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+
+    def add(self, key, value):
+        return _Params({**self._values, key: value})
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+
+class _Request:
+    def __init__(self):
+        self.params = _Params()
+
+
+class FakeTable:
+    def __init__(self, name):
+        self.name = name
+        self.rows: dict = {}
+        self._ids = itertools.count(1)
+        self._indexes: dict[str, dict] = {}
+
+    def next_id(self):
+        return str(uuid.uuid4()) if self.name in UUID_TABLES else next(self._ids)
+
+    def index(self, columns):
+        """Hash index on one column name or a tuple of columns."""
+        idx = self._indexes.get(columns)
+        if idx is None:
+            idx = self._indexes[columns] = {}
+            for pk, row in self.rows.items():
+                idx.setdefault(_index_key(row, columns), set()).add(pk)
+        return idx
+
+    def _unindex(self, pk, row):
+        for columns, idx in self._indexes.items():
+            bucket = idx.get(_index_key(row, columns))
+            if bucket:
+                bucket.discard(pk)
+
+    def _reindex(self, pk, row):
+        for columns, idx in self._indexes.items():
+            idx.setdefault(_index_key(row, columns), set()).add(pk)
+
+    def put(self, row):
+        pk = row.setdefault("id", self.next_id())
+        old = self.rows.get(pk)
+        if old is not None:
+            self._unindex(pk, old)
+        self.rows[pk] = row
+        self._reindex(pk, row)
+        return row
+
+    def patch(self, pk, values):
+        row = self.rows[pk]
+        self._unindex(pk, row)
+        row.update(values)
+        self._reindex(pk, row)
+        return row
+
+    def remove(self, pk):
+        row = self.rows.pop(pk)
+        self._unindex(pk, row)
+
+    def find(self, key_columns, row):
+        """Primary key of the row matching `row` on `key_columns`, if any."""
+        if key_columns == ("id",):
+            return row.get("id") if row.get("id") in self.rows else None
+        return next(iter(self.index(key_columns).get(_index_key(row, key_columns), ())), None)
+
+
+def _hashable(value):
+    return json.dumps(value, sort_keys=True) if isinstance(value, (dict, list)) else value
+
+
+def _index_key(row, columns):
+    if isinstance(columns, tuple):
+        return tuple(_hashable(row.get(c)) for c in columns)
+    return _hashable(row.get(columns))
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._op = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._on_conflict = ()
+        self._filters = []
+        self._negate = False
+        self._order = None
+        self._offset = 0
+        self._limit = None
+        self._single = False
+        self.request = _Request()
+
+    # --- builders ---------------------------------------------------------
+
+    def select(self, columns="*", count=None):
+        self._columns = columns
+        self._count = count
+        return self
+
+    def insert(self, rows, returning=None, **_):
+        self._op, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict="", returning=None, **_):
+        self._op, self._payload = "upsert", rows
+        self._on_conflict = tuple(c.strip() for c in on_conflict.split(",") if c.strip())
+        return self
+
+    def update(self, values):
+        self._op, self._payload = "update", values
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _filter(self, column, op, value):
+        self._filters.append((column, op, value, self._negate))
+        self._negate = False
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", set(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", None if value in (None, "null") else value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def order(self, column, desc=False, **_):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def range(self, start, end):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._single = True
+        return self
+
+    # --- execution --------------------------------------------------------
+
+    def execute(self):
+        return self._client._execute(self)
+
+    def _candidates(self, table):
+        """Rows from the smallest index bucket among the positive equality filters."""
+        best = None
+        for column, op, value, negate in self._filters:
+            if negate:
+                continue
+            if op == "eq" or (op == "is" and value is None):
+                pks = table.index(column).get(_hashable(value), set())
+            elif op == "in":
+                idx = table.index(column)
+                pks = set().union(*(idx.get(_hashable(v), ()) for v in value)) if value else set()
+            else:
+                continue
+            if best is None or len(pks) < len(best):
+                best = pks
+        if best is None:
+            return list(table.rows.values())
+        return [table.rows[pk] for pk in best]
+
+    def _matches(self, row):
+        for column, op, value, negate in self._filters:
+            cell = row.get(column)
+            if op == "eq":
+                ok = cell == value
+            elif op == "neq":
+                ok = cell != value
+            elif op == "in":
+                ok = cell in value
+            elif op == "is":
+                ok = cell is value if value is None else cell == value
+            else:
+                if cell is None:
+                    ok = False
+                elif op == "gt":
+                    ok = cell > value
+                elif op == "gte":
+                    ok = cell >= value
+                elif op == "lt":
+                    ok = cell < value
+                else:
+                    ok = cell <= value
+            if ok == negate:
+                return False
+        return True
+
+    def _project(self, rows, columns=None):
+        columns = columns or self._columns
+        if not columns or columns.strip() == "*":
+            return [dict(r) for r in rows]
+        names = [c.strip() for c in columns.split(",") if c.strip()]
+        return [{c: r.get(c) for c in names} for r in rows]
+
+    def run(self, table):
+        if self._op in ("insert", "upsert"):
+            rows = self._payload if isinstance(self._payload, list) else [self._payload]
+            written = []
+            key = self._on_conflict or DEFAULT_CONFLICT.get(table.name, ("id",))
+            for row in rows:
+                row = dict(row)
+                pk = table.find(key, row) if self._op == "upsert" else None
+                if pk is not None:
+                    row.pop("id", None)
+                    written.append(table.patch(pk, row))
+                else:
+                    written.append(table.put(row))
+            return FakeResponse(self._project(written, self.request.params.get("select")))
+
+        matched = [r for r in self._candidates(table) if self._matches(r)]
+        if self._op == "update":
+            return FakeResponse([dict(table.patch(r["id"], dict(self._payload))) for r in matched])
+        if self._op == "delete":
+            for r in matched:
+                table.remove(r["id"])
+            return FakeResponse([dict(r) for r in matched])
+
+        total = len(matched)
+        if self._order:
+            column, desc = self._order
+            matched.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        end = None if self._limit is None else self._offset + self._limit
+        page = self._project(matched[self._offset:end])
+        if self._single:
+            return FakeResponse(page[0] if page else None, total if self._count else None)
+        return FakeResponse(page, total if self._count else None)
+
+
+class FakeRPC:
+    def __init__(self, client, name, params):
+        self._client = client
+        self._name = name
+        self._params = params or {}
+
+    def execute(self):
+        return self._client._execute_rpc(self._name, self._params)
+
+
+class FakeSupabase:
+    """Thread-safe in-memory Supabase client (see module docstring)."""
+
+    def __init__(self, latency_ms=0.0, on_request=None):
+        self.tables: dict[str, FakeTable] = {}
+        self.latency_ms = latency_ms
+        self.on_request = on_request
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return FakeRPC(self, name, params)
+
+    def get_table(self, name) -> FakeTable:
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = FakeTable(name)
+        return table
+
+    def load(self, name, rows):
+        table = self.get_table(name)
+        for row in rows:
+            table.put(dict(row))
+
+    def _round_trip(self, data):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if self.on_request:
+            self.on_request("db", len(json.dumps(data, default=str)))
+
+    def _execute(self, query):
+        with self._lock:
+            self.requests += 1
+            resp = query.run(self.get_table(query._table))
+        self._round_trip(resp.data)
+        return resp
+
+    def _execute_rpc(self, name, params):
+        with self._lock:
+            self.requests += 1
+            handler = getattr(self, f"_rpc_{name}", None)
+            if handler is None:
+                raise ValueError(f"function public.{name} does not exist")
+            resp = FakeResponse(handler(**params))
+        self._round_trip(resp.data)
+        return resp
+
+    # --- RPCs -------------------------------------------------------------
+
+    def _rpc_touch_items_seen(self, p_item_ids):
+        table = self.get_table("items_seen")
+        now = time.time()
+        for item_id in p_item_ids:
+            if item_id in table.rows:
+                table.rows[item_id]["last_seen_at"] = now
+        return None
+
+    def _rpc_claim_due_collections(self, p_ids, p_force=False, p_slack_seconds=30, p_lease_minutes=15):
+        # Migration 031; timestamps are kept as datetimes rather than ISO strings.
+        table = self.get_table("collections")
+        now = datetime.now(timezone.utc)
+        claimed = []
+        for collection_id in p_ids:
+            row = table.rows.get(collection_id)
+            if row is None or (row.get("scrape_lease_until") or now) > now:
+                continue
+            interval, last = row.get("scrape_interval_minutes"), row.get("last_scraped_at")
+            if not (p_force or interval is None or last is None
+                    or last <= now - timedelta(minutes=interval, seconds=-p_slack_seconds)):
+                continue
+            claimed.append({"id": collection_id, "previous_scraped_at": last})
+            row["last_scraped_at"] = now
+            row["scrape_lease_until"] = now + timedelta(minutes=p_lease_minutes)
+        return claimed
+
+    def _rpc_refresh_gold_analytics(self):
+        return {"refreshed": True}
+
+    def _rpc_resolve_work_id(self, p_titles, p_author=None, p_min_similarity=None):
+        # Exact tiers of migration 028's resolve_work_id; the trigram tier is skipped.
+        works = self.get_table("works")
+        by_title = works.index("normalized_title")
+        for title in p_titles:
+            rows = [works.rows[pk] for pk in by_title.get(title, ())]
+            for row in rows:
+                if (row.get("normalized_author") or "") == (p_author or ""):
+                    return [{"work_id": row["id"]}]
+            if p_author:
+                for row in rows:
+                    if row.get("normalized_author") is None:
+                        return [{"work_id": row["id"]}]
+            with_author = [r for r in rows if r.get("author") is not None]
+            if len(with_author) == 1:
+                return [{"work_id": with_author[0]["id"]}]
+        return []
+
+
+class FakeSES:
+    """Stand-in for email_notifier.send_email; optional per-send latency and failures."""
+
+    def __init__(self, latency_ms=0.0, fail_every=0):
+        self.latency_ms = latency_ms
+        self.fail_every = fail_every
+        self.sent = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def send_email(self, subject, body, to_email, is_html=True):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.sent += 1
+            self.bytes += len(body)
+            if self.fail_every and self.sent % self.fail_every == 0:
+                raise RuntimeError("Throttling: Maximum sending rate exceeded.")
+            return f"sim-{self.sent}"
@@ -0,0 +1,470 @@
+"""
+Local HTTP stand-in for the retailer sites, served from recorded fixtures.
+
+A fixture set is a directory holding `index.json` ({"<host><path>[?query]":
+{"file", "content_type"}}) plus one body file per URL. Sets come from:
+
+  record_fixtures(dir)      run the real scrapers once against the live sites
+                            and save every 200 response (polite, slow)
+  synthesize_fixtures(dir)  generate pages/payloads shaped like the live ones
+
+FixtureServer serves a set on 127.0.0.1 over HTTP/1.1 (H2FixtureServer over
+h2c) with optional latency and 429 injection; `redirect_sessions(server.port)`
+makes every scraper session created inside the block talk to it instead of the
+real hosts.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BB_HOST = "thebrokenbindingsub.com"
+FOLIO_HOST = "www.foliosociety.com"
+BB_COLLECTIONS = ["to-the-stars", "the-infirmary", "dragons-hoard", "the-graveyard"]
+
+_EXTENSIONS = {"application/json": ".json", "text/javascript": ".js", "text/html": ".html"}
+
+
+def fixture_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+class FixtureStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        index_path = self.root / "index.json"
+        self.index = json.loads(index_path.read_text()) if index_path.exists() else {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        return (self.root / entry["file"]).read_bytes(), entry["content_type"]
+
+    def save(self, url: str, body: bytes, content_type: str) -> None:
+        content_type = content_type.split(";")[0].strip() or "text/html"
+        with self._lock:
+            key = fixture_key(url)
+            entry = self.index.get(key)
+            if entry is None:
+                name = f"{len(self.index):05d}{_EXTENSIONS.get(content_type, '.bin')}"
+                entry = self.index[key] = {"file": name, "content_type": content_type}
+            self.root.mkdir(parents=True, exist_ok=True)
+            (self.root / entry["file"]).write_bytes(body)
+
+    def flush(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / "index.json").write_text(json.dumps(self.index, indent=1, sort_keys=True))
+
+
+class FixtureServer:
+    """Threaded server for a FixtureStore; counts connections, requests and injected 429s."""
+
+    def __init__(self, store, latency_ms=0.0, jitter_ms=0.0, throttle_rate=0.0, retry_after=0, seed=0):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.missing = 0
+        self.connections = 0
+        self._httpd = self._make_server()
+        self._httpd.daemon_threads = True
+        process_request = self._httpd.process_request
+
+        def counting_process_request(request, client_address):
+            with self._lock:
+                self.connections += 1
+            process_request(request, client_address)
+
+        self._httpd.process_request = counting_process_request
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests = self.throttled = self.missing = self.connections = 0
+
+    def _decide(self):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000 if self.latency_ms else 0.0
+            throttle = self.throttle_rate and self._rng.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+            return delay, throttle
+
+    def respond(self, path: str) -> tuple[int, bytes, str, dict]:
+        """(status, body, content_type, extra headers) for GET `path`, after any injected latency."""
+        delay, throttle = self._decide()
+        if delay:
+            time.sleep(delay)
+        if throttle:
+            return 429, b"", "text/plain", {"Retry-After": str(self.retry_after)}
+        found = self.store.get(path.lstrip("/"))
+        if found is None:
+            with self._lock:
+                self.missing += 1
+            return 404, b"not found", "text/plain", {}
+        return 200, *found, {}
+
+    def _make_server(self):
+        return ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, Nagle plus
+            # delayed ACK adds ~40ms to every response.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self._reply(*server.respond(self.path))
+
+            def _reply(self, status, body, content_type, headers):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class H2FixtureServer(FixtureServer):
+    """FixtureServer over cleartext HTTP/2 with prior knowledge (h2c).
+
+    Each stream is answered on its own thread, so injected latency overlaps
+    across streams the way it does on a real multiplexed connection.
+    """
+
+    def _make_server(self):
+        return socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._h2_handler_class())
+
+    def _h2_handler_class(self):
+        import h2.config
+        import h2.connection
+        import h2.events
+        import h2.exceptions
+
+        server = self
+
+        class H2Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                sock = self.request
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+                cond = threading.Condition()
+
+                def flush():
+                    data = conn.data_to_send()
+                    if data:
+                        sock.sendall(data)
+
+                def answer(stream_id, path):
+                    status, body, content_type, extra = server.respond(path)
+                    headers = [(":status", str(status)), ("content-type", content_type),
+                               ("content-length", str(len(body)))]
+                    headers += [(k.lower(), v) for k, v in extra.items()]
+                    try:
+                        with cond:
+                            conn.send_headers(stream_id, headers, end_stream=not body)
+                            flush()
+                            sent = 0
+                            while sent < len(body):
+                                window = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                                if window <= 0:
+                                    cond.wait(timeout=1)
+                                    continue
+                                chunk = body[sent:sent + window]
+                                sent += len(chunk)
+                                conn.send_data(stream_id, chunk, end_stream=sent >= len(body))
+                                flush()
+                    except (h2.exceptions.StreamClosedError, OSError):
+                        pass
+
+                with cond:
+                    conn.initiate_connection()
+                    flush()
+                while True:
+                    try:
+                        data = sock.recv(65535)
+                    except OSError:
+                        break
+                    if not data:
+                        break
+                    with cond:
+                        try:
+                            events = conn.receive_data(data)
+                        except h2.exceptions.ProtocolError:
+                            break
+                        for event in events:
+                            if isinstance(event, h2.events.RequestReceived):
+                                path = dict(event.headers)[b":path"].decode()
+                                threading.Thread(target=answer, args=(event.stream_id, path), daemon=True).start()
+                            elif isinstance(event, h2.events.ConnectionTerminated):
+                                return
+                        flush()
+                        cond.notify_all()
+
+        return H2Handler
+
+
+class _RedirectAdapter(HTTPAdapter):
+    """Sends https://<host>/<path> to http://127.0.0.1:<port>/<host>/<path>."""
+
+    def __init__(self, port):
+        super().__init__()
+        self.port = port
+
+    def send(self, request, **kwargs):
+        request.url = f"http://127.0.0.1:{self.port}/{fixture_key(request.url)}"
+        return super().send(request, **kwargs)
+
+
+def _redirect_http2_session(port, latencies):
+    """http_client.Http2Session subclass speaking h2c to an H2FixtureServer on `port`."""
+    import httpx
+
+    import http_client
+
+    class RedirectTransport(httpx.BaseTransport):
+        def __init__(self):
+            self._inner = httpx.HTTPTransport(http1=False, http2=True)
+
+        def handle_request(self, request):
+            request.url = httpx.URL(f"http://127.0.0.1:{port}/{fixture_key(str(request.url))}")
+            return self._inner.handle_request(request)
+
+        def close(self):
+            self._inner.close()
+
+    class RedirectHttp2Session(http_client.Http2Session):
+        def __init__(self, max_connections=10):
+            super().__init__(transport=RedirectTransport(), max_connections=max_connections)
+
+        def get(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return super().get(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    return RedirectHttp2Session
+
+
+@contextmanager
+def redirect_sessions(port, latencies=None):
+    """Route every scraper session created in the block to the fixture server.
+
+    Covers requests.Session() and, when httpx/h2 are installed, the HTTP/2
+    backend's http_client.Http2Session (which needs an H2FixtureServer).
+    Yields the list that collects per-request latencies (seconds, body included).
+    """
+    import http_client
+
+    latencies = latencies if latencies is not None else []
+    real_session = requests.Session
+
+    class RedirectSession(real_session):
+        def __init__(self):
+            super().__init__()
+            self.trust_env = False  # never send 127.0.0.1 through an env proxy
+            adapter = _RedirectAdapter(port)
+            self.mount("https://", adapter)
+            self.mount("http://", adapter)
+
+        def send(self, request, **kwargs):
+            started = time.perf_counter()
+            try:
+                return super().send(request, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(requests, "Session", RedirectSession))
+        if http_client.httpx is not None:
+            stack.enter_context(
+                mock.patch.object(http_client, "Http2Session", _redirect_http2_session(port, latencies))
+            )
+        yield latencies
+
+
+class _RecordingAdapter(HTTPAdapter):
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def send(self, request, **kwargs):
+        resp = super().send(request, **kwargs)
+        if resp.status_code == 200:
+            self.store.save(request.url, resp.content, resp.headers.get("Content-Type", ""))
+        return resp
+
+
+def record_fixtures(root) -> FixtureStore:
+    """Run both scrapers against the live sites and save every 200 response."""
+    from scrapers.broken_binding_sf import broken_binding_checks
+    from scrapers.folio_society_sf import folio_society_checks
+
+    store = FixtureStore(root)
+    real_session = requests.Session
+
+    class RecordingSession(real_session):
+        def __init__(self):
+            super().__init__()
+            self.mount("https://", _RecordingAdapter(store))
+
+    with mock.patch.object(requests, "Session", RecordingSession):
+        broken_binding_checks()
+        folio_society_checks()
+    # Product `.json` payloads are used by the cover backfill; grab them too.
+    with real_session() as session:
+        session.mount("https://", _RecordingAdapter(store))
+        for key in [k for k in store.index if k.startswith(BB_HOST) and k.endswith(".js")]:
+            try:
+                session.get(f"https://{key[:-3]}.json", timeout=15)
+            except requests.RequestException:
+                pass
+            time.sleep(0.3)
+    store.flush()
+    return store
+
+
+# --- Synthetic fixtures ------------------------------------------------------
+
+def _bb_collection_page(handles, names):
+    cards = "".join(
+        f'<li class="grid__item"><div class="card"><h3 class="card__heading">'
+        f'<a class="full-unstyled-link" href="/products/{h}">{names[h]}</a></h3>'
+        f'<div class="price"><span class="price-item price-item--regular">&pound;{20 + i % 80}.00</span>'
+        f"</div></div></li>"
+        for i, h in enumerate(handles)
+    )
+    return f'<html><body><ul id="product-grid" class="grid">{cards}</ul></body></html>'.encode()
+
+
+def _bb_product_js(handle, name, rng, private):
+    isbn = f"978{rng.randrange(10**9, 10**10)}"
+    return {
+        "id": rng.randrange(10**12),
+        "handle": handle,
+        "title": name,
+        "vendor": "The Broken Binding Ltd.",
+        "available": rng.random() < 0.4,
+        "tags": ["Private Sale"] if private else ["Fantasy", "Special Edition"],
+        "images": [f"//cdn.shopify.com/s/files/1/{handle}.jpg"],
+        "featured_image": f"//cdn.shopify.com/s/files/1/{handle}.jpg",
+        "variants": [{"id": rng.randrange(10**12), "barcode": isbn, "available": True}],
+        "description": f"<p>{name}. " + "Sprayed edges, foil, signed. " * 20 + "</p>",
+    }
+
+
+def _bb_product_json(js):
+    return {
+        "product": {
+            "id": js["id"],
+            "title": js["title"],
+            "vendor": js["vendor"],
+            "tags": ", ".join(js["tags"]),
+            "body_html": js["description"],
+            "images": [{"src": "https:" + js["images"][0]}],
+            "variants": [{"id": v["id"], "barcode": v["barcode"]} for v in js["variants"]],
+        }
+    }
+
+
+def _folio_listing(count, rng):
+    products = []
+    for i in range(count):
+        slug = f"synthetic-folio-title-{i}"
+        label = "<product-label><p>Out of stock</p></product-label>" if rng.random() < 0.3 else ""
+        products.append(
+            f'<product><href class="block"><a href="/usa/{slug}.html">'
+            f'<span class="_name">Synthetic Folio Title {i}</span></a></href>'
+            f"<price>US${rng.randint(60, 500)}</price>{label}</product>"
+        )
+    return f"<html><body><div class=\"products\">{''.join(products)}</div></body></html>".encode()
+
+
+def synthesize_fixtures(root, per_page=24, pages=3, folio_products=150, private_rate=0.05,
+                        shared_rate=0.1, seed=42) -> FixtureStore:
+    """Write a synthetic fixture set shaped like the live Broken Binding/Folio pages."""
+    rng = random.Random(seed)
+    store = FixtureStore(root)
+    store.index.clear()
+    names = {}
+    previous = []
+
+    store.save(f"https://{BB_HOST}/", b"<html><body>home</body></html>", "text/html")
+    for collection in BB_COLLECTIONS:
+        handles = []
+        for _ in range(per_page * pages):
+            if previous and rng.random() < shared_rate:
+                handles.append(rng.choice(previous))
+                continue
+            handle = f"synthetic-title-{len(names)}-special-edition"
+            names[handle] = f"Synthetic Title {len(names)} - Special Edition"
+            handles.append(handle)
+        previous.extend(handles)
+        for page in range(pages + 1):
+            chunk = handles[page * per_page:(page + 1) * per_page]
+            store.save(
+                f"https://{BB_HOST}/collections/{collection}?page={page + 1}",
+                _bb_collection_page(chunk, names),
+                "text/html",
+            )
+
+    for handle, name in names.items():
+        js = _bb_product_js(handle, name, rng, rng.random() < private_rate)
+        store.save(f"https://{BB_HOST}/products/{handle}.js", json.dumps(js).encode(), "text/javascript")
+        store.save(
+            f"https://{BB_HOST}/products/{handle}.json",
+            json.dumps(_bb_product_json(js)).encode(),
+            "application/json",
+        )
+
+    store.save(f"https://{FOLIO_HOST}/usa/sci-fi-fantasy", _folio_listing(folio_products, rng), "text/html")
+    store.flush()
+    return store
@@ -0,0 +1,336 @@
+"""
+End-to-end simulation of lambda_function.check_for_updates at synthetic scale.
+
+Builds a synthetic world (catalogue across the Broken Binding collections and
+Folio, Silver works/editions/listings, subscribers with store/event
+preferences and watchlists) in benchmarks/fake_backends.FakeSupabase, swaps in
+fake scrapers, Folio product pages, SES and Open Library, and runs the real check_for_updates in
+prod mode. Each run re-scrapes the previous run's state with --change-rate of
+items flipping stock or price and --new-rate new items.
+
+The report is the run's own stage telemetry (as written to run_log) plus the
+peak traced allocation per stage, so diffing, routing (notify) and Silver
+resolution can be compared as the catalogue and subscriber counts grow.
+
+Usage:
+  python benchmarks/simulate_run.py                      # ~current scale
+  python benchmarks/simulate_run.py --scale 10
+  python benchmarks/simulate_run.py --scale 100 --no-memory --runs 2
+  python benchmarks/simulate_run.py --db-latency-ms 40 --ses-latency-ms 70
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# email_notifier builds its SES client at import; the simulation never uses it.
+for _name, _value in (
+    ("AWS_SES_REGION", "us-east-1"),
+    ("SES_FROM_ADDRESS", "alerts@example.com"),
+    ("SES_CONFIGURATION_SET", "simulation"),
+):
+    os.environ.setdefault(_name, _value)
+
+import lambda_function as lf  # noqa: E402
+import telemetry  # noqa: E402
+from fake_backends import FakeSES, FakeSupabase  # noqa: E402
+from scrapers.registry import DEFAULT_SOURCES, targets_for  # noqa: E402
+from silver_catalog import normalize_title, normalize_url  # noqa: E402
+
+FOLIO_STORE = "Folio Society - Sci-Fi & Fantasy"
+BB_STORES = [t["store"] for t in targets_for(DEFAULT_SOURCES, "broken_binding")]
+EVENT_TYPES = ["New Item", "Restocked", "Price Change", "Out of Stock"]
+
+
+class ProfiledTelemetry(telemetry.RunTelemetry):
+    """RunTelemetry that also records the peak traced allocation inside each stage."""
+
+    current = None
+
+    def __init__(self, run_id):
+        super().__init__(run_id)
+        self.peak_bytes = {}
+        self._mem_stack = []
+        ProfiledTelemetry.current = self
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._mem_stack:
+                self._mem_stack[-1][1] = max(self._mem_stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._mem_stack.append([current, 0])
+        try:
+            with super().stage(name):
+                yield
+        finally:
+            if tracing:
+                base, nested_peak = self._mem_stack.pop()
+                peak = max(nested_peak, tracemalloc.get_traced_memory()[1])
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak - base)
+                if self._mem_stack:
+                    self._mem_stack[-1][1] = max(self._mem_stack[-1][1], peak)
+                tracemalloc.reset_peak()
+
+    def summary(self):
+        result = super().summary()
+        for name, counters in result["stages"].items():
+            counters["peak_alloc_kib"] = round(self.peak_bytes.get(name, 0) / 1024, 1)
+        return result
+
+
+def _record_db(kind, nbytes):
+    tel = ProfiledTelemetry.current
+    if tel is not None:
+        tel.record(kind, nbytes)
+
+
+# --- Synthetic world ---------------------------------------------------------
+
+def build_world(sb, *, items, users, rng, watch_per_user=5, store_pref_rate=0.6,
+                event_pref_rate=0.3, multi_collection_rate=0.05):
+    sb.load("publishers", [{"id": 1, "name": "Broken Binding"}, {"id": 2, "name": "Folio Society"}])
+    collections = [
+        {
+            "id": i + 1,
+            "store_name": source.store_name,
+            "publisher_id": 2 if source.scraper == "folio_society" else 1,
+            "active": True,
+            "scraper": source.scraper,
+            "scrape_url": source.scrape_url,
+            "scrape_priority": source.priority,
+            "scrape_interval_minutes": None,
+            "last_scraped_at": None,
+        }
+        for i, source in enumerate(DEFAULT_SOURCES)
+    ]
+    sb.load("collections", collections)
+    collection_by_store = {c["store_name"]: c for c in collections}
+
+    extra_stores = {}
+    for i in range(items):
+        item = synthetic_item(i, rng)
+        item_id = i + 1
+        sb.load("items_seen", [{"id": item_id, **item}])
+        if item["store"] != FOLIO_STORE and rng.random() < multi_collection_rate:
+            later = BB_STORES[BB_STORES.index(item["store"]) + 1:]
+            if later:
+                extra_stores[item["link"]] = rng.choice(later)
+
+        collection = collection_by_store[item["store"]]
+        sb.load("works", [{
+            "id": item_id,
+            "title": item["name"],
+            "normalized_title": normalize_title(item["name"]),
+            "author": item["author"],
+            "normalized_author": normalize_title(item["author"]) if item["author"] else None,
+        }])
+        sb.load("editions", [{
+            "id": item_id,
+            "work_id": item_id,
+            "publisher_id": collection["publisher_id"],
+            "title": item["name"],
+            "normalized_title": normalize_title(item["name"]),
+            "edition_type": None,
+            "physical_format": "hardcover",
+        }])
+        sb.load("retailer_listings", [{
+            "id": item_id,
+            "edition_id": item_id,
+            "collection_id": collection["id"],
+            "items_seen_id": item_id,
+            "retailer_url": item["link"],
+            "retailer_url_normalized": normalize_url(item["link"]),
+            "in_stock": item["in_stock"],
+            "price_cents": lf.parse_price_cents(item["price"]),
+        }])
+
+    stores = BB_STORES + [FOLIO_STORE]
+    for u in range(users):
+        user_id = f"00000000-0000-4000-8000-{u:012d}"
+        sb.load("profiles", [{
+            "id": user_id,
+            "email": f"user{u}@example.com",
+            "is_active": True,
+            "pause_all_alerts": rng.random() < 0.05,
+            "receive_announcements": True,
+        }])
+        if rng.random() < store_pref_rate:
+            sb.load("user_store_preferences", [
+                {"user_id": user_id, "store_name": s, "enabled": rng.random() < 0.5} for s in stores
+            ])
+        if rng.random() < event_pref_rate:
+            sb.load("user_event_preferences", [
+                {"user_id": user_id, "event_type": t, "enabled": rng.random() < 0.7} for t in EVENT_TYPES
+            ])
+        sb.load("watchlist", [
+            {"user_id": user_id, "edition_id": rng.randint(1, items)}
+            for _ in range(rng.randint(0, 2 * watch_per_user))
+        ])
+    return extra_stores
+
+
+def synthetic_item(i, rng):
+    folio = rng.random() < 0.15
+    slug = f"synthetic-title-{i}"
+    return {
+        "name": f"Synthetic Title {i}" + ("" if folio else " - Special Edition"),
+        "price": f"${rng.randint(30, 400)}.00",
+        "store": FOLIO_STORE if folio else rng.choice(BB_STORES),
+        "link": (
+            f"https://www.foliosociety.com/usa/{slug}.html"
+            if folio else f"https://thebrokenbindingsub.com/products/{slug}"
+        ),
+        "in_stock": rng.random() < 0.4,
+        "author": f"Author {i % 997}" if rng.random() < 0.7 else None,
+    }
+
+
+def scrape(sb, extra_stores, *, change_rate, new_rate, rng):
+    """Scraper output for the next run: current items_seen with changes applied."""
+    rows = list(sb.get_table("items_seen").rows.values())
+    scraped = {"broken_binding": [], "folio_society": []}
+    next_index = len(rows)
+    new_rows = [synthetic_item(next_index + n, rng) for n in range(int(len(rows) * new_rate))]
+    for n, row in enumerate(rows + new_rows):
+        item = {k: row[k] for k in ("name", "price", "store", "link", "in_stock")}
+        if n < len(rows) and rng.random() < change_rate:
+            if rng.random() < 0.5:
+                item["in_stock"] = not item["in_stock"]
+            else:
+                item["price"] = f"${rng.randint(30, 400)}.00"
+        key = "folio_society" if item["store"] == FOLIO_STORE else "broken_binding"
+        if key == "broken_binding":
+            item.update({"cover_url": None, "isbn": None})
+        else:
+            item["author"] = None
+        scraped[key].append(item)
+        if item["link"] in extra_stores:
+            scraped[key].append({**item, "store": extra_stores[item["link"]]})
+    return scraped
+
+
+def synthetic_folio_details(links):
+    """Stand-in for the Folio product-page fetch: details derived from the link."""
+    details = {}
+    for link in links:
+        i = int(link.rsplit("-", 1)[-1].removesuffix(".html"))
+        details[link] = {
+            "author": f"Author {i % 997}",
+            "isbn": f"978{i:010d}",
+            "cover_url": f"https://www.foliosociety.com/media/{i}.jpg",
+        }
+    return details
+
+
+# --- Run + report -----------------------------------------------------------
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_once(sb, ses, scraped, *, memory):
+    store_checks = {scraper: (lambda collections, items=items: items) for scraper, items in scraped.items()}
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(lf, "_supabase_client", sb))
+        stack.enter_context(mock.patch.object(lf, "run_mode", "prod"))
+        stack.enter_context(mock.patch.object(lf, "STORE_CHECKS", store_checks))
+        stack.enter_context(mock.patch.object(lf, "send_email", ses.send_email))
+        stack.enter_context(mock.patch.object(lf, "lookup_author", lambda title, **kw: None))
+        stack.enter_context(mock.patch.object(lf, "fetch_folio_details", synthetic_folio_details))
+        stack.enter_context(mock.patch.object(telemetry, "RunTelemetry", ProfiledTelemetry))
+        if memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            lf.check_for_updates()
+        finally:
+            wall = time.perf_counter() - started
+            traced_peak = tracemalloc.get_traced_memory()[1] if memory else 0
+            if memory:
+                tracemalloc.stop()
+            ProfiledTelemetry.current = None
+
+    run_log = max(sb.get_table("run_log").rows.values(), key=lambda r: r["id"])
+    return run_log, wall, traced_peak
+
+
+def print_report(run_no, run_log, wall, traced_peak, ses_sent, db_requests):
+    tel = run_log.get("telemetry") or {"stages": {}, "totals": {}}
+    print(
+        f"\nRun {run_no}: {run_log.get('items_scraped')} items, {run_log.get('events_created')} events, "
+        f"{run_log.get('emails_sent')}/{run_log.get('emails_attempted')} emails, "
+        f"{db_requests} DB requests, {ses_sent} SES sends, {wall:.2f}s wall"
+    )
+    header = f"{'stage':<42}{'calls':>6}{'wall ms':>11}{'%':>6}{'db req':>8}{'db KiB':>9}{'peak KiB':>10}"
+    print(header)
+    print("-" * len(header))
+    total_ms = max(wall * 1000, 1e-9)
+    for name, c in sorted(tel["stages"].items(), key=lambda kv: -kv[1]["wall_ms"]):
+        print(
+            f"{name:<42}{c['calls']:>6}{c['wall_ms']:>11.1f}{100 * c['wall_ms'] / total_ms:>6.1f}"
+            f"{c['db_requests']:>8}{c['db_bytes'] / 1024:>9.1f}{c.get('peak_alloc_kib', 0):>10.1f}"
+        )
+    if traced_peak:
+        print(f"peak traced allocation: {traced_peak / 1024 / 1024:.1f} MiB; process peak RSS: {peak_rss_mb():.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2500, help="catalogue size at --scale 1")
+    parser.add_argument("--users", type=int, default=250, help="subscribers at --scale 1")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for --items and --users")
+    parser.add_argument("--change-rate", type=float, default=0.02, help="fraction of items changing per run")
+    parser.add_argument("--new-rate", type=float, default=0.005, help="new items per run, as a fraction")
+    parser.add_argument("--watch-per-user", type=int, default=5, help="mean watchlist size")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="per-request PostgREST latency")
+    parser.add_argument("--ses-latency-ms", type=float, default=0.0, help="per-send SES latency")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip tracemalloc (its overhead inflates wall times)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print the run_log rows as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the Lambda's INFO logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    items, users = int(args.items * args.scale), int(args.users * args.scale)
+    sb = FakeSupabase(latency_ms=args.db_latency_ms, on_request=_record_db)
+    started = time.perf_counter()
+    extra_stores = build_world(sb, items=items, users=users, rng=rng, watch_per_user=args.watch_per_user)
+    print(f"Built world: {items} items, {users} users in {time.perf_counter() - started:.1f}s")
+
+    results = []
+    for run_no in range(1, args.runs + 1):
+        scraped = scrape(sb, extra_stores, change_rate=args.change_rate, new_rate=args.new_rate, rng=rng)
+        ses = FakeSES(latency_ms=args.ses_latency_ms)
+        requests_before = sb.requests
+        run_log, wall, traced_peak = run_once(sb, ses, scraped, memory=args.memory)
+        results.append(run_log)
+        if not args.json:
+            print_report(run_no, run_log, wall, traced_peak, ses.sent, sb.requests - requests_before)
+
+    if args.json:
+        print(json.dumps(results, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import { useEffect, useState } from 'react'
 import { BrowserRouter, Routes, Route, Navigate, useLocation } from 'react-router-dom'
 import { Analytics } from '@vercel/analytics/react'
 import { AuthProvider } from './context/AuthContext'
@@ -14,12 +15,34 @@ import Landing from './pages/Landing'
 import Privacy from './pages/Privacy'
 import Terms from './pages/Terms'
 import AnalyticsPage from './pages/Analytics'
+import { applyUnsubscribeToken } from './lib/unsubscribe'
 
 function RedirectWithSearch({ to }: { to: string }) {
   const { search } = useLocation()
   return <Navigate to={`${to}${search}`} replace />
 }
 
+// Email links land here logged out; apply the signed token before the
+// protected redirect so one click is enough to unsubscribe.
+function PreferencesRedirect() {
+  const { search } = useLocation()
+  const token = new URLSearchParams(search).get('token')
+  const [target, setTarget] = useState<string | null>(token ? null : `/app/preferences${search}`)
+
+  useEffect(() => {
+    if (!token) return
+    applyUnsubscribeToken(token).then((scope) => {
+      const params = new URLSearchParams({ unsubscribe: 'true' })
+      if (scope) params.set('unsubscribed', scope)
+      else params.set('unsubscribe_error', 'true')
+      setTarget(`/app/preferences?${params}`)
+    })
+  }, [token])
+
+  if (!target) return null
+  return <Navigate to={target} replace />
+}
+
 export default function App() {
   return (
     <ThemeProvider>
@@ -30,7 +53,7 @@ export default function App() {
             <Route path="/privacy" element={<Privacy />} />
             <Route path="/terms" element={<Terms />} />
             <Route path="/items" element={<RedirectWithSearch to="/app/items" />} />
-            <Route path="/preferences" element={<RedirectWithSearch to="/app/preferences" />} />
+            <Route path="/preferences" element={<PreferencesRedirect />} />
             <Route path="/contact" element={<RedirectWithSearch to="/app/contact" />} />
             <Route path="/account" element={<RedirectWithSearch to="/app/account" />} />
             <Route path="/analytics" element={<RedirectWithSearch to="/app/analytics" />} />
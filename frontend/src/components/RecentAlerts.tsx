@@ -1,5 +1,4 @@
 import { useEffect, useState, useCallback } from 'react'
-import { supabase } from '../lib/supabase'
 import { useAuth } from '../context/AuthContext'
 import { eventBadgeColors, formatRelativeTime, isUserVisibleEventType } from '../lib/eventUtils'
 import {
@@ -9,7 +8,7 @@ import {
   removeFromWatchlist,
   type WatchlistTargets,
 } from '../lib/watchlist'
-import { formatAuthor, type CatalogEvent } from '../lib/catalog'
+import { fetchCatalogEventsPage, formatAuthor, type CatalogEvent } from '../lib/catalog'
 
 interface RecentAlertsProps {
   onWatchlistChange?: () => void
@@ -31,18 +30,12 @@ export default function RecentAlerts({ onWatchlistChange }: RecentAlertsProps) {
 
   useEffect(() => {
     async function fetchEvents() {
-      const { data, error } = await supabase
-        .from('catalog_events')
-        .select('id, item_id, edition_id, event_type, store, event_time, in_stock, old_value, new_value, name, author, link')
-        .neq('event_type', 'Unknown Change')
-        .order('event_time', { ascending: false })
-        .limit(20)
-
-      if (error) {
+      try {
+        const page = await fetchCatalogEventsPage({}, null, 20)
+        setEvents(page.rows.filter((e) => isUserVisibleEventType(e.event_type)))
+      } catch (error) {
         console.error('Error fetching events:', error)
         setEvents([])
-      } else {
-        setEvents(((data ?? []) as CatalogEvent[]).filter((e) => isUserVisibleEventType(e.event_type)))
       }
       setLoading(false)
     }
@@ -1,14 +1,14 @@
 import BookCover from './BookCover'
-import { formatAuthor, type CatalogListing } from '../lib/catalog'
+import { formatAuthor, type CatalogListingRow } from '../lib/catalog'
 
 type WatchlistCardProps = {
   watchlistId: string
-  catalog: CatalogListing | null
+  catalog: CatalogListingRow | null
   expired: boolean
   onRemove: (watchlistId: string) => void
 }
 
-function StatusPill({ catalog, expired }: { catalog: CatalogListing | null; expired: boolean }) {
+function StatusPill({ catalog, expired }: { catalog: CatalogListingRow | null; expired: boolean }) {
   if (!catalog) {
     return (
       <span className="inline-block px-2 py-0.5 rounded-full text-xs font-medium bg-gray-100 text-gray-600 dark:bg-gray-700 dark:text-gray-400">
@@ -1,3 +1,5 @@
+import { supabase } from './supabase'
+
 export type CatalogListing = {
   id: number
   listing_id: number
@@ -48,3 +50,134 @@ export function formatAuthor(author: string | null | undefined): string {
   const trimmed = author?.trim()
   return trimmed || '\u2014'
 }
+
+// ---------------------------------------------------------------------------
+// Keyset-paginated read API (RPCs in 027_catalog_read_api.sql)
+// ---------------------------------------------------------------------------
+
+export type CatalogListingRow = Pick<
+  CatalogListing,
+  | 'id'
+  | 'listing_id'
+  | 'edition_id'
+  | 'name'
+  | 'author'
+  | 'price'
+  | 'store'
+  | 'link'
+  | 'in_stock'
+  | 'last_in_stock'
+  | 'isbn'
+  | 'cover_url'
+  | 'open_library_id'
+>
+
+export type CatalogListingFilters = {
+  store?: string | null
+  inStock?: boolean | null
+  author?: string | null
+  search?: string | null
+  /** Keep rows in stock now or in stock since this ISO timestamp. */
+  activeSince?: string | null
+  editionIds?: number[] | null
+}
+
+export type ListingCursor = { name: string; listing_id: number }
+export type EventCursor = { event_time: string; id: number }
+
+export type Page<T, C> = {
+  rows: T[]
+  /** Cursor for the next page, or null when this was the last page. */
+  next: C | null
+}
+
+function listingFilterParams(filters: CatalogListingFilters) {
+  return {
+    p_store: filters.store ?? null,
+    p_in_stock: filters.inStock ?? null,
+    p_author: filters.author ?? null,
+    p_search: filters.search?.trim() || null,
+    p_active_since: filters.activeSince ?? null,
+  }
+}
+
+export async function fetchCatalogListingsPage(
+  filters: CatalogListingFilters,
+  after: ListingCursor | null,
+  limit: number,
+): Promise<Page<CatalogListingRow, ListingCursor>> {
+  const { data, error } = await supabase.rpc('catalog_listings_page', {
+    ...listingFilterParams(filters),
+    p_edition_ids: filters.editionIds ?? null,
+    p_after_name: after?.name ?? null,
+    p_after_id: after?.listing_id ?? null,
+    p_limit: limit,
+  })
+  if (error) throw error
+  const rows = (data ?? []) as CatalogListingRow[]
+  const last = rows[rows.length - 1]
+  return {
+    rows,
+    next: rows.length === limit && last ? { name: last.name, listing_id: last.listing_id } : null,
+  }
+}
+
+/** Fetch every page (for bounded filters such as a watchlist's edition ids). */
+export async function fetchAllCatalogListings(
+  filters: CatalogListingFilters,
+  pageSize = 200,
+): Promise<CatalogListingRow[]> {
+  const rows: CatalogListingRow[] = []
+  let cursor: ListingCursor | null = null
+  do {
+    const page: Page<CatalogListingRow, ListingCursor> = await fetchCatalogListingsPage(
+      filters,
+      cursor,
+      pageSize,
+    )
+    rows.push(...page.rows)
+    cursor = page.next
+  } while (cursor)
+  return rows
+}
+
+/** Exact for small result sets, planner estimate for large ones. */
+export async function fetchCatalogListingsCount(filters: CatalogListingFilters): Promise<number | null> {
+  const { data, error } = await supabase.rpc('catalog_listings_count', listingFilterParams(filters))
+  if (error) {
+    console.error('Error counting catalog listings:', error)
+    return null
+  }
+  return data as number
+}
+
+export async function fetchCatalogEventsPage(
+  options: { store?: string | null; eventTypes?: string[] | null; itemId?: number | null },
+  before: EventCursor | null,
+  limit: number,
+): Promise<Page<CatalogEvent, EventCursor>> {
+  const { data, error } = await supabase.rpc('catalog_events_page', {
+    p_store: options.store ?? null,
+    p_event_types: options.eventTypes ?? null,
+    p_item_id: options.itemId ?? null,
+    p_before_time: before?.event_time ?? null,
+    p_before_id: before?.id ?? null,
+    p_limit: limit,
+  })
+  if (error) throw error
+  const rows = (data ?? []) as CatalogEvent[]
+  const last = rows[rows.length - 1]
+  return {
+    rows,
+    next: rows.length === limit && last ? { event_time: last.event_time, id: last.id } : null,
+  }
+}
+
+export async function fetchCatalogStores(): Promise<string[]> {
+  const { data, error } = await supabase.rpc('catalog_stores')
+  if (error) {
+    console.error('Error fetching stores:', error)
+    return []
+  }
+  return ((data ?? []) as { store: string }[]).map((r) => r.store)
+}
@@ -0,0 +1,19 @@
+import { supabase } from './supabase'
+
+export type UnsubscribeScope = 'alerts' | 'announcements'
+
+/**
+ * Apply a signed unsubscribe token from an email link. Works without a
+ * session: the `unsubscribe` Edge Function verifies the token itself.
+ * Returns the scope that was turned off, or null if the token was rejected.
+ */
+export async function applyUnsubscribeToken(token: string): Promise<UnsubscribeScope | null> {
+  const { data, error } = await supabase.functions.invoke('unsubscribe', {
+    body: { token },
+  })
+  if (error || !data?.ok) {
+    console.error('Error applying unsubscribe token:', error ?? data)
+    return null
+  }
+  return data.scope as UnsubscribeScope
+}
@@ -4,12 +4,12 @@ import { supabase } from '../lib/supabase'
 import { useAuth } from '../context/AuthContext'
 import RecentAlerts from '../components/RecentAlerts'
 import WatchlistCard from '../components/WatchlistCard'
-import { type CatalogListing } from '../lib/catalog'
+import { fetchAllCatalogListings, type CatalogListingRow } from '../lib/catalog'
 
 interface WatchlistItem {
   id: string
   edition_id: number
-  catalog: CatalogListing | null
+  catalog: CatalogListingRow | null
 }
 
 const EXPIRY_MS = 30 * 24 * 60 * 60 * 1000
@@ -56,23 +56,17 @@ export default function Dashboard() {
     }
 
     const editionIds = (rows ?? []).map((r) => r.edition_id)
-    let catalogByEdition = new Map<number, CatalogListing>()
+    const catalogByEdition = new Map<number, CatalogListingRow>()
     if (editionIds.length > 0) {
-      const { data: catalog, error: catalogError } = await supabase
-        .from('catalog_listings')
-        .select('edition_id, name, author, link, store, price, in_stock, last_in_stock, isbn, cover_url, open_library_id')
-        .in('edition_id', editionIds)
-
-      if (catalogError) {
-        console.error('Error fetching catalog listings:', catalogError)
-      } else {
-        for (const row of catalog ?? []) {
-          const editionId = row.edition_id as number
-          const existing = catalogByEdition.get(editionId)
+      try {
+        for (const row of await fetchAllCatalogListings({ editionIds })) {
+          const existing = catalogByEdition.get(row.edition_id)
           if (!existing || (row.in_stock && !existing.in_stock)) {
-            catalogByEdition.set(editionId, row as CatalogListing)
+            catalogByEdition.set(row.edition_id, row)
           }
         }
+      } catch (catalogError) {
+        console.error('Error fetching catalog listings:', catalogError)
       }
     }
 
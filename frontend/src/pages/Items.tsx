@@ -1,5 +1,4 @@
 import { useEffect, useState, useMemo, useCallback } from 'react'
-import { supabase } from '../lib/supabase'
 import { useAuth } from '../context/AuthContext'
 import {
   addToWatchlist,
@@ -8,10 +7,21 @@ import {
   removeFromWatchlist,
   type WatchlistTargets,
 } from '../lib/watchlist'
-import { formatAuthor, type CatalogListing } from '../lib/catalog'
+import {
+  fetchCatalogListingsCount,
+  fetchCatalogListingsPage,
+  fetchCatalogStores,
+  formatAuthor,
+  type CatalogListingFilters,
+  type CatalogListingRow,
+  type ListingCursor,
+} from '../lib/catalog'
 import BookCover from '../components/BookCover'
 
-type Item = CatalogListing
+type Item = CatalogListingRow
+
+const ACTIVE_WINDOW_MS = 30 * 24 * 60 * 60 * 1000
+const SEARCH_DEBOUNCE_MS = 300
 
 type StockFilter = 'all' | 'in_stock'
 
@@ -49,12 +59,25 @@ function usePageSize() {
   return pageSize
 }
 
+function useDebounced<T>(value: T, delayMs: number): T {
+  const [debounced, setDebounced] = useState(value)
+
+  useEffect(() => {
+    const timer = window.setTimeout(() => setDebounced(value), delayMs)
+    return () => window.clearTimeout(timer)
+  }, [value, delayMs])
+
+  return debounced
+}
+
 export default function Items() {
   const { user } = useAuth()
   const pageSize = usePageSize()
 
   const [items, setItems] = useState<Item[]>([])
   const [loading, setLoading] = useState(true)
+  const [stores, setStores] = useState<string[]>([])
+  const [total, setTotal] = useState<number | null>(null)
   const [watchlistTargets, setWatchlistTargets] = useState<WatchlistTargets>({
     editionIds: new Set(),
   })
@@ -64,27 +87,67 @@ export default function Items() {
   const [storeFilter, setStoreFilter] = useState<string>('all')
   const [authorFilter, setAuthorFilter] = useState<string | null>(null)
   const [search, setSearch] = useState('')
-  const [page, setPage] = useState(1)
+  const debouncedSearch = useDebounced(search, SEARCH_DEBOUNCE_MS)
+
+  // Keyset paging: cursors[i] fetches page i; cursors[0] is always null.
+  const [cursors, setCursors] = useState<(ListingCursor | null)[]>([null])
+  const [pageIndex, setPageIndex] = useState(0)
+  const [nextCursor, setNextCursor] = useState<ListingCursor | null>(null)
+
+  const activeSince = useMemo(
+    () => new Date(Date.now() - ACTIVE_WINDOW_MS).toISOString(),
+    [],
+  )
+
+  const filters = useMemo<CatalogListingFilters>(
+    () => ({
+      store: storeFilter === 'all' ? null : storeFilter,
+      inStock: stockFilter === 'in_stock' ? true : null,
+      author: authorFilter,
+      search: debouncedSearch,
+      activeSince,
+    }),
+    [storeFilter, stockFilter, authorFilter, debouncedSearch, activeSince],
+  )
 
   useEffect(() => {
-    async function fetchItems() {
-      const cutoff = new Date(Date.now() - 30 * 24 * 60 * 60 * 1000).toISOString()
-      const { data, error } = await supabase
-        .from('catalog_listings')
-        .select('id, edition_id, name, author, price, store, link, in_stock, last_in_stock, isbn, cover_url, open_library_id')
-        .or(`last_in_stock.gte.${cutoff},in_stock.eq.true`)
-        .order('name', { ascending: true })
-
-      if (error) {
-        console.error('Error fetching items:', error)
-      } else {
-        setItems((data ?? []) as Item[])
-      }
-      setLoading(false)
-    }
-    fetchItems()
+    fetchCatalogStores().then(setStores)
   }, [])
 
+  useEffect(() => {
+    setCursors([null])
+    setPageIndex(0)
+
+    let cancelled = false
+    fetchCatalogListingsCount(filters).then((count) => {
+      if (!cancelled) setTotal(count)
+    })
+    return () => {
+      cancelled = true
+    }
+  }, [filters, pageSize])
+
+  const cursor = cursors[pageIndex] ?? null
+
+  useEffect(() => {
+    let cancelled = false
+    fetchCatalogListingsPage(filters, cursor, pageSize)
+      .then((page) => {
+        if (cancelled) return
+        setItems(page.rows)
+        setNextCursor(page.next)
+      })
+      .catch((error) => {
+        if (!cancelled) console.error('Error fetching items:', error)
+      })
+      .finally(() => {
+        if (!cancelled) setLoading(false)
+      })
+    return () => {
+      cancelled = true
+    }
+  }, [filters, cursor, pageSize])
+
   const fetchWatchlist = useCallback(async () => {
     if (!user) return
     setWatchlistTargets(await fetchWatchlistTargets(user.id))
@@ -94,51 +157,18 @@ export default function Items() {
     fetchWatchlist()
   }, [fetchWatchlist])
 
-  const stores = useMemo(() => {
-    const set = new Set<string>()
-    for (const item of items) {
-      if (item.store) set.add(item.store)
-    }
-    return Array.from(set).sort()
-  }, [items])
-
-  const filtered = useMemo(() => {
-    let result = items
-
-    if (stockFilter === 'in_stock') {
-      result = result.filter((i) => i.in_stock)
-    }
-
-    if (storeFilter !== 'all') {
-      result = result.filter((i) => i.store === storeFilter)
-    }
-
-    if (authorFilter) {
-      result = result.filter((i) => i.author?.trim() === authorFilter)
-    }
-
-    const q = search.toLowerCase().trim()
-    if (q) {
-      result = result.filter(
-        (i) =>
-          i.name.toLowerCase().includes(q) ||
-          (i.author?.toLowerCase().includes(q) ?? false),
-      )
-    }
+  const totalPages = total != null ? Math.max(1, Math.ceil(total / pageSize)) : null
+  const pageNum = pageIndex + 1
 
-    return result
-  }, [items, stockFilter, storeFilter, authorFilter, search])
+  const goToNextPage = () => {
+    if (!nextCursor) return
+    setCursors((prev) => [...prev.slice(0, pageIndex + 1), nextCursor])
+    setPageIndex((i) => i + 1)
+  }
 
-  useEffect(() => {
-    setPage(1)
-  }, [stockFilter, storeFilter, authorFilter, search])
-
-  const totalPages = Math.max(1, Math.ceil(filtered.length / pageSize))
-  const safePageNum = Math.min(page, totalPages)
-  const pageItems = filtered.slice(
-    (safePageNum - 1) * pageSize,
-    safePageNum * pageSize,
-  )
+  const goToPreviousPage = () => {
+    setPageIndex((i) => Math.max(0, i - 1))
+  }
 
   const toggleWatch = async (editionId: number) => {
     if (!user) return
@@ -259,12 +289,12 @@ export default function Items() {
 
       {/* Results info */}
       <p className="text-xs text-text-muted">
-        Showing {pageItems.length} of {filtered.length} item{filtered.length !== 1 ? 's' : ''}
-        {filtered.length !== items.length && ` (${items.length} total)`}
+        Showing {items.length}
+        {total != null && ` of ${total.toLocaleString()}`} item{(total ?? items.length) !== 1 ? 's' : ''}
       </p>
 
       {/* Table */}
-      {pageItems.length === 0 ? (
+      {items.length === 0 ? (
         <div className="rounded-xl bg-surface border border-border p-8 shadow-sm text-center">
           <p className="text-sm text-text-muted">No items match your filters.</p>
         </div>
@@ -286,11 +316,11 @@ export default function Items() {
                 </tr>
               </thead>
               <tbody>
-                {pageItems.map((item) => {
+                {items.map((item) => {
                   const editionId = item.edition_id
                   const watched = isItemWatched(editionId, watchlistTargets)
                   return (
-                    <tr key={item.id} className="border-b border-border last:border-0">
+                    <tr key={item.listing_id} className="border-b border-border last:border-0">
                       <td className="py-2.5 px-3">
                         <button
                           onClick={() => toggleWatch(editionId)}
@@ -370,21 +400,21 @@ export default function Items() {
           </div>
 
           {/* Pagination */}
-          {totalPages > 1 && (
+          {(pageIndex > 0 || nextCursor) && (
             <div className="flex items-center justify-between border-t border-border px-4 py-3">
               <button
-                onClick={() => setPage((p) => Math.max(1, p - 1))}
-                disabled={safePageNum <= 1}
+                onClick={goToPreviousPage}
+                disabled={pageIndex === 0}
                 className="text-sm text-brand hover:text-brand-dark font-medium disabled:text-text-muted disabled:cursor-not-allowed cursor-pointer"
               >
                 &larr; Previous
               </button>
               <span className="text-xs text-text-muted">
-                Page {safePageNum} of {totalPages}
+                Page {pageNum}{totalPages != null && ` of ${Math.max(totalPages, pageNum)}`}
               </span>
               <button
-                onClick={() => setPage((p) => Math.min(totalPages, p + 1))}
-                disabled={safePageNum >= totalPages}
+                onClick={goToNextPage}
+                disabled={!nextCursor}
                 className="text-sm text-brand hover:text-brand-dark font-medium disabled:text-text-muted disabled:cursor-not-allowed cursor-pointer"
               >
                 Next &rarr;
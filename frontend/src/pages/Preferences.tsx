@@ -27,6 +27,8 @@ export default function Preferences() {
   const [loading, setLoading] = useState(true)
   const [saving, setSaving] = useState(false)
   const [showUnsubscribeBanner, setShowUnsubscribeBanner] = useState(false)
+  const unsubscribedScope = searchParams.get('unsubscribed')
+  const unsubscribeFailed = searchParams.get('unsubscribe_error') === 'true'
   const pauseAllRef = useRef<HTMLDivElement>(null)
 
   useEffect(() => {
@@ -144,6 +146,9 @@ export default function Preferences() {
         <div className="rounded-xl border border-brand bg-brand/10 p-4 text-sm text-text">
           <div className="flex items-start justify-between gap-3">
             <p>
+              {unsubscribedScope === 'alerts' && 'You have been unsubscribed: all stock alerts are paused. '}
+              {unsubscribedScope === 'announcements' && 'You have been unsubscribed from announcements. '}
+              {unsubscribeFailed && 'That unsubscribe link is invalid or has expired. '}
               You can manage your notification preferences below, or pause all alerts using the toggle at the bottom.
             </p>
             <button
@@ -0,0 +1,147 @@
+"""On-disk HTTP response cache and per-host adaptive limits for requests sessions.
+
+Used by the offline backfill scripts, which re-fetch the same Shopify product
+pages and Open Library searches on every rerun.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from rate_limiter import AdaptiveLimiter, configure_host
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+# The cached body is already decoded; these would no longer describe it.
+_BODY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class CachedSession(requests.Session):
+    """
+    requests.Session that answers repeat GETs from `cache_dir`.
+
+    Only 200 responses are stored; entries older than `ttl_seconds` are
+    refetched. Cached responses carry `from_cache = True`. Safe to share
+    between threads (one file per URL, written atomically).
+    """
+
+    def __init__(self, cache_dir: str | Path, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        super().__init__()
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / digest[:2] / f"{digest}.json"
+
+    def _load(self, request) -> requests.Response | None:
+        path = self._path(request.url)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                return None
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp.headers = CaseInsensitiveDict(entry["headers"])
+        resp._content = base64.b64decode(entry["body"])
+        resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        resp.url = request.url
+        resp.request = request
+        resp.reason = "OK"
+        resp.from_cache = True
+        return resp
+
+    def _store(self, resp: requests.Response) -> None:
+        path = self._path(resp.request.url)
+        path.parent.mkdir(exist_ok=True)
+        entry = {
+            "url": resp.request.url,
+            "status": resp.status_code,
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() not in _BODY_HEADERS},
+            "body": base64.b64encode(resp.content).decode("ascii"),
+        }
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(entry))
+        tmp.replace(path)
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+        cached = self._load(request)
+        with self._stats_lock:
+            if cached is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is not None:
+            return cached
+        resp = super().send(request, **kwargs)
+        resp.from_cache = False
+        if resp.status_code == 200:
+            self._store(resp)
+        return resp
+
+
+class HostLimitAdapter(HTTPAdapter):
+    """Transport adapter gating requests through an AdaptiveLimiter.
+
+    At most `max_concurrent` requests are in flight (fewer while the host is
+    throttling or slow), each optionally followed by `delay_seconds` before
+    its slot is released.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        delay_seconds: float = 0.0,
+        limiter: AdaptiveLimiter | None = None,
+        **kwargs,
+    ):
+        super().__init__(pool_maxsize=max(max_concurrent, 1), **kwargs)
+        self.limiter = limiter or AdaptiveLimiter(max_concurrent, initial=max_concurrent)
+        self.delay_seconds = delay_seconds
+
+    def send(self, request, **kwargs):
+        started = self.limiter.acquire()
+        status, error = None, False
+        try:
+            resp = super().send(request, **kwargs)
+            status = getattr(resp, "status_code", None)
+            return resp
+        except requests.RequestException:
+            error = True
+            raise
+        finally:
+            if self.delay_seconds:
+                time.sleep(self.delay_seconds)
+            self.limiter.release(started, status, error=error)
+
+
+def limit_host(session: requests.Session, url: str, max_concurrent: int, delay_seconds: float = 0.0):
+    """Mount a HostLimitAdapter for the scheme://host of `url` on `session`.
+
+    The adapter shares the process-wide limiter for that host (capped at
+    `max_concurrent`), so rate_limiter.get_with_retry sees the same window.
+    """
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    session.mount(
+        f"{parts.scheme}://{parts.netloc}/",
+        HostLimitAdapter(max_concurrent, delay_seconds, limiter=configure_host(url, max_concurrent)),
+    )
@@ -0,0 +1,98 @@
+"""
+Session factory for the scrapers: `requests` (default) or an HTTP/2 backend.
+
+With SCRAPER_HTTP_BACKEND=http2, open_session() returns an Http2Session, an
+httpx.Client with HTTP/2 enabled, so the hundreds of small product requests to
+one Shopify host are multiplexed over a single connection instead of a pool of
+HTTP/1.1 sockets. It needs `h2` (`pip install "httpx[http2]"`); without it the
+requests backend is used and a warning logged.
+
+Both backends expose the slice of requests.Session the scrapers use (`headers`,
+get() returning a requests.Response, close(), context manager) and raise
+requests exceptions, so rate_limiter.get_with_retry works with either.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import h2  # noqa: F401  (httpx's HTTP/2 support)
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ENV = "SCRAPER_HTTP_BACKEND"
+BACKENDS = ("requests", "http2")
+
+
+def _to_requests_response(r) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = r.status_code
+    resp.reason = r.reason_phrase
+    resp.headers = CaseInsensitiveDict(r.headers)
+    resp._content = r.content
+    resp.encoding = r.encoding
+    resp.url = str(r.url)
+    resp.http_version = r.http_version
+    return resp
+
+
+class Http2Session:
+    """requests.Session look-alike over one pooled, HTTP/2-enabled httpx.Client.
+
+    httpx.Client is thread-safe, so concurrent fetches share its connections
+    (one per host over HTTP/2). `transport` overrides the network layer, e.g.
+    to reach a local fixture server.
+    """
+
+    def __init__(self, transport=None, max_connections: int = 10):
+        if httpx is None:
+            raise RuntimeError('Http2Session needs httpx with HTTP/2 support: pip install "httpx[http2]"')
+        self.headers = CaseInsensitiveDict()
+        self._client = httpx.Client(
+            http2=True,
+            transport=transport,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_connections),
+        )
+        # Count scraper traffic as "http", not "db", in run telemetry.
+        self._client.telemetry_kind = "http"
+
+    def get(self, url, params=None, headers=None, timeout=None) -> requests.Response:
+        try:
+            r = self._client.get(url, params=params, headers={**self.headers, **(headers or {})}, timeout=timeout)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except httpx.RequestError as e:
+            raise requests.ConnectionError(str(e)) from e
+        return _to_requests_response(r)
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_session(headers: dict | None = None, backend: str | None = None):
+    """A scraper session on `backend` (default: $SCRAPER_HTTP_BACKEND, else requests)."""
+    backend = (backend or os.getenv(BACKEND_ENV) or "requests").strip().lower()
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown {BACKEND_ENV}={backend!r}; using requests")
+        backend = "requests"
+    if backend == "http2" and httpx is None:
+        logger.warning(f"{BACKEND_ENV}=http2 but httpx/h2 is not installed; using requests")
+        backend = "requests"
+    session = Http2Session() if backend == "http2" else requests.Session()
+    session.headers.update(headers or {})
+    return session
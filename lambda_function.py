@@ -7,8 +7,27 @@ import argparse
 from datetime import datetime, timezone
 from supabase import create_client
 from scrapers.broken_binding_sf import broken_binding_checks
+from scrapers.check_private_sales import private_sale_report
+from scrapers.folio_society_sf import STORE_NAME as FOLIO_STORE_NAME
+from scrapers.folio_society_sf import fetch_product_details as fetch_folio_details
 from scrapers.folio_society_sf import folio_society_checks
+from scrapers.product_cache import get_run_cache, reset_run_cache
+from scrapers.registry import (
+    DEFAULT_SOURCES,
+    SCHEDULE_SLACK_SECONDS,
+    SOURCE_COLUMNS,
+    UNKNOWN_STORE_RANK,
+    SourceClaim,
+    due_sources,
+    sorted_sources,
+    source_from_row,
+    store_precedence,
+    targets_for,
+)
+from batch_writer import merge_write_stats, write_rows
 from email_notifier import send_email
+from telemetry import finish_run, stage, start_run, timed
+from unsubscribe import unsubscribe_footer_html
 from open_library import lookup_author
 from silver_catalog import (
     build_retailer_listing_row,
@@ -27,26 +46,24 @@ seed_mode = os.getenv('SEED_MODE', '').lower()
 if seed_mode in {'1', 'true', 'yes', 'y', 'on'}:
     run_mode = 'seed'
 
+# Also record each intra-day stock/price transition in item_status_intraday
+# (item_status_daily keeps only the latest state per day).
+record_intraday_transitions = os.getenv('SNAPSHOT_INTRADAY_TRANSITIONS', '').lower() in {
+    '1', 'true', 'yes', 'y', 'on'
+}
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 _supabase_client = None
+# {run_id: {table: counters}} accumulated by the batch writers, flushed to run_log.
+_write_stats_by_run = {}
+# Scraper id (collections.scraper) -> check function taking `collections=[{"url", "store"}]`.
+# Which collections run, how often and in what precedence comes from the
+# `collections` table; see scrapers/registry.py.
 STORE_CHECKS = {
-    "Broken Binding": broken_binding_checks,
-    "Folio Society - Sci-Fi & Fantasy": folio_society_checks,
-}
-
-BROKEN_BINDING_STORE_PRECEDENCE = [
-    # Order matches `broken_binding_sf.py` collection URL iteration.
-    "Broken Binding - To The Stars",
-    "Broken Binding - The Infirmary",
-    "Broken Binding - Dragon's Hoard",
-    "Broken Binding - The Graveyard",
-]
-
-STORE_PRECEDENCE = {
-    **{store: i for i, store in enumerate(BROKEN_BINDING_STORE_PRECEDENCE)},
-    "Folio Society - Sci-Fi & Fantasy": 1000,
+    "broken_binding": broken_binding_checks,
+    "folio_society": folio_society_checks,
 }
 
 PRICE_PLACEHOLDER = "No price found"
@@ -55,6 +72,13 @@ MIN_EMAILABLE_PRICE_CHANGE_CENTS = 10  # $0.10; ignore minor seller-side price f
 
 DEFAULT_EMAILABLE_EVENT_TYPES = frozenset({"New Item", "Restocked", "Price Change"})
 
+# Links per `in_("link", ...)` lookup; full product URLs make long query strings.
+LINK_LOOKUP_CHUNK_SIZE = 100
+# Item IDs per touch_items_seen RPC (sent in the POST body, not the URL).
+TOUCH_CHUNK_SIZE = 5000
+# Page size for paged reads; matches the PostgREST max-rows default.
+READ_PAGE_SIZE = 1000
+
 def get_supabase():
     global _supabase_client
     if _supabase_client is None:
@@ -62,6 +86,16 @@ def get_supabase():
     return _supabase_client
 
 
+def record_write_stats(run_id, result):
+    """Accumulate per-table write counters for this run and log rejected rows."""
+    merge_write_stats(_write_stats_by_run.setdefault(run_id, {}), result)
+    if result.rows_failed:
+        logger.error(
+            f"[{run_id}] {result.rows_failed} {result.table} rows failed to write "
+            f"(first error: {result.errors[0] if result.errors else '?'})."
+        )
+
+
 def parse_price_cents(price_str):
     """Parse a price string like '$10.99' or '£24.99' to integer cents."""
     cleaned = re.sub(r"[^\d.]", "", price_str or "")
@@ -232,7 +266,7 @@ def load_catalog_state(run_id):
         response = (
             get_supabase()
             .table("items_seen")
-            .select("name, price, store, link, in_stock, author")
+            .select("id, name, price, store, link, in_stock, author")
             .execute()
         )
         items = response.data or []
@@ -244,14 +278,25 @@ def load_catalog_state(run_id):
 
 
 def save_bronze_items(items, run_id):
-    """Upsert Bronze items_seen rows (event/snapshot foreign keys)."""
+    """Upsert Bronze items_seen rows and return {link: items_seen_id}.
+
+    Uses the upsert's representation response (trimmed to `id, link`), so the
+    caller gets IDs without a second query over every scraped link.
+    """
     if not items:
-        return
-    try:
-        get_supabase().table("items_seen").upsert(items, on_conflict="link").execute()
-        logger.info(f"[{run_id}] Upserted {len(items)} rows into items_seen (bronze).")
-    except Exception as e:
-        logger.error(f"[{run_id}] Error saving bronze items: {e}")
+        return {}
+    result = write_rows(
+        get_supabase(),
+        "items_seen",
+        items,
+        upsert=True,
+        on_conflict="link",
+        returning="id, link",
+        run_id=run_id,
+    )
+    record_write_stats(run_id, result)
+    logger.info(f"[{run_id}] Upserted {result.rows_written} rows into items_seen (bronze).")
+    return {r["link"]: r["id"] for r in result.returned if r.get("link")}
 
 
 def persist_bronze(items, run_id):
@@ -264,22 +309,103 @@ def persist_bronze(items, run_id):
     """
     if not items:
         return {}
-    save_bronze_items(items, run_id)
-    links = [item["link"] for item in items if item.get("link")]
-    return fetch_item_ids_by_link(links, run_id)
+    link_to_id = save_bronze_items(items, run_id)
+    # Rows that failed to write may still exist from earlier runs; look up only those.
+    missing = [item["link"] for item in items if item.get("link") and item["link"] not in link_to_id]
+    if missing:
+        link_to_id.update(fetch_item_ids_by_link(missing, run_id))
+    return link_to_id
+
+
+def known_item_ids(items, seen_by_link, skip_links, run_id):
+    """Return {link: items_seen_id} for items outside `skip_links`.
+
+    IDs come from the diff snapshot already loaded by load_catalog_state; only
+    links missing from it are looked up.
+    """
+    link_to_id = {}
+    unknown = []
+    for item in items:
+        link = item.get("link")
+        if not link or link in skip_links:
+            continue
+        item_id = (seen_by_link.get(link) or {}).get("id")
+        if item_id:
+            link_to_id[link] = item_id
+        else:
+            unknown.append(link)
+    if unknown:
+        link_to_id.update(fetch_item_ids_by_link(unknown, run_id))
+    return link_to_id
+
+
+def touch_items_seen(item_ids, run_id):
+    """Bump items_seen.last_seen_at for unchanged rows without re-upserting them."""
+    if not item_ids:
+        return
+    item_ids = list(item_ids)
+    try:
+        for start in range(0, len(item_ids), TOUCH_CHUNK_SIZE):
+            get_supabase().rpc(
+                "touch_items_seen",
+                {"p_item_ids": item_ids[start:start + TOUCH_CHUNK_SIZE]},
+            ).execute()
+        logger.info(f"[{run_id}] Touched last_seen_at on {len(item_ids)} unchanged items_seen rows.")
+    except Exception as e:
+        logger.error(f"[{run_id}] Error touching items_seen: {e}")
+
+
+def persist_bronze_changes(items, changed_links, seen_by_link, run_id):
+    """
+    Write only new/changed Bronze rows and return {link: items_seen_id} for all items.
+
+    Unchanged rows already hold the scraped values, so re-upserting them every run
+    only produces WAL and index churn. They get a bulk last_seen_at touch instead.
+    """
+    seen_at = datetime.now(timezone.utc).isoformat()
+    changed = [
+        {**item, "last_seen_at": seen_at}
+        for item in items
+        if item.get("link") in changed_links
+    ]
+    link_to_id = known_item_ids(items, seen_by_link, changed_links, run_id)
+    touch_items_seen(list(link_to_id.values()), run_id)
+    link_to_id.update(persist_bronze(changed, run_id))
+    logger.info(
+        f"[{run_id}] Bronze delta: {len(changed)} upserted, "
+        f"{len(items) - len(changed)} unchanged."
+    )
+    return link_to_id
+
+
+def collect_item_media(items):
+    """{link: {"isbn", "cover_url"}} from scraped rows that carry either.
+
+    Media is Silver-only (editions), so it travels beside the canonical items
+    rather than in them; Bronze items_seen has no such columns.
+    """
+    media_by_link = {}
+    for item in items:
+        link = item.get("link")
+        if not link:
+            continue
+        media = {k: item[k] for k in ("isbn", "cover_url") if item.get(k)}
+        if media:
+            media_by_link.setdefault(link, {}).update(media)
+    return media_by_link
 
 
-def persist_silver_catalog(items, link_to_id, run_id):
+def persist_silver_catalog(items, link_to_id, run_id, media_by_link=None):
     """
     Write Silver catalog (works / editions / retailer_listings).
 
     Analytics / enrichment path: heavier per-item upserts. This runs AFTER
     notifications are sent so it never delays alerts.
     """
-    upsert_retailer_listings(items, link_to_id, run_id)
+    upsert_retailer_listings(items, link_to_id, run_id, media_by_link)
 
 
-def persist_catalog(items, run_id):
+def persist_catalog(items, run_id, media_by_link=None):
     """
     Bronze + Silver in a single pass. Used by seed mode, where there are no
     notifications to race and ordering is irrelevant.
@@ -287,16 +413,18 @@ def persist_catalog(items, run_id):
     if not items:
         return {}
     link_to_id = persist_bronze(items, run_id)
-    persist_silver_catalog(items, link_to_id, run_id)
+    persist_silver_catalog(items, link_to_id, run_id, media_by_link)
     return link_to_id
 
 
-def upsert_retailer_listings(items, link_to_id, run_id):
+def upsert_retailer_listings(items, link_to_id, run_id, media_by_link=None):
     """
     Upsert Silver retailer_listings for scraped items.
-    Creates missing works/editions when needed.
+    Creates missing works/editions when needed; ISBN/cover come from
+    `media_by_link` (see collect_item_media) or the item itself.
     Must never raise: failures are logged and swallowed.
     """
+    media_by_link = media_by_link or {}
     if not items:
         return
 
@@ -326,14 +454,15 @@ def upsert_retailer_listings(items, link_to_id, run_id):
                 )
                 continue
 
+            media = media_by_link.get(link, {})
             resolved = ensure_catalog_for_item(
                 get_supabase(),
                 title=name,
                 store=store,
                 author=item.get("author"),
                 collection_map=collection_map,
-                isbn=item.get("isbn"),
-                cover_url=item.get("cover_url"),
+                isbn=media.get("isbn") or item.get("isbn"),
+                cover_url=media.get("cover_url") or item.get("cover_url"),
             )
             if not resolved:
                 logger.warning(
@@ -354,10 +483,18 @@ def upsert_retailer_listings(items, link_to_id, run_id):
             )
 
         if rows:
-            get_supabase().table("retailer_listings").upsert(
-                rows, on_conflict="collection_id,retailer_url_normalized"
-            ).execute()
-            logger.info(f"[{run_id}] Upserted {len(rows)} rows into retailer_listings.")
+            result = write_rows(
+                get_supabase(),
+                "retailer_listings",
+                rows,
+                upsert=True,
+                on_conflict="collection_id,retailer_url_normalized",
+                run_id=run_id,
+            )
+            record_write_stats(run_id, result)
+            logger.info(
+                f"[{run_id}] Upserted {result.rows_written} rows into retailer_listings."
+            )
         else:
             logger.warning(f"[{run_id}] No retailer_listing rows to upsert.")
 
@@ -366,22 +503,26 @@ def upsert_retailer_listings(items, link_to_id, run_id):
 
 
 def fetch_item_ids_by_link(links, run_id):
+    """Return {link: items_seen_id}, querying in chunks to keep URLs short."""
     if not links:
         return {}
+    links = list(links)
+    result = {}
     try:
-        resp = (
-            get_supabase()
-            .table("items_seen")
-            .select("id, link")
-            .in_("link", list(links))
-            .execute()
-        )
-        rows = resp.data or []
-        logger.info(f"[{run_id}] Fetched {len(rows)} item IDs by link.")
-        return {r["link"]: r["id"] for r in rows}
+        for start in range(0, len(links), LINK_LOOKUP_CHUNK_SIZE):
+            resp = (
+                get_supabase()
+                .table("items_seen")
+                .select("id, link")
+                .in_("link", links[start:start + LINK_LOOKUP_CHUNK_SIZE])
+                .execute()
+            )
+            result.update({r["link"]: r["id"] for r in (resp.data or [])})
+        logger.info(f"[{run_id}] Fetched {len(result)} item IDs by link.")
+        return result
     except Exception as e:
         logger.error(f"[{run_id}] Error fetching item ids by link: {e}")
-        return {}
+        return result
 
 
 def insert_events(event_rows, run_id):
@@ -390,39 +531,112 @@ def insert_events(event_rows, run_id):
         return []
     for row in event_rows:
         row["run_id"] = run_id
-    try:
-        resp = get_supabase().table("item_events").insert(event_rows).execute()
-        inserted = resp.data or []
-        logger.info(f"[{run_id}] Inserted {len(inserted)} rows into item_events.")
-        return inserted
-    except Exception as e:
-        logger.error(f"[{run_id}] Error inserting item_events: {e}")
-        return []
+    result = write_rows(get_supabase(), "item_events", event_rows, returning="*", run_id=run_id)
+    record_write_stats(run_id, result)
+    logger.info(f"[{run_id}] Inserted {len(result.returned)} rows into item_events.")
+    return result.returned
 
 
 def insert_email_log(log_rows, run_id):
     """Insert email_log rows and return inserted rows with generated IDs."""
     if not log_rows:
         return []
-    try:
-        resp = get_supabase().table("email_log").insert(log_rows).execute()
-        inserted = resp.data or []
-        logger.info(f"[{run_id}] Inserted {len(inserted)} email_log rows.")
-        return inserted
-    except Exception as e:
-        logger.error(f"[{run_id}] Error inserting email_log: {e}")
-        return []
+    result = write_rows(get_supabase(), "email_log", log_rows, returning="*", run_id=run_id)
+    record_write_stats(run_id, result)
+    logger.info(f"[{run_id}] Inserted {len(result.returned)} email_log rows.")
+    return result.returned
 
 
 def insert_email_log_events(rows, run_id):
     """Insert email_log_events junction rows."""
     if not rows:
         return
+    result = write_rows(get_supabase(), "email_log_events", rows, run_id=run_id)
+    record_write_stats(run_id, result)
+    logger.info(f"[{run_id}] Inserted {result.rows_written} email_log_events rows.")
+
+
+def load_store_sources(run_id):
+    """Active, scrapeable collections in priority order; DEFAULT_SOURCES if none can be read."""
+    try:
+        rows = (
+            get_supabase()
+            .table("collections")
+            .select(SOURCE_COLUMNS)
+            .eq("active", True)
+            .execute()
+            .data
+        ) or []
+    except Exception as e:
+        logger.error(f"[{run_id}] Error loading store registry: {e}; using default stores.")
+        return list(DEFAULT_SOURCES)
+
+    sources = []
+    for row in rows:
+        source = source_from_row(row)
+        if source is None:
+            continue
+        if source.scraper not in STORE_CHECKS:
+            logger.warning(
+                f"[{run_id}] Collection {source.store_name!r} has unknown scraper {source.scraper!r}; skipping."
+            )
+            continue
+        sources.append(source)
+    if not sources:
+        logger.warning(f"[{run_id}] No scrapeable collections in the store registry; using default stores.")
+        return list(DEFAULT_SOURCES)
+    return sorted_sources(sources)
+
+
+def claim_store_sources(sources, run_id, force=False, dry_run=False):
+    """Atomically claim `sources` for this run via claim_due_collections.
+
+    The claim sets last_scraped_at and a lease, so an overlapping run sees
+    these collections as taken. Only sources that are unleased and still due
+    (all unleased ones when `force`) come back. Sources without a collection
+    row (DEFAULT_SOURCES) can't be claimed and are kept. So is everything in
+    dry runs, which write nothing, and when the RPC fails.
+    """
+    ids = [s.collection_id for s in sources if s.collection_id is not None]
+    if dry_run or not ids:
+        return SourceClaim(list(sources))
     try:
-        get_supabase().table("email_log_events").insert(rows).execute()
-        logger.info(f"[{run_id}] Inserted {len(rows)} email_log_events rows.")
+        rows = get_supabase().rpc(
+            "claim_due_collections",
+            {"p_ids": ids, "p_force": force, "p_slack_seconds": SCHEDULE_SLACK_SECONDS},
+        ).execute().data or []
     except Exception as e:
-        logger.error(f"[{run_id}] Error inserting email_log_events: {e}")
+        logger.error(f"[{run_id}] Error claiming collections: {e}; scraping without a claim.")
+        return SourceClaim(list(sources))
+
+    previous = {row["id"]: row.get("previous_scraped_at") for row in rows}
+    claimed = [s for s in sources if s.collection_id is None or s.collection_id in previous]
+    if len(claimed) < len(sources):
+        logger.info(
+            f"[{run_id}] {len(sources) - len(claimed)} due collections already claimed by another run."
+        )
+    return SourceClaim(claimed, previous)
+
+
+def release_store_sources(claim, run_id):
+    """Drop this run's leases; restore last_scraped_at too if the run wrote no items.
+
+    A run that failed or scraped nothing before touching items_seen leaves the
+    collections due again for the next invocation.
+    """
+    if not claim.previous_scraped_at:
+        return
+    by_values = {}
+    for collection_id, previous in claim.previous_scraped_at.items():
+        values = {"scrape_lease_until": None}
+        if not claim.items_written:
+            values["last_scraped_at"] = previous
+        by_values.setdefault(tuple(values.items()), []).append(collection_id)
+    try:
+        for values, ids in by_values.items():
+            get_supabase().table("collections").update(dict(values)).in_("id", ids).execute()
+    except Exception as e:
+        logger.error(f"[{run_id}] Error releasing collection claims: {e}")
 
 
 def insert_run_log(run_id):
@@ -435,40 +649,122 @@ def insert_run_log(run_id):
 
 
 def update_run_log(run_id, **counters):
-    """Update run_log with final counters and status."""
+    """Update run_log with final counters, per-table write stats, stage telemetry and status."""
+    payload = {
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        **counters,
+    }
+    write_stats = _write_stats_by_run.pop(run_id, None)
+    if write_stats:
+        payload["write_stats"] = write_stats
+    run_telemetry = finish_run(run_id)
+    if run_telemetry:
+        payload["telemetry"] = run_telemetry
     try:
-        get_supabase().table("run_log").update({
-            "finished_at": datetime.now(timezone.utc).isoformat(),
-            **counters,
-        }).eq("run_id", run_id).execute()
+        get_supabase().table("run_log").update(payload).eq("run_id", run_id).execute()
         logger.info(f"[{run_id}] Updated run_log (status={counters.get('status', '?')}).")
     except Exception as e:
         logger.error(f"[{run_id}] Error updating run_log: {e}")
 
 
+def load_today_snapshots(snapshot_date, run_id):
+    """Return {item_id: {"in_stock", "price"}} for rows already snapshotted on `snapshot_date`."""
+    snapshots = {}
+    try:
+        offset = 0
+        while True:
+            resp = (
+                get_supabase()
+                .table("item_status_daily")
+                .select("item_id, in_stock, price")
+                .eq("snapshot_date", snapshot_date)
+                .order("item_id")
+                .range(offset, offset + READ_PAGE_SIZE - 1)
+                .execute()
+            )
+            page = resp.data or []
+            for r in page:
+                snapshots[r["item_id"]] = {"in_stock": r.get("in_stock"), "price": r.get("price")}
+            if len(page) < READ_PAGE_SIZE:
+                break
+            offset += READ_PAGE_SIZE
+        logger.info(f"[{run_id}] Loaded {len(snapshots)} snapshots already taken on {snapshot_date}.")
+        return snapshots
+    except Exception as e:
+        logger.error(f"[{run_id}] Error loading today's snapshots: {e}")
+        return None
+
+
 def insert_daily_snapshots(items, link_to_id, run_id):
-    """Insert once-per-day item snapshots. Idempotent via unique(snapshot_date, item_id)."""
+    """
+    Write once-per-day item snapshots, keyed by unique(snapshot_date, item_id).
+
+    Items that already have today's row are skipped unless in_stock or price
+    changed intra-day, so only the first run of the day sends the full set.
+    """
+    snapshot_date = datetime.now(timezone.utc).date().isoformat()
+    existing = load_today_snapshots(snapshot_date, run_id)
+    if existing is None:
+        # Could not tell what is already stored; fall back to the idempotent full upsert.
+        existing = {}
+
     rows = []
+    transitions = []
     for item in items:
         item_id = link_to_id.get(item.get("link"))
         if not item_id:
             continue
-        rows.append({
+        prev = existing.get(item_id)
+        if prev is not None and (
+            prev["in_stock"] == item.get("in_stock") and prev["price"] == item.get("price")
+        ):
+            continue
+        row = {
+            "snapshot_date": snapshot_date,
             "item_id": item_id,
             "store": item.get("store"),
             "in_stock": item.get("in_stock"),
             "price": item.get("price"),
             "price_cents": parse_price_cents(item.get("price")),
-        })
+        }
+        rows.append(row)
+        if prev is not None:
+            transitions.append({
+                **row,
+                "run_id": run_id,
+                "old_in_stock": prev["in_stock"],
+                "old_price": prev["price"],
+            })
+    logger.info(
+        f"[{run_id}] Daily snapshots: {len(rows)} to write, "
+        f"{len(transitions)} intra-day changes, {len(items) - len(rows)} unchanged/skipped."
+    )
     if not rows:
         return
+    result = write_rows(
+        get_supabase(),
+        "item_status_daily",
+        rows,
+        upsert=True,
+        on_conflict="snapshot_date,item_id",
+        run_id=run_id,
+    )
+    record_write_stats(run_id, result)
+    logger.info(f"[{run_id}] Upserted {result.rows_written} daily snapshots.")
+
+    if record_intraday_transitions and transitions:
+        result = write_rows(get_supabase(), "item_status_intraday", transitions, run_id=run_id)
+        record_write_stats(run_id, result)
+        logger.info(f"[{run_id}] Inserted {result.rows_written} intra-day transitions.")
+
+
+def refresh_gold_analytics(run_id):
+    """Fold closed snapshot days and new item_events into the Gold analytics tables."""
     try:
-        get_supabase().table("item_status_daily").upsert(
-            rows, on_conflict="snapshot_date,item_id"
-        ).execute()
-        logger.info(f"[{run_id}] Upserted {len(rows)} daily snapshots.")
+        resp = get_supabase().rpc("refresh_gold_analytics", {}).execute()
+        logger.info(f"[{run_id}] Refreshed Gold analytics: {resp.data}")
     except Exception as e:
-        logger.error(f"[{run_id}] Error inserting daily snapshots: {e}")
+        logger.error(f"[{run_id}] Error refreshing Gold analytics: {e}")
 
 
 def _build_email_table(items):
@@ -512,6 +808,7 @@ def _build_email_table(items):
     """
 
 
+@timed("notify")
 def send_notifications(
     *,
     recipients,
@@ -544,14 +841,15 @@ def send_notifications(
         return 0, 0
 
     user_ids = [r["id"] for r in recipients if r["id"]]
-    store_prefs = get_store_preferences_for_users(user_ids, run_id)
-    event_prefs = get_event_preferences_for_users(user_ids, run_id)
-    user_watchlists = get_watchlist_for_users(user_ids, run_id)
+    with stage("notify.preferences"):
+        store_prefs = get_store_preferences_for_users(user_ids, run_id)
+        event_prefs = get_event_preferences_for_users(user_ids, run_id)
+        user_watchlists = get_watchlist_for_users(user_ids, run_id)
 
-    edition_by_link = fetch_edition_ids_by_link(
-        [i["link"] for i in items_to_email if i.get("link")],
-        run_id,
-    )
+        edition_by_link = fetch_edition_ids_by_link(
+            [i["link"] for i in items_to_email if i.get("link")],
+            run_id,
+        )
 
     email_subject = "SFF Stock Alert - New Books Available!"
     email_results = []
@@ -588,11 +886,13 @@ def send_notifications(
     <body>
         <p>New book(s) available:</p>
         {html_table}
+        {unsubscribe_footer_html(recip["id"])}
     </body>
     </html>
     """
         try:
-            recip_ses_message_id = send_email(email_subject, message, recip["email"])
+            with stage("notify.send"):
+                recip_ses_message_id = send_email(email_subject, message, recip["email"])
             email_results.append({
                 "user_id": recip["id"], "success": True,
                 "error_message": None, "event_ids": recip_event_ids,
@@ -621,11 +921,12 @@ def send_notifications(
         } for r in email_results]
         inserted_logs = insert_email_log(log_rows, run_id)
 
-        # Insert email_log_events junction rows
-        log_idx_to_event_ids = {i: r["event_ids"] for i, r in enumerate(email_results)}
+        # Insert email_log_events junction rows. Match on user_id (one email per
+        # user per run) rather than position: chunked inserts may drop failed rows.
+        event_ids_by_user = {r["user_id"]: r["event_ids"] for r in email_results}
         junction_rows = []
-        for i, log_row in enumerate(inserted_logs):
-            for event_id in log_idx_to_event_ids.get(i, []):
+        for log_row in inserted_logs:
+            for event_id in event_ids_by_user.get(log_row.get("user_id"), []):
                 junction_rows.append({
                     "email_log_id": log_row["id"],
                     "event_id": event_id,
@@ -639,6 +940,43 @@ def check_for_updates(store_filter=None):
     run_id = str(uuid.uuid4())
     dry_run = run_mode == 'dev'
     logger.info(f"[{run_id}] Starting update check (dry_run={dry_run}).")
+    start_run(run_id)
+    started_at = datetime.now(timezone.utc)
+
+    sources = load_store_sources(run_id)
+    if store_filter is not None:
+        # A scraper id or a store name; forces the scrape regardless of schedule.
+        selected_sources = [s for s in sources if store_filter in (s.scraper, s.store_name)]
+        if not selected_sources:
+            allowed_values = ", ".join(sorted({s.scraper for s in sources} | {s.store_name for s in sources}))
+            raise ValueError(
+                f"Invalid store '{store_filter}'. Allowed values: {allowed_values}"
+            )
+    else:
+        selected_sources = due_sources(sources, started_at)
+        if not selected_sources:
+            logger.info(f"[{run_id}] No collections due; skipping run.")
+            finish_run(run_id)
+            return
+
+    claim = claim_store_sources(
+        selected_sources, run_id, force=store_filter is not None, dry_run=dry_run
+    )
+    if not claim.sources:
+        logger.info(f"[{run_id}] Due collections are claimed by an overlapping run; skipping run.")
+        finish_run(run_id)
+        return
+    try:
+        _run_update_check(run_id, dry_run, sources, claim)
+    finally:
+        release_store_sources(claim, run_id)
+
+
+def _run_update_check(run_id, dry_run, sources, claim):
+    """Scrape the claimed collections, diff, notify and persist."""
+    selected_sources = claim.sources
+    precedence = store_precedence(sources)
+
     if not dry_run:
         insert_run_log(run_id)
 
@@ -652,7 +990,7 @@ def check_for_updates(store_filter=None):
             items_by_link.setdefault(link, []).append(item)
 
         def store_rank(store_name):
-            return STORE_PRECEDENCE.get(store_name, 10_000)
+            return precedence.get(store_name, UNKNOWN_STORE_RANK)
 
         canonical = []
         for link, rows in items_by_link.items():
@@ -713,26 +1051,30 @@ def check_for_updates(store_filter=None):
         seen_items = []
         seen_items_dict = {}
     else:
-        recipients = get_recipients_for_run(run_id)
-        seen_items = load_catalog_state(run_id)
+        with stage("load_state"):
+            recipients = get_recipients_for_run(run_id)
+            seen_items = load_catalog_state(run_id)
         seen_items_dict = {
             item['link']: {k: v for k, v in item.items() if k != 'link'}
             for item in seen_items
         }
 
-    if store_filter is not None:
-        if store_filter not in STORE_CHECKS:
-            allowed_values = ", ".join(sorted(STORE_CHECKS.keys()))
-            raise ValueError(
-                f"Invalid store '{store_filter}'. Allowed values: {allowed_values}"
-            )
-        new_items = STORE_CHECKS[store_filter]()
-        logger.info(f"[{run_id}] Running single-store scrape for: {store_filter}")
-    else:
-        new_items = []
-        for store_name, check_fn in STORE_CHECKS.items():
-            logger.info(f"[{run_id}] Running scraper for store: {store_name}")
-            new_items.extend(check_fn())
+    reset_run_cache()
+    new_items = []
+    # Scrapers run in the priority order of their highest-priority due collection.
+    for scraper in dict.fromkeys(s.scraper for s in selected_sources):
+        targets = targets_for(selected_sources, scraper)
+        logger.info(
+            f"[{run_id}] Running scraper {scraper} for: {', '.join(t['store'] for t in targets)}"
+        )
+        with stage(f"scrape:{scraper}"):
+            new_items.extend(STORE_CHECKS[scraper](collections=targets))
+
+    # Private Sale products are dropped by the scraper; report them from the
+    # documents it already fetched rather than re-crawling.
+    private_sales = {r["url"] for r in private_sale_report(get_run_cache()) if r["private_sale"]}
+    if private_sales:
+        logger.info(f"[{run_id}] Skipped {len(private_sales)} Private Sale products.")
 
     if not new_items:
         logger.warning(f"[{run_id}] Scraper returned no items; skipping diff and upsert.")
@@ -757,7 +1099,67 @@ def check_for_updates(store_filter=None):
             continue
         stores_by_link.setdefault(link, set()).add(store)
 
+    # On a partial run, a link last seen under an active collection that wasn't
+    # scraped this time keeps that membership, so its canonical store doesn't
+    # flip and raise a spurious Store Change.
+    unscraped_stores = {s.store_name for s in sources} - {s.store_name for s in selected_sources}
+    if unscraped_stores:
+        for link, stores in stores_by_link.items():
+            seen_store = seen_items_dict.get(link, {}).get("store")
+            if seen_store in unscraped_stores:
+                stores.add(seen_store)
+
     new_items_canonical = canonicalize_items_by_link(new_items, stores_by_link)
+    media_by_link = collect_item_media(new_items)
+
+    # Diff only on event-relevant fields. Author/cover/isbn are enrichment data,
+    # not change signals — including them would churn every item whenever an
+    # author is corrected or the operational scrape omits it.
+    diff_keys = ("name", "price", "store", "link", "in_stock")
+
+    def _diff_key(item):
+        return frozenset((k, item.get(k)) for k in diff_keys)
+
+    def enrich_folio_details(items, seen_by_link):
+        """Author/ISBN/cover from Folio product pages, for new or changed links only.
+
+        The listing page carries none of them. Unchanged links keep what earlier
+        runs stored, so steady-state runs fetch no product pages.
+        """
+        links = [
+            item["link"]
+            for item in items
+            if item.get("store") == FOLIO_STORE_NAME
+            and (
+                item["link"] not in seen_by_link
+                or _diff_key(item) != _diff_key({**seen_by_link[item["link"]], "link": item["link"]})
+            )
+        ]
+        if not links:
+            return
+        try:
+            details = fetch_folio_details(links)
+        except Exception as e:
+            logger.warning(f"[{run_id}] Folio detail enrichment failed: {e}")
+            return
+        authors = 0
+        for item in items:
+            found = details.get(item["link"])
+            if not found:
+                continue
+            if found.get("author") and not item.get("author"):
+                item["author"] = found["author"]
+                authors += 1
+            media = {k: found[k] for k in ("isbn", "cover_url") if found.get(k)}
+            if media:
+                media_by_link.setdefault(item["link"], {}).update(media)
+        logger.info(
+            f"[{run_id}] Folio details for {len(details)}/{len(links)} new or changed links "
+            f"({authors} authors)."
+        )
+
+    with stage("folio_details"):
+        enrich_folio_details(new_items_canonical, seen_items_dict)
 
     def enrich_new_item_authors(items, seen_by_link):
         """Open Library fallback when the store page did not yield an author."""
@@ -778,17 +1180,23 @@ def check_for_updates(store_filter=None):
                 )
 
     if not is_seed_mode:
-        enrich_new_item_authors(new_items_canonical, seen_items_dict)
+        with stage("ol_enrichment"):
+            enrich_new_item_authors(new_items_canonical, seen_items_dict)
 
     # Seed mode: establish baseline catalog + daily snapshots, but do not generate events.
     if is_seed_mode:
         for item in new_items_canonical:
             item["typed_price_cents"] = parse_price_cents(item.get("price"))
 
-        all_link_to_id = persist_catalog(new_items_canonical, run_id)
+        claim.items_written = True
+        with stage("catalog"):
+            all_link_to_id = persist_catalog(new_items_canonical, run_id, media_by_link)
 
         # Daily snapshots are idempotent per day via unique(snapshot_date, item_id).
-        insert_daily_snapshots(new_items_canonical, all_link_to_id, run_id)
+        with stage("snapshots"):
+            insert_daily_snapshots(new_items_canonical, all_link_to_id, run_id)
+        with stage("gold"):
+            refresh_gold_analytics(run_id)
 
         update_run_log(
             run_id,
@@ -801,70 +1209,63 @@ def check_for_updates(store_filter=None):
         logger.info(f"[{run_id}] Seed run complete.")
         return
 
-    # Diff only on event-relevant fields. Author/cover/isbn are enrichment data,
-    # not change signals — including them would churn every item whenever an
-    # author is corrected or the operational scrape omits it.
-    diff_keys = ("name", "price", "store", "link", "in_stock")
+    with stage("diff"):
+        seen_set = {_diff_key(s) for s in seen_items}
+        new_set = {_diff_key(n) for n in new_items_canonical}
+        unseen_items_set = new_set.difference(seen_set)
+        unseen_items = [dict(x) for x in unseen_items_set]
+
+        # Single sweep: classify changes, build event rows, annotate books for email
+        events = []
+        for book in unseen_items:
+            prev = seen_items_dict.get(book["link"])
+
+            if prev is None:
+                if book.get("in_stock"):
+                    event_type = "New Item"
+                else:
+                    event_type = "New Item - Out of Stock"
+                old_value = None
+                new_value = None
+
+            elif book.get("in_stock") and not prev.get("in_stock"):
+                event_type = "Restocked"
+                old_value = "out_of_stock"
+                new_value = "in_stock"
+
+            elif not book.get("in_stock") and prev.get("in_stock"):
+                event_type = "Out of Stock"
+                old_value = "in_stock"
+                new_value = "out_of_stock"
+
+            elif book.get("price") != prev.get("price"):
+                event_type = "Price Change"
+                old_value = prev.get("price")
+                new_value = book.get("price")
+
+            elif book.get("store") != prev.get("store"):
+                event_type = "Store Change"
+                old_value = prev.get("store")
+                new_value = book.get("store")
 
-    def _diff_key(item):
-        return frozenset((k, item.get(k)) for k in diff_keys)
-
-    seen_set = {_diff_key(s) for s in seen_items}
-    new_set = {_diff_key(n) for n in new_items_canonical}
-    unseen_items_set = new_set.difference(seen_set)
-    unseen_items = [dict(x) for x in unseen_items_set]
-
-    # Single sweep: classify changes, build event rows, annotate books for email
-    events = []
-    for book in unseen_items:
-        prev = seen_items_dict.get(book["link"])
-
-        if prev is None:
-            if book.get("in_stock"):
-                event_type = "New Item"
             else:
-                event_type = "New Item - Out of Stock"
-            old_value = None
-            new_value = None
-
-        elif book.get("in_stock") and not prev.get("in_stock"):
-            event_type = "Restocked"
-            old_value = "out_of_stock"
-            new_value = "in_stock"
-
-        elif not book.get("in_stock") and prev.get("in_stock"):
-            event_type = "Out of Stock"
-            old_value = "in_stock"
-            new_value = "out_of_stock"
-
-        elif book.get("price") != prev.get("price"):
-            event_type = "Price Change"
-            old_value = prev.get("price")
-            new_value = book.get("price")
-
-        elif book.get("store") != prev.get("store"):
-            event_type = "Store Change"
-            old_value = prev.get("store")
-            new_value = book.get("store")
-
-        else:
-            event_type = "Unknown Change"
-            old_value = None
-            new_value = None
-
-        book["event_type"] = event_type
-        book["old_value"] = old_value
-        book["new_value"] = new_value
-
-        # Intermediate structure; link is used to resolve item_id, not stored in DB
-        events.append({
-            "link": book["link"],
-            "event_type": event_type,
-            "old_value": old_value,
-            "new_value": new_value,
-            "store": book.get("store"),
-            "in_stock": book.get("in_stock"),
-        })
+                event_type = "Unknown Change"
+                old_value = None
+                new_value = None
+
+            book["event_type"] = event_type
+            book["old_value"] = old_value
+            book["new_value"] = new_value
+
+            # Intermediate structure; link is used to resolve item_id, not stored in DB
+            events.append({
+                "link": book["link"],
+                "event_type": event_type,
+                "old_value": old_value,
+                "new_value": new_value,
+                "store": book.get("store"),
+                "in_stock": book.get("in_stock"),
+            })
 
     logger.info(f"[{run_id}] Found {len(unseen_items)} changed items, {len(events)} events.")
 
@@ -876,11 +1277,26 @@ def check_for_updates(store_filter=None):
     # OPERATIONAL PATH — kept lean so notifications go out fast.
     # The notification path only needs Bronze items_seen IDs and item_events.
     # ------------------------------------------------------------------
-    if not dry_run:
-        all_link_to_id = persist_bronze(new_items_canonical, run_id)
-    else:
-        all_links = [item["link"] for item in new_items_canonical]
-        all_link_to_id = fetch_item_ids_by_link(all_links, run_id)
+    # Only rows in the diff are written; everything else reuses IDs from the
+    # snapshot loaded for diffing. Author isn't a diff key, but a corrected
+    # author must still reach items_seen, so those rows are rewritten too
+    # (without an event).
+    changed_links = {item["link"] for item in unseen_items}
+    changed_links.update(
+        item["link"]
+        for item in new_items_canonical
+        if item.get("author")
+        and item["link"] in seen_items_dict
+        and item["author"] != seen_items_dict[item["link"]].get("author")
+    )
+    with stage("bronze"):
+        if not dry_run:
+            claim.items_written = True
+            all_link_to_id = persist_bronze_changes(
+                new_items_canonical, changed_links, seen_items_dict, run_id
+            )
+        else:
+            all_link_to_id = known_item_ids(new_items_canonical, seen_items_dict, set(), run_id)
 
     # Step 4: Fetch IDs for changed items only (subset for event building)
     link_to_id = {link: all_link_to_id[link] for link in {e["link"] for e in events} if link in all_link_to_id}
@@ -900,7 +1316,8 @@ def check_for_updates(store_filter=None):
             "store": e.get("store"),
             "in_stock": e.get("in_stock"),
         })
-    inserted_events = insert_events(event_rows, run_id) if not dry_run else []
+    with stage("events"):
+        inserted_events = insert_events(event_rows, run_id) if not dry_run else []
 
     # Step 6: Send notification emails — PRIORITY, before any analytics writes.
     emails_attempted, emails_sent = send_notifications(
@@ -919,8 +1336,12 @@ def check_for_updates(store_filter=None):
     # daily snapshots feed the dashboard, not the notification.
     # ------------------------------------------------------------------
     if not dry_run:
-        persist_silver_catalog(new_items_canonical, all_link_to_id, run_id)
-        insert_daily_snapshots(new_items_canonical, all_link_to_id, run_id)
+        with stage("silver"):
+            persist_silver_catalog(new_items_canonical, all_link_to_id, run_id, media_by_link)
+        with stage("snapshots"):
+            insert_daily_snapshots(new_items_canonical, all_link_to_id, run_id)
+        with stage("gold"):
+            refresh_gold_analytics(run_id)
 
         update_run_log(
             run_id,
@@ -930,6 +1351,8 @@ def check_for_updates(store_filter=None):
             emails_sent=emails_sent,
             status="success",
         )
+    else:
+        logger.info(f"[{run_id}] Run telemetry: {json.dumps(finish_run(run_id))}")
     logger.info(f"[{run_id}] Update check complete.")
 
 
@@ -952,8 +1375,10 @@ def main():
     parser = argparse.ArgumentParser(description="Run stock update checks.")
     parser.add_argument(
         "--store",
-        choices=sorted(STORE_CHECKS.keys()),
-        help="Run checks for only one store.",
+        help=(
+            "Scrape only one scraper (" + ", ".join(sorted(STORE_CHECKS)) + ") or one "
+            "collection by store name, regardless of its schedule."
+        ),
     )
     args = parser.parse_args()
 
@@ -1,9 +1,9 @@
-import random
 import re
-import time
 
 import requests
 
+from rate_limiter import get_with_retry
+
 OL_SEARCH = "https://openlibrary.org/search.json"
 UA = "sf_bot-author-backfill/1.0"
 
@@ -13,12 +13,15 @@ ISBN_RE = re.compile(
 )
 
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
 def normalize_text(value):
     """Match Postgres: lower(regexp_replace(trim(x), '[^a-z0-9]+', ' ', 'g'))."""
     if not value:
         return None
-    cleaned = re.sub(r"[^a-z0-9]+", " ", (value or "").strip().lower())
-    return re.sub(r"\s+", " ", cleaned).strip() or None
+    # Runs of non-alphanumerics (whitespace included) collapse to one space.
+    return _NON_ALNUM_RE.sub(" ", value.strip().lower()).strip() or None
 
 
 def normalize_isbn(value: str | None) -> str | None:
@@ -60,24 +63,15 @@ def ol_cover_url_by_olid(ol_work_key: str, size: str = "M") -> str:
 
 
 def _search_docs(params: dict, session) -> list[dict]:
-    for attempt in range(4):
-        try:
-            resp = session.get(
-                OL_SEARCH,
-                params=params,
-                headers={"User-Agent": UA},
-                timeout=15,
-            )
-            if resp.status_code == 429 or resp.status_code >= 500:
-                time.sleep(2 ** attempt + random.uniform(0, 1))
-                continue
-            resp.raise_for_status()
-            return resp.json().get("docs") or []
-        except requests.RequestException:
-            if attempt == 3:
-                raise
-            time.sleep(2 ** attempt + random.uniform(0, 1))
-    return []
+    """OL search docs; an Open Library that is still throttling after retries yields []."""
+    try:
+        resp = get_with_retry(session, OL_SEARCH, params=params, headers={"User-Agent": UA})
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status == 429 or (status or 0) >= 500:
+            return []
+        raise
+    return resp.json().get("docs") or []
 
 
 def _pick_isbn_from_doc(doc: dict) -> str | None:
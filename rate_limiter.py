@@ -0,0 +1,204 @@
+"""
+Per-host adaptive rate limiting shared by every outbound HTTP client.
+
+Each host gets one AdaptiveLimiter (AIMD): its concurrency window grows by
+about one slot per window's worth of fast 2xx responses and halves on a 429,
+5xx, connection error or slow response. A throttled response also pauses the
+host for its Retry-After (or a backoff when absent), so other threads hold off
+instead of piling more requests onto a host that is already refusing them.
+
+get_with_retry() is the one GET-with-retries helper used by the scrapers,
+open_library and the backfill scripts. http_cache.limit_host mounts the same
+per-host limiter at the transport level; acquiring is reentrant per thread,
+so a request gated by both counts once.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Cap on any single backoff/Retry-After sleep so one throttled request can't stall a run.
+MAX_BACKOFF_SECONDS = 30
+# Responses slower than this count as a congestion signal, like a 429.
+SLOW_RESPONSE_SECONDS = 5.0
+DEFAULT_MAX_CONCURRENT = 6
+
+
+def retry_after_seconds(resp) -> float | None:
+    """Parse a Retry-After header in delta-seconds form into float seconds."""
+    if resp is None:
+        return None
+    raw = resp.headers.get("Retry-After")
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except (TypeError, ValueError):
+        # HTTP-date form is uncommon for the hosts we call; fall back to backoff.
+        return None
+
+
+def _backoff_seconds(attempt: int) -> float:
+    return min(2 ** attempt + random.uniform(0, 1), MAX_BACKOFF_SECONDS)
+
+
+def _is_throttle(status: int | None) -> bool:
+    return status is not None and (status == 429 or status >= 500)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window for one host (see module docstring)."""
+
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        initial: int = 1,
+        slow_seconds: float = SLOW_RESPONSE_SECONDS,
+    ):
+        self.max_concurrent = max(int(max_concurrent), 1)
+        self.limit = float(min(max(initial, 1), self.max_concurrent))
+        self.slow_seconds = slow_seconds
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.throttled = 0
+        self.blocked_until = 0.0
+        self._paused_at = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def acquire(self, honor_pause: bool = True) -> float | None:
+        """Block until a slot is free (and any pause is over); return the start time.
+
+        Returns None when this thread already holds a slot on this limiter.
+        """
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        if depth:
+            return None
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                pause = self.blocked_until - now if honor_pause else 0.0
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                    return now
+                self._cond.wait(timeout=pause if pause > 0 else None)
+
+    def release(self, started: float | None, status: int | None = None, error: bool = False) -> None:
+        """Free the slot taken at `started` and adapt the window to the outcome.
+
+        `status` None with no error (e.g. a transport that returned nothing)
+        leaves the window unchanged.
+        """
+        self._local.depth -= 1
+        if started is None:
+            return
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight -= 1
+            if error or _is_throttle(status) or (status is not None and now - started > self.slow_seconds):
+                if _is_throttle(status):
+                    self.throttled += 1
+                # One halving per congestion event, not one per request that was in flight.
+                if started >= self._last_decrease:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+            elif status is not None and status < 400:
+                if started >= self._paused_at:
+                    self.blocked_until = 0.0
+                self.limit = min(float(self.max_concurrent), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Hold new requests to this host for `seconds`."""
+        with self._cond:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self._paused_at = now
+            self._cond.notify_all()
+
+
+_limiters: dict[str, AdaptiveLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def _host(url: str) -> str:
+    return urlsplit(url if "://" in url else f"https://{url}").netloc.lower()
+
+
+def limiter_for(url: str) -> AdaptiveLimiter:
+    """The process-wide limiter for the host of `url`."""
+    host = _host(url)
+    with _registry_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = AdaptiveLimiter()
+        return limiter
+
+
+def configure_host(url: str, max_concurrent: int, initial: int = 1) -> AdaptiveLimiter:
+    """Replace the limiter for the host of `url` with one capped at `max_concurrent`."""
+    limiter = AdaptiveLimiter(max_concurrent, initial)
+    with _registry_lock:
+        _limiters[_host(url)] = limiter
+    return limiter
+
+
+def reset_limiters() -> None:
+    """Forget all per-host state (tests, or a new run in a reused container)."""
+    with _registry_lock:
+        _limiters.clear()
+
+
+def get_with_retry(session, url, max_retries=4, timeout=15, **kwargs):
+    """GET `url` through the host's limiter with retries. Raises on final failure.
+
+    Honors Retry-After on 429/5xx (capped at MAX_BACKOFF_SECONDS) and pauses
+    the host for everyone meanwhile. Non-429 client errors (e.g. 404) are not
+    retried since they won't recover. `kwargs` go to `session.get`.
+    """
+    limiter = limiter_for(url)
+    honor_pause = True
+    for attempt in range(max_retries):
+        resp = None
+        started = limiter.acquire(honor_pause)
+        try:
+            resp = session.get(url, timeout=timeout, **kwargs)
+        except requests.RequestException:
+            limiter.release(started, error=True)
+            if attempt == max_retries - 1:
+                raise
+            wait = _backoff_seconds(attempt)
+            logger.warning(f"Retry {attempt + 1}/{max_retries} for {url} (waiting {wait:.1f}s)")
+            time.sleep(wait)
+            continue
+        limiter.release(started, resp.status_code)
+        try:
+            resp.raise_for_status()
+            return resp
+        except requests.HTTPError:
+            status = resp.status_code
+            if status != 429 and 400 <= status < 500:
+                raise
+            if attempt == max_retries - 1:
+                raise
+            retry_after = retry_after_seconds(resp)
+            wait = min(retry_after, MAX_BACKOFF_SECONDS) if retry_after is not None else _backoff_seconds(attempt)
+            limiter.pause(wait)
+            logger.warning(
+                f"Retry {attempt + 1}/{max_retries} for {url} "
+                f"(status={status}, waiting {wait:.1f}s)"
+            )
+            time.sleep(wait)
+            # This thread has already waited out its own pause.
+            honor_pause = False
@@ -1,15 +1,24 @@
-import requests
-import time
-import random
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from bs4 import BeautifulSoup
 
+from http_client import open_session
 from open_library import extract_isbn_from_text
+from rate_limiter import get_with_retry, limiter_for
+from .product_cache import ProductCache, reset_run_cache
 
 logger = logging.getLogger(__name__)
 
-# Cap on any single backoff/Retry-After sleep so one throttled product can't stall a run.
-MAX_BACKOFF_SECONDS = 30
+# Default collections, in store-precedence order. The live list comes from the
+# `collections` table via scrapers.registry.
+COLLECTIONS = [
+    {"url": "https://thebrokenbindingsub.com/collections/to-the-stars", "store": "Broken Binding - To The Stars"},
+    {"url": "https://thebrokenbindingsub.com/collections/the-infirmary", "store": "Broken Binding - The Infirmary"},
+    {"url": "https://thebrokenbindingsub.com/collections/dragons-hoard", "store": "Broken Binding - Dragon's Hoard"},
+    {"url": "https://thebrokenbindingsub.com/collections/the-graveyard", "store": "Broken Binding - The Graveyard"},
+]
 
 # Shopify vendor field is the retailer, not the book author on Broken Binding.
 _IGNORED_SHOPIFY_VENDORS = frozenset(
@@ -112,67 +121,56 @@ def shopify_js_tags(data: dict) -> list[str]:
     return [t.strip() for t in str(raw).split(",")]
 
 
-def _retry_after_seconds(resp) -> float | None:
-    """Parse a Retry-After header in delta-seconds form into float seconds."""
-    if resp is None:
-        return None
-    raw = resp.headers.get("Retry-After")
-    if not raw:
-        return None
-    try:
-        return max(0.0, float(raw))
-    except (TypeError, ValueError):
-        # HTTP-date form is uncommon for Shopify; fall back to backoff.
-        return None
+def _get_with_retry(session, url, max_retries=4, timeout=15):
+    """GET through the shared per-host limiter; see rate_limiter.get_with_retry."""
+    return get_with_retry(session, url, max_retries=max_retries, timeout=timeout)
 
 
-def _get_with_retry(session, url, max_retries=4, timeout=15):
-    """GET with retries. Honors Retry-After on 429; raises on final failure.
+def _card_link(product) -> str | None:
+    """Absolute product URL from a collection grid card, if it has one."""
+    heading = product.find("h3", class_="card__heading")
+    link_tag = heading.find("a", class_="full-unstyled-link") if heading else None
+    href = link_tag.get("href") if link_tag else None
+    return "https://thebrokenbindingsub.com" + href if href else None
+
 
-    Non-429 client errors (e.g. 404) are not retried since they won't recover.
+def _fetch_product_docs(session, links: list[str]) -> dict[str, dict]:
+    """`<link>.js` documents for `links`, fetched concurrently.
+
+    The host's adaptive limiter decides how many are actually in flight;
+    failed fetches are logged and left out.
     """
-    for attempt in range(max_retries):
-        resp = None
+    if not links:
+        return {}
+
+    def fetch(link):
         try:
-            resp = session.get(url, timeout=timeout)
-            resp.raise_for_status()
-            return resp
-        except requests.HTTPError:
-            status = resp.status_code if resp is not None else None
-            if status is not None and status != 429 and 400 <= status < 500:
-                raise
-            if attempt == max_retries - 1:
-                raise
-            retry_after = _retry_after_seconds(resp)
-            wait = retry_after if retry_after is not None else 2 ** attempt + random.uniform(0, 1)
-            wait = min(wait, MAX_BACKOFF_SECONDS)
-            logger.warning(
-                f"Retry {attempt + 1}/{max_retries} for {url} "
-                f"(status={status}, waiting {wait:.1f}s)"
-            )
-            time.sleep(wait)
-        except requests.RequestException:
-            if attempt == max_retries - 1:
-                raise
-            wait = min(2 ** attempt + random.uniform(0, 1), MAX_BACKOFF_SECONDS)
-            logger.warning(f"Retry {attempt + 1}/{max_retries} for {url} (waiting {wait:.1f}s)")
-            time.sleep(wait)
-
-
-def broken_binding_checks():
-    urls = [
-        {"url": "https://thebrokenbindingsub.com/collections/to-the-stars", "store": "Broken Binding - To The Stars"},
-        {"url": "https://thebrokenbindingsub.com/collections/the-infirmary", "store": "Broken Binding - The Infirmary"},
-        {"url": "https://thebrokenbindingsub.com/collections/dragons-hoard", "store": "Broken Binding - Dragon's Hoard"},
-        {"url": "https://thebrokenbindingsub.com/collections/the-graveyard", "store": "Broken Binding - The Graveyard"},
-    ]
+            return link, _get_with_retry(session, link + ".js").json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Error fetching {link}.js: {e}; skipping product.")
+            return link, None
+
+    with ThreadPoolExecutor(max_workers=limiter_for(links[0]).max_concurrent) as pool:
+        return {link: doc for link, doc in pool.map(fetch, links) if doc is not None}
+
+
+def broken_binding_checks(cache: ProductCache | None = None, collections: list[dict] | None = None):
+    """Scrape Broken Binding SF collections (`[{"url", "store"}]`, default COLLECTIONS).
+
+    Every fetched `.js` document is kept in `cache` (a fresh per-run cache by
+    default), so a product listed in several collections is fetched once and
+    check_private_sales can report from the same data.
+    """
+    if cache is None:
+        cache = reset_run_cache()
+    urls = COLLECTIONS if collections is None else collections
     # Intentionally do NOT dedupe by `link` here.
     # The same product URL can appear in multiple Broken Binding collections; the
     # lambda will canonicalize per-link for items_seen/events, while still preserving
     # multi-store membership for email/store matching.
     product_list = []
 
-    with requests.Session() as session:
+    with open_session() as session:
         session.headers.update({
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -183,7 +181,6 @@ def broken_binding_checks():
         # Warm up the session; best-effort, failures are non-fatal
         try:
             _get_with_retry(session, "https://thebrokenbindingsub.com/")
-            time.sleep(random.uniform(0.2, 0.5))
         except requests.RequestException:
             pass
 
@@ -201,12 +198,15 @@ def broken_binding_checks():
                     break
                 soup = BeautifulSoup(response.content, "html.parser")
 
-                time.sleep(random.uniform(0.2, 0.5))
-
                 product_items = soup.find_all("li", class_="grid__item")
                 if not product_items:
                     break
 
+                # Fetch the page's uncached `.js` documents up front, concurrently;
+                # pacing is left to the host's adaptive limiter.
+                page_links = dict.fromkeys(filter(None, map(_card_link, product_items)))
+                docs = _fetch_product_docs(session, [link for link in page_links if link not in cache])
+
                 for product in product_items:
                     # Ensure these variables always exist even if the page structure changes.
                     in_stock = False
@@ -227,11 +227,15 @@ def broken_binding_checks():
                         # status, tags, cover and ISBN. Author lives only in the product
                         # HTML and is not used in notifications, so we skip that extra
                         # page fetch to halve request volume and avoid rate limiting.
-                        try:
-                            js_data = _get_with_retry(session, link + ".js").json()
-                        except (requests.RequestException, ValueError) as e:
-                            logger.error(f"Error fetching {link}.js: {e}; skipping product.")
-                            continue
+                        js_data = cache.get(link)
+                        if js_data is None:
+                            js_data = docs.get(link)
+                            if js_data is None:
+                                # Fetch failed and was logged by _fetch_product_docs.
+                                continue
+                            cache.put(link, product_name, js_data, store)
+                        else:
+                            cache.add_store(link, store)
 
                         if "Private Sale" in shopify_js_tags(js_data):
                             logger.info(f"Skipping private sale product: {product_name}")
@@ -260,8 +264,6 @@ def broken_binding_checks():
                         'isbn': isbn,
                     })
 
-                    time.sleep(random.uniform(0.2, 0.6))
-
                 logger.info(f"Scraped {store} page {page}: {len(product_items)} products")
                 page += 1
 
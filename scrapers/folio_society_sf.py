@@ -1,32 +1,39 @@
+import json
 import logging
-import random
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from bs4 import BeautifulSoup
 
+from http_client import open_session
+from open_library import extract_isbn_from_text, normalize_isbn
+from rate_limiter import get_with_retry, limiter_for
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://www.foliosociety.com"
 LISTING_URL = "https://www.foliosociety.com/usa/sci-fi-fantasy"
 STORE_NAME = "Folio Society - Sci-Fi & Fantasy"
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Connection": "keep-alive",
+    "Referer": BASE_URL,
+}
+
+# Product details (author/ISBN/cover) don't change between runs, so successful
+# parses are kept for the life of the process (warm Lambda containers included).
+DETAIL_CACHE_MAX = 5000
+_detail_cache: dict[str, dict] = {}
+_detail_cache_lock = threading.Lock()
+
 
 def _get_with_retry(session, url, max_retries=3, timeout=15):
-    """GET with exponential backoff. Raises on final failure."""
-    for attempt in range(max_retries):
-        try:
-            resp = session.get(url, timeout=timeout)
-            resp.raise_for_status()
-            return resp
-        except requests.RequestException:
-            if attempt == max_retries - 1:
-                raise
-            wait = 2 ** attempt + random.uniform(0, 1)
-            logger.warning(
-                f"Retry {attempt + 1}/{max_retries} for {url} (waiting {wait:.1f}s)"
-            )
-            time.sleep(wait)
+    """GET through the shared per-host limiter; see rate_limiter.get_with_retry."""
+    return get_with_retry(session, url, max_retries=max_retries, timeout=timeout)
 
 
 def _extract_link(product):
@@ -56,48 +63,156 @@ def _normalize_price(price_text):
     return price_text.strip().replace("US$", "$").replace("US $", "$")
 
 
-def folio_society_checks():
+def _json_ld_product(soup):
+    """The schema.org Product object from the page's JSON-LD, if any."""
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        nodes = data.get("@graph", [data]) if isinstance(data, dict) else data
+        for node in nodes if isinstance(nodes, list) else []:
+            if isinstance(node, dict) and node.get("@type") in ("Product", "Book"):
+                return node
+    return None
+
+
+def _person_name(value):
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("name")
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _labelled_value(soup, label):
+    """Text of the cell next to a `label` heading in a product attributes table/list."""
+    for el in soup.find_all(["th", "dt", "span", "strong"]):
+        if el.get_text(strip=True).rstrip(":").lower() == label:
+            value = el.find_next_sibling(["td", "dd", "span"])
+            if value and value.get_text(strip=True):
+                return value.get_text(" ", strip=True)
+    return None
+
+
+def extract_product_details(soup) -> dict:
+    """author, isbn and cover_url from a Folio product page (None where absent).
+
+    JSON-LD Product data first, then the attributes table and og:image.
+    """
+    product = _json_ld_product(soup) or {}
+
+    author = _person_name(product.get("author")) or _labelled_value(soup, "author")
+
+    isbn = None
+    for key in ("isbn", "gtin13", "gtin"):
+        isbn = normalize_isbn(str(product.get(key) or ""))
+        if isbn:
+            break
+    if not isbn:
+        isbn = normalize_isbn(_labelled_value(soup, "isbn")) or extract_isbn_from_text(
+            product.get("description")
+        )
+
+    image = product.get("image")
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get("url")
+    if not image:
+        og = soup.find("meta", property="og:image")
+        image = og.get("content") if og else None
+    cover_url = image.strip() if isinstance(image, str) and image.strip() else None
+    if cover_url and cover_url.startswith("//"):
+        cover_url = "https:" + cover_url
+
+    return {"author": author, "isbn": isbn, "cover_url": cover_url}
+
+
+def fetch_product_details(links) -> dict[str, dict]:
+    """{link: details} for Folio product `links`, fetched concurrently.
+
+    Pages already parsed in this process come from the cache; the rest are
+    fetched under the host's adaptive limiter. Failed fetches are logged and
+    left out (and retried on the next run).
+    """
+    details = {}
+    missing = []
+    with _detail_cache_lock:
+        for link in dict.fromkeys(links):
+            if link in _detail_cache:
+                details[link] = _detail_cache[link]
+            else:
+                missing.append(link)
+    if not missing:
+        return details
+
+    def fetch(session, link):
+        try:
+            response = _get_with_retry(session, link)
+        except requests.RequestException as e:
+            logger.error(f"Error fetching Folio product page {link}: {e}")
+            return link, None
+        return link, extract_product_details(BeautifulSoup(response.content, "html.parser"))
+
+    with open_session(HEADERS) as session, \
+            ThreadPoolExecutor(max_workers=limiter_for(BASE_URL).max_concurrent) as pool:
+        fetched = [(link, d) for link, d in pool.map(lambda link: fetch(session, link), missing) if d]
+
+    with _detail_cache_lock:
+        for link, d in fetched:
+            if len(_detail_cache) >= DETAIL_CACHE_MAX:
+                _detail_cache.pop(next(iter(_detail_cache)))
+            _detail_cache[link] = d
+    details.update(fetched)
+    logger.info(
+        f"Folio product details: {len(details) - len(fetched)} cached, "
+        f"{len(fetched)}/{len(missing)} fetched."
+    )
+    return details
+
+
+def folio_society_checks(collections: list[dict] | None = None):
+    """Scrape Folio listing pages (`[{"url", "store"}]`, default the Sci-Fi & Fantasy page)."""
+    if collections is None:
+        collections = [{"url": LISTING_URL, "store": STORE_NAME}]
+    product_list = []
+
+    with open_session(HEADERS) as session:
+        for listing in collections:
+            product_list.extend(_scrape_listing(session, listing["url"], listing["store"]))
+
+    return product_list
+
+
+def _scrape_listing(session, url, store):
+    response = _get_with_retry(session, url)
+    soup = BeautifulSoup(response.content, "html.parser")
+    products = soup.find_all("product")
+
+    logger.info(f"Found {len(products)} products on Folio Society listing page {url}.")
+
     product_list = []
+    for product in products:
+        name_el = product.find("span", class_="_name")
+        price_el = product.find("price")
+        link = _extract_link(product)
 
-    with requests.Session() as session:
-        session.headers.update(
+        if not name_el or not price_el or not link:
+            logger.warning("Skipping product due to missing required fields.")
+            continue
+
+        product_list.append(
             {
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Connection": "keep-alive",
-                "Referer": BASE_URL,
+                "name": name_el.get_text(strip=True),
+                "price": _normalize_price(price_el.get_text(strip=True)),
+                "store": store,
+                "link": link,
+                "in_stock": _extract_in_stock(product),
+                "author": None,
             }
         )
 
-        response = _get_with_retry(session, LISTING_URL)
-        soup = BeautifulSoup(response.content, "html.parser")
-        products = soup.find_all("product")
-
-        logger.info(f"Found {len(products)} products on Folio Society listing page.")
-
-        for product in products:
-            name_el = product.find("span", class_="_name")
-            price_el = product.find("price")
-            link = _extract_link(product)
-
-            if not name_el or not price_el or not link:
-                logger.warning("Skipping product due to missing required fields.")
-                continue
-
-            product_list.append(
-                {
-                    "name": name_el.get_text(strip=True),
-                    "price": _normalize_price(price_el.get_text(strip=True)),
-                    "store": STORE_NAME,
-                    "link": link,
-                    "in_stock": _extract_in_stock(product),
-                    "author": None,
-                }
-            )
-
-            time.sleep(random.uniform(0.05, 0.2))
-
     return product_list
 
 
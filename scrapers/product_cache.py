@@ -0,0 +1,88 @@
+import threading
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+
+def product_handle(link: str) -> str:
+    """Shopify product handle from a product URL (`.../products/<handle>`)."""
+    path = urlparse(link).path.rstrip("/")
+    for suffix in (".js", ".json"):
+        if path.endswith(suffix):
+            path = path[: -len(suffix)]
+    return path.rsplit("/", 1)[-1]
+
+
+@dataclass
+class CachedProduct:
+    handle: str
+    link: str
+    name: str
+    document: dict
+    stores: list[str] = field(default_factory=list)
+
+
+class ProductCache:
+    """Per-run store of Shopify product documents, keyed by product handle.
+
+    The main scrape records every product it fetches (including ones it then
+    skips, such as Private Sale), so later passes in the same run can read
+    tags and stock from here instead of re-requesting `<link>.js`.
+    """
+
+    def __init__(self):
+        self._products: dict[str, CachedProduct] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._products)
+
+    def __contains__(self, link: str) -> bool:
+        with self._lock:
+            return product_handle(link) in self._products
+
+    def get(self, link: str) -> dict | None:
+        with self._lock:
+            entry = self._products.get(product_handle(link))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.document
+
+    def put(self, link: str, name: str, document: dict, store: str | None = None) -> None:
+        handle = product_handle(link)
+        with self._lock:
+            entry = self._products.get(handle)
+            if entry is None:
+                entry = self._products[handle] = CachedProduct(handle, link, name, document)
+            else:
+                entry.document = document
+            if store and store not in entry.stores:
+                entry.stores.append(store)
+
+    def add_store(self, link: str, store: str) -> None:
+        with self._lock:
+            entry = self._products.get(product_handle(link))
+            if entry is not None and store not in entry.stores:
+                entry.stores.append(store)
+
+    def products(self) -> list[CachedProduct]:
+        with self._lock:
+            return list(self._products.values())
+
+
+_run_cache = ProductCache()
+
+
+def get_run_cache() -> ProductCache:
+    """The cache filled by the most recent scrape in this process."""
+    return _run_cache
+
+
+def reset_run_cache() -> ProductCache:
+    """Start a fresh cache for a new run (Lambda containers are reused)."""
+    global _run_cache
+    _run_cache = ProductCache()
+    return _run_cache
@@ -0,0 +1,115 @@
+"""
+Store registry: which collections to scrape, with which scraper, and how often.
+
+Rows come from the `collections` table (see migration 029): an active row
+with a `scrape_url` and a `scraper` is one StoreSource. `scraper` names a
+key of lambda_function.STORE_CHECKS, `scrape_priority` orders scraping and
+picks the canonical store for a product listed in several collections
+(lower wins), and `scrape_interval_minutes` throttles slow collections
+(NULL scrapes on every run). DEFAULT_SOURCES mirrors the seeded rows and is
+used when the table can't be read.
+
+A run claims its due collections atomically (claim_due_collections, migration
+031) and scrapes only what it got back, so overlapping runs on a 1-minute
+schedule never scrape, diff and alert on the same collection twice.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from .broken_binding_sf import COLLECTIONS as BROKEN_BINDING_COLLECTIONS
+from .folio_society_sf import LISTING_URL as FOLIO_LISTING_URL
+from .folio_society_sf import STORE_NAME as FOLIO_STORE_NAME
+
+# Columns read by lambda_function.load_store_sources.
+SOURCE_COLUMNS = "id,store_name,scraper,scrape_url,scrape_priority,scrape_interval_minutes,last_scraped_at"
+
+# A source counts as due this much before its interval elapses, so a
+# 5-minute collection on a 1-minute schedule isn't pushed to 6 minutes by
+# invocation jitter.
+SCHEDULE_SLACK_SECONDS = 30
+
+DEFAULT_PRIORITY = 100
+UNKNOWN_STORE_RANK = 10_000
+
+
+@dataclass(frozen=True)
+class StoreSource:
+    store_name: str
+    scraper: str
+    scrape_url: str
+    priority: int = DEFAULT_PRIORITY
+    interval_minutes: int | None = None
+    last_scraped_at: datetime | None = None
+    collection_id: int | None = None
+
+    def is_due(self, now: datetime) -> bool:
+        """True if the source has never been scraped or its interval has elapsed."""
+        if not self.interval_minutes or self.last_scraped_at is None:
+            return True
+        next_due = self.last_scraped_at + timedelta(minutes=self.interval_minutes)
+        return now >= next_due - timedelta(seconds=SCHEDULE_SLACK_SECONDS)
+
+
+@dataclass
+class SourceClaim:
+    """Sources a run claimed, plus what to restore if it ends up writing nothing."""
+    sources: list[StoreSource]
+    # {collection_id: last_scraped_at before the claim}; empty if nothing was leased.
+    previous_scraped_at: dict[int, str | None] = field(default_factory=dict)
+    items_written: bool = False
+
+
+DEFAULT_SOURCES = (
+    *(
+        StoreSource(entry["store"], "broken_binding", entry["url"], priority=i)
+        for i, entry in enumerate(BROKEN_BINDING_COLLECTIONS)
+    ),
+    StoreSource(FOLIO_STORE_NAME, "folio_society", FOLIO_LISTING_URL, priority=1000),
+)
+
+
+def _parse_timestamp(value) -> datetime | None:
+    if not value or isinstance(value, datetime):
+        return value or None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def source_from_row(row: dict) -> StoreSource | None:
+    """StoreSource for a `collections` row, or None if it isn't scrapeable."""
+    if not row.get("scrape_url") or not row.get("scraper") or not row.get("store_name"):
+        return None
+    priority = row.get("scrape_priority")
+    return StoreSource(
+        store_name=row["store_name"],
+        scraper=row["scraper"],
+        scrape_url=row["scrape_url"],
+        priority=DEFAULT_PRIORITY if priority is None else priority,
+        interval_minutes=row.get("scrape_interval_minutes") or None,
+        last_scraped_at=_parse_timestamp(row.get("last_scraped_at")),
+        collection_id=row.get("id"),
+    )
+
+
+def sorted_sources(sources) -> list[StoreSource]:
+    return sorted(sources, key=lambda s: (s.priority, s.store_name))
+
+
+def store_precedence(sources) -> dict[str, int]:
+    """{store_name: rank} for canonical-store selection; lower wins."""
+    return {s.store_name: rank for rank, s in enumerate(sorted_sources(sources))}
+
+
+def due_sources(sources, now: datetime) -> list[StoreSource]:
+    return [s for s in sorted_sources(sources) if s.is_due(now)]
+
+
+def targets_for(sources, scraper: str) -> list[dict]:
+    """`[{"url", "store"}]` for one scraper, in priority order."""
+    return [
+        {"url": s.scrape_url, "store": s.store_name}
+        for s in sorted_sources(sources)
+        if s.scraper == scraper
+    ]
@@ -1,12 +1,20 @@
-"""Backfill editions.cover_url and editions.isbn from Shopify, with Open Library fallback."""
+"""
+Backfill editions.cover_url and editions.isbn from Shopify, with Open Library fallback.
+
+Editions are processed concurrently (bounded per host) in edition-id order.
+Responses are cached on disk, updates are flushed to `editions` in batches,
+and the highest fully flushed edition id is checkpointed so an interrupted
+run resumes where it stopped (--reset to start over).
+"""
 
 from __future__ import annotations
 
 import argparse
+import json
 import os
-import random
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
 import requests
@@ -16,7 +24,10 @@ from supabase import create_client
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
-from open_library import lookup_metadata  # noqa: E402
+from batch_writer import write_rows  # noqa: E402
+from http_cache import CachedSession, limit_host  # noqa: E402
+from open_library import OL_SEARCH, lookup_metadata  # noqa: E402
+from rate_limiter import get_with_retry  # noqa: E402
 from scrapers.broken_binding_sf import (  # noqa: E402
     cover_and_isbn_from_shopify_json,
     extract_isbn_from_html,
@@ -27,38 +38,24 @@ load_dotenv()
 BB_HOST = "thebrokenbindingsub.com"
 UA = "sf_bot-cover-backfill/1.0"
 
+DEFAULT_CHECKPOINT = ROOT / ".backfill_edition_covers.checkpoint.json"
+DEFAULT_CACHE_DIR = ROOT / ".http_cache"
+PROGRESS_INTERVAL_SECONDS = 5
+
 
 def fetch_shopify_product(session: requests.Session, url: str) -> dict | None:
     json_url = url.rstrip("/") + ".json"
-    for attempt in range(4):
-        try:
-            resp = session.get(json_url, headers={"User-Agent": UA}, timeout=20)
-            if resp.status_code == 429 or resp.status_code >= 500:
-                time.sleep(2 ** attempt + random.uniform(0, 1))
-                continue
-            resp.raise_for_status()
-            return resp.json()
-        except requests.RequestException:
-            if attempt == 3:
-                return None
-            time.sleep(2 ** attempt + random.uniform(0, 1))
-    return None
+    try:
+        return get_with_retry(session, json_url, headers={"User-Agent": UA}, timeout=20).json()
+    except requests.RequestException:
+        return None
 
 
 def fetch_shopify_html(session: requests.Session, url: str) -> str | None:
-    for attempt in range(4):
-        try:
-            resp = session.get(url.rstrip("/"), headers={"User-Agent": UA}, timeout=20)
-            if resp.status_code == 429 or resp.status_code >= 500:
-                time.sleep(2 ** attempt + random.uniform(0, 1))
-                continue
-            resp.raise_for_status()
-            return resp.text
-        except requests.RequestException:
-            if attempt == 3:
-                return None
-            time.sleep(2 ** attempt + random.uniform(0, 1))
-    return None
+    try:
+        return get_with_retry(session, url.rstrip("/"), headers={"User-Agent": UA}, timeout=20).text
+    except requests.RequestException:
+        return None
 
 
 def load_edition_meta(sb, edition_ids: list[int]) -> dict[int, dict]:
@@ -70,13 +67,15 @@ def load_edition_meta(sb, edition_ids: list[int]) -> dict[int, dict]:
         chunk = edition_ids[start : start + chunk_size]
         resp = (
             sb.table("editions")
-            .select("id, isbn, cover_url, title, works(open_library_id, title)")
+            .select("id, isbn, cover_url, title, normalized_title, works(open_library_id, title)")
             .in_("id", chunk)
             .execute()
         )
         for row in resp.data or []:
             work = row.get("works") or {}
             meta[row["id"]] = {
+                "edition_title": row.get("title"),
+                "normalized_title": row.get("normalized_title"),
                 "title": row.get("title") or work.get("title"),
                 "open_library_id": work.get("open_library_id"),
                 "isbn": row.get("isbn"),
@@ -112,12 +111,103 @@ def apply_ol_fallback(
     return cover_url, isbn, used
 
 
+def process_edition(session: requests.Session, edition_id: int, link: str, meta: dict) -> dict:
+    """Fetch Shopify (then OL) metadata for one edition; returns the changed fields."""
+    cover_url = meta.get("cover_url")
+    isbn = meta.get("isbn")
+
+    product_data = fetch_shopify_product(session, link)
+    if product_data:
+        shop_cover, shop_isbn = cover_and_isbn_from_shopify_json(product_data)
+        if shop_cover:
+            cover_url = shop_cover
+        if shop_isbn:
+            isbn = shop_isbn
+        if not isbn:
+            html = fetch_shopify_html(session, link)
+            if html:
+                from bs4 import BeautifulSoup
+
+                isbn = extract_isbn_from_html(BeautifulSoup(html, "html.parser"))
+    else:
+        print(f"Shopify FAIL {link}", flush=True)
+
+    cover_url, isbn, used_ol = apply_ol_fallback(
+        session,
+        title=meta.get("title"),
+        open_library_id=meta.get("open_library_id"),
+        cover_url=cover_url,
+        isbn=isbn,
+    )
+
+    payload: dict[str, str] = {}
+    if cover_url and cover_url != meta.get("cover_url"):
+        payload["cover_url"] = cover_url
+    if isbn and isbn != meta.get("isbn"):
+        payload["isbn"] = isbn
+
+    if payload:
+        status = "updated"
+    elif not product_data and not used_ol:
+        status = "failed"
+    else:
+        status = "skipped"
+    source = "OL" if used_ol and not product_data else ("OL+shop" if used_ol else "shop")
+    return {"edition_id": edition_id, "payload": payload, "status": status, "used_ol": used_ol, "source": source}
+
+
+def edition_update_row(edition_id: int, meta: dict, payload: dict) -> dict:
+    # Upserted on id. Every row carries the NOT NULL columns and both media
+    # fields, so aligned chunks never null out a value the edition already has.
+    return {
+        "id": edition_id,
+        "title": meta.get("edition_title"),
+        "normalized_title": meta.get("normalized_title"),
+        "cover_url": payload.get("cover_url", meta.get("cover_url")),
+        "isbn": payload.get("isbn", meta.get("isbn")),
+    }
+
+
+def load_checkpoint(path: Path) -> int:
+    if not path.exists():
+        return 0
+    return json.loads(path.read_text()).get("last_edition_id", 0)
+
+
+def save_checkpoint(path: Path, last_edition_id: int) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"last_edition_id": last_edition_id}))
+    tmp.replace(path)
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
+def build_session(args) -> requests.Session:
+    session = requests.Session() if args.no_cache else CachedSession(args.cache_dir, args.cache_ttl_days * 86400)
+    for host in (BB_HOST, f"www.{BB_HOST}"):
+        limit_host(session, host, args.shopify_concurrency)
+    limit_host(session, OL_SEARCH, args.ol_concurrency)
+    return session
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--dry-run", action="store_true", help="Print updates without writing")
     parser.add_argument("--limit", type=int, default=0, help="Max listings to process (0 = all)")
     parser.add_argument("--edition-id", type=int, action="append", default=[], help="Only these edition IDs")
     parser.add_argument("--url", action="append", default=[], help="Only listings matching these URLs")
+    parser.add_argument("--workers", type=int, default=8, help="Editions processed concurrently")
+    parser.add_argument("--shopify-concurrency", type=int, default=3, help="Cap on in-flight Shopify requests (adaptive below it)")
+    parser.add_argument("--ol-concurrency", type=int, default=2, help="Cap on in-flight Open Library requests (adaptive below it)")
+    parser.add_argument("--flush-size", type=int, default=100, help="Edition updates per bulk write")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--reset", action="store_true", help="Ignore and overwrite the checkpoint")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--cache-ttl-days", type=float, default=7)
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch from the network")
     args = parser.parse_args()
 
     url = os.environ.get("SUPABASE_URL")
@@ -128,21 +218,23 @@ def main() -> None:
     sb = create_client(url, key)
 
     listings: list[dict] = []
-    offset = 0
+    last_id = 0
     page_size = 500
     while True:
         resp = (
             sb.table("retailer_listings")
             .select("id, edition_id, retailer_url")
             .ilike("retailer_url", f"%{BB_HOST}%")
-            .range(offset, offset + page_size - 1)
+            .gt("id", last_id)
+            .order("id")
+            .limit(page_size)
             .execute()
         )
         batch = resp.data or []
         listings.extend(batch)
         if len(batch) < page_size:
             break
-        offset += page_size
+        last_id = batch[-1]["id"]
 
     if args.url:
         allowed = {u.rstrip("/") for u in args.url}
@@ -157,84 +249,90 @@ def main() -> None:
 
     print(f"Found {len(listings)} Broken Binding retailer listings", flush=True)
 
-    edition_ids = sorted({row["edition_id"] for row in listings})
-    edition_meta = load_edition_meta(sb, edition_ids)
-
-    session = requests.Session()
-    updated = 0
-    skipped = 0
-    failed = 0
-    ol_fallback = 0
-
-    seen_editions: set[int] = set()
-
+    # One listing per edition (the first seen), worked in edition-id order so the
+    # checkpoint is a single cursor.
+    links: dict[int, str] = {}
     for row in listings:
-        edition_id = row["edition_id"]
-        if edition_id in seen_editions:
-            continue
-        seen_editions.add(edition_id)
-
-        link = row["retailer_url"]
-        meta = edition_meta.get(edition_id, {})
-        cover_url = meta.get("cover_url")
-        isbn = meta.get("isbn")
-
-        product_data = fetch_shopify_product(session, link)
-        if product_data:
-            shop_cover, shop_isbn = cover_and_isbn_from_shopify_json(product_data)
-            if shop_cover:
-                cover_url = shop_cover
-            if shop_isbn:
-                isbn = shop_isbn
-            if not isbn:
-                html = fetch_shopify_html(session, link)
-                if html:
-                    from bs4 import BeautifulSoup
-
-                    isbn = extract_isbn_from_html(BeautifulSoup(html, "html.parser"))
-        else:
-            print(f"Shopify FAIL {link}", flush=True)
-
-        cover_url, isbn, used_ol = apply_ol_fallback(
-            session,
-            title=meta.get("title"),
-            open_library_id=meta.get("open_library_id"),
-            cover_url=cover_url,
-            isbn=isbn,
-        )
-        if used_ol:
-            ol_fallback += 1
-
-        payload: dict[str, str] = {}
-        if cover_url and cover_url != meta.get("cover_url"):
-            payload["cover_url"] = cover_url
-        if isbn and isbn != meta.get("isbn"):
-            payload["isbn"] = isbn
-
-        if not payload:
-            if not product_data and not used_ol:
-                failed += 1
-            else:
-                skipped += 1
-            time.sleep(random.uniform(0.15, 0.35))
-            continue
-
-        source = "OL" if used_ol and not product_data else ("OL+shop" if used_ol else "shop")
+        if row["edition_id"] is not None:
+            links.setdefault(row["edition_id"], row["retailer_url"])
+    resume_after = 0 if args.reset or args.dry_run else load_checkpoint(args.checkpoint)
+    edition_ids = [eid for eid in sorted(links) if eid > resume_after]
+    if resume_after:
+        print(f"Resuming after edition {resume_after}", flush=True)
+    edition_meta = load_edition_meta(sb, edition_ids)
+    edition_ids = [eid for eid in edition_ids if eid in edition_meta]
+
+    session = build_session(args)
+    counts = {"updated": 0, "skipped": 0, "failed": 0, "ol_fallback": 0, "write_failed": 0}
+    pending: list[dict] = []
+    finished: set[int] = set()
+    cursor = 0  # edition_ids[:cursor] are all finished and flushed
+    started = last_report = time.monotonic()
+
+    def flush() -> None:
+        nonlocal cursor
+        if pending and not args.dry_run:
+            result = write_rows(sb, "editions", pending, upsert=True, on_conflict="id", max_workers=2)
+            counts["write_failed"] += result.rows_failed
+        pending.clear()
+        while cursor < len(edition_ids) and edition_ids[cursor] in finished:
+            cursor += 1
+        if cursor and not args.dry_run:
+            save_checkpoint(args.checkpoint, edition_ids[cursor - 1])
+
+    def report(final: bool = False) -> None:
+        done = len(finished)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        rate = done / elapsed
+        eta = (len(edition_ids) - done) / rate if rate else 0
+        cache = ""
+        if isinstance(session, CachedSession):
+            cache = f" cache={session.hits}/{session.hits + session.misses}"
         print(
-            f"{'DRY ' if args.dry_run else ''}edition {edition_id} ({source}): {payload}",
+            f"{'Done.' if final else '...'} {done}/{len(edition_ids)} editions "
+            f"{rate:.1f}/s elapsed={format_duration(elapsed)}"
+            f"{'' if final else f' eta={format_duration(eta)}'} "
+            f"updated={counts['updated']} skipped={counts['skipped']} failed={counts['failed']} "
+            f"ol_fallback={counts['ol_fallback']} write_failed={counts['write_failed']}{cache}",
             flush=True,
         )
 
-        if not args.dry_run:
-            sb.table("editions").update(payload).eq("id", edition_id).execute()
-
-        updated += 1
-        time.sleep(random.uniform(0.2, 0.5))
-
-    print(
-        f"Done. updated={updated} skipped={skipped} failed={failed} ol_fallback={ol_fallback}",
-        flush=True,
-    )
+    max_in_flight = max(args.workers, 1) * 2
+    queue = iter(edition_ids)
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+        while True:
+            for edition_id in queue:
+                in_flight.add(pool.submit(
+                    process_edition, session, edition_id, links[edition_id], edition_meta[edition_id]
+                ))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                edition_id = result["edition_id"]
+                counts[result["status"]] += 1
+                counts["ol_fallback"] += int(result["used_ol"])
+                if result["payload"]:
+                    print(
+                        f"{'DRY ' if args.dry_run else ''}edition {edition_id} "
+                        f"({result['source']}): {result['payload']}",
+                        flush=True,
+                    )
+                    pending.append(edition_update_row(edition_id, edition_meta[edition_id], result["payload"]))
+                finished.add(edition_id)
+            if len(pending) >= args.flush_size:
+                flush()
+            if time.monotonic() - last_report >= PROGRESS_INTERVAL_SECONDS:
+                flush()
+                report()
+                last_report = time.monotonic()
+
+    flush()
+    report(final=True)
 
 
 if __name__ == "__main__":
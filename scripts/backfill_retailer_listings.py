@@ -1,14 +1,24 @@
 """
 Backfill retailer_listings (and missing works/editions) from items_seen.
 
+Loads works, editions, collections and existing listings once, matches items
+in memory (CatalogIndex, exact tiers of find_work_id), and writes new works,
+editions and listings in bulk per batch of items. Progress is checkpointed
+after every batch; a rerun resumes after the last finished items_seen id.
+
 Usage:
   python scripts/backfill_retailer_listings.py          # dry run
   python scripts/backfill_retailer_listings.py --apply
+  python scripts/backfill_retailer_listings.py --apply --workers 8 --batch-size 5000
+  python scripts/backfill_retailer_listings.py --apply --reset   # ignore checkpoint
 """
 
 import argparse
+import json
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -17,35 +27,195 @@ from supabase import create_client
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
+from batch_writer import write_rows  # noqa: E402
 from silver_catalog import (  # noqa: E402
+    CatalogIndex,
     build_retailer_listing_row,
-    ensure_catalog_for_item,
-    find_edition_id,
-    find_work_id,
+    fetch_all_rows,
     normalize_title,
+    normalize_url,
+    resolve_work_author,
 )
 
 load_dotenv()
 
+DEFAULT_CHECKPOINT = ROOT / ".backfill_retailer_listings.checkpoint.json"
+
 
 def load_collection_map(sb):
     resp = sb.table("collections").select("id, store_name, publisher_id").execute()
     return {r["store_name"]: r for r in (resp.data or [])}
 
 
-def author_for_item(sb, title: str, item_author: str | None):
+def load_checkpoint(path: Path) -> dict:
+    if not path.exists():
+        return {"last_items_seen_id": 0, "upserted": 0}
+    return json.loads(path.read_text())
+
+
+def save_checkpoint(path: Path, state: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state))
+    tmp.replace(path)
+
+
+def load_inputs(sb, workers: int):
+    """Read every input table once, concurrently."""
+    jobs = {
+        "collections": lambda: load_collection_map(sb),
+        "works": lambda: fetch_all_rows(sb, "works", CatalogIndex.WORK_COLUMNS),
+        "editions": lambda: fetch_all_rows(sb, "editions", CatalogIndex.EDITION_COLUMNS),
+        "listings": lambda: fetch_all_rows(sb, "retailer_listings", "id, items_seen_id"),
+        "items": lambda: fetch_all_rows(
+            sb, "items_seen", "id, name, store, link, in_stock, typed_price_cents, author"
+        ),
+    }
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        futures = {name: pool.submit(job) for name, job in jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def author_for_item(index: CatalogIndex, title: str, item_author: str | None):
     if item_author:
         return item_author
-    work_id = find_work_id(sb, title)
-    if not work_id:
-        return None
-    resp = sb.table("works").select("author").eq("id", work_id).limit(1).execute()
-    return (resp.data or [{}])[0].get("author")
+    work_id = index.find_work_id(title)
+    return index.works_by_id[work_id]["author"] if work_id else None
+
+
+def resolve_works(sb, index, batch, *, apply, workers, stats):
+    """Match each item to a work (mirrors ensure_work); create/update works in bulk."""
+    new_works: dict[tuple, dict] = {}
+    author_updates: dict[int, dict] = {}
+    for entry in batch:
+        title = entry["item"]["name"]
+        author = resolve_work_author(title, author_for_item(index, title, entry["item"].get("author")))
+        entry["author"] = author
+        work_id = entry["work_id"] = index.find_work_id(title, author)
+        if work_id:
+            work = index.works_by_id[work_id]
+            if author and work["author"] != author:
+                updated = {**work, "author": author, "normalized_author": normalize_title(author)}
+                author_updates[work_id] = updated
+                index.add_work(updated)
+            continue
+        norm_author = normalize_title(author) if author else None
+        entry["work_key"] = (normalize_title(title), norm_author)
+        new_works.setdefault(entry["work_key"], {
+            "title": title,
+            "normalized_title": normalize_title(title),
+            "author": author,
+            "normalized_author": norm_author,
+        })
+
+    stats["works_created"] += len(new_works)
+    stats["works_updated"] += len(author_updates)
+    if not apply:
+        return
+
+    if author_updates:
+        result = write_rows(
+            sb, "works", list(author_updates.values()), upsert=True, on_conflict="id", max_workers=workers
+        )
+        stats["failed"] += result.rows_failed
+    if new_works:
+        result = write_rows(
+            sb, "works", list(new_works.values()), returning=CatalogIndex.WORK_COLUMNS.replace(" ", ""),
+            max_workers=workers,
+        )
+        # A new work is used directly, as ensure_work does: exact lookups cannot
+        # find a work without an author when no author is given.
+        created = {}
+        for row in result.returned:
+            index.add_work(row)
+            created[(row["normalized_title"], row["normalized_author"])] = row["id"]
+        for entry in batch:
+            if not entry["work_id"]:
+                entry["work_id"] = created.get(entry["work_key"])
+        stats["failed"] += result.rows_failed
+
+
+def resolve_editions(sb, index, batch, *, apply, workers, stats):
+    """Match each item to an edition (mirrors ensure_edition); create editions in bulk."""
+    new_editions: dict[tuple, dict] = {}
+    for entry in batch:
+        title = entry["item"]["name"]
+        publisher_id = entry["collection"]["publisher_id"]
+        if index.find_edition_id(publisher_id, title):
+            continue
+        work_id = entry["work_id"]
+        if not work_id and apply:
+            continue
+        new_editions.setdefault((publisher_id, normalize_title(title)), {
+            "work_id": work_id,
+            "publisher_id": publisher_id,
+            "title": title,
+            "normalized_title": normalize_title(title),
+            "physical_format": "hardcover",
+        })
+
+    stats["editions_created"] += len(new_editions)
+    if not apply or not new_editions:
+        return
+    result = write_rows(
+        sb, "editions", list(new_editions.values()),
+        returning=CatalogIndex.EDITION_COLUMNS.replace(" ", ""), max_workers=workers,
+    )
+    for row in result.returned:
+        index.add_edition(row)
+    stats["failed"] += result.rows_failed
+
+
+def process_batch(sb, index, collection_map, items, *, apply, workers, stats, skipped):
+    batch = []
+    for item in items:
+        if not item.get("name") or not item.get("store") or not item.get("link"):
+            skipped.append((item["id"], "missing fields"))
+            continue
+        collection = collection_map.get(item["store"])
+        if not collection:
+            skipped.append((item["id"], f"no collection for {item['store']}"))
+            continue
+        batch.append({"item": item, "collection": collection})
+
+    resolve_works(sb, index, batch, apply=apply, workers=workers, stats=stats)
+    resolve_editions(sb, index, batch, apply=apply, workers=workers, stats=stats)
+
+    # One row per (collection, normalized URL); later items win, as sequential upserts would.
+    rows: dict[tuple, dict] = {}
+    for entry in batch:
+        item = entry["item"]
+        edition_id = index.find_edition_id(entry["collection"]["publisher_id"], item["name"])
+        if not edition_id:
+            if apply:
+                skipped.append((item["id"], f"catalog resolve failed ({item['store']})"))
+            else:
+                stats["listings"] += 1
+            continue
+        rows[(entry["collection"]["id"], normalize_url(item["link"]))] = build_retailer_listing_row(
+            edition_id=edition_id,
+            collection_id=entry["collection"]["id"],
+            items_seen_id=item["id"],
+            link=item["link"],
+            in_stock=item.get("in_stock"),
+            price_cents=item.get("typed_price_cents"),
+        )
+
+    stats["listings"] += len(rows)
+    if apply and rows:
+        result = write_rows(
+            sb, "retailer_listings", list(rows.values()),
+            upsert=True, on_conflict="collection_id,retailer_url_normalized", max_workers=workers,
+        )
+        stats["failed"] += result.rows_failed
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--apply", action="store_true")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent reads/write chunks")
+    parser.add_argument("--batch-size", type=int, default=2000, help="items per checkpoint")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--reset", action="store_true", help="ignore and overwrite the checkpoint")
     args = parser.parse_args()
 
     sb = create_client(
@@ -53,89 +223,59 @@ def main():
         os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ["SUPABASE_KEY"],
     )
 
-    collection_map = load_collection_map(sb)
-    items = (
-        sb.table("items_seen")
-        .select("id, name, store, link, in_stock, typed_price_cents, author")
-        .not_.is_("link", "null")
-        .execute()
-        .data
-        or []
+    started = time.perf_counter()
+    inputs = load_inputs(sb, args.workers)
+    index = CatalogIndex(inputs["works"], inputs["editions"])
+    collection_map = inputs["collections"]
+    items = [i for i in inputs["items"] if i.get("link")]
+    existing = {r["items_seen_id"] for r in inputs["listings"] if r.get("items_seen_id")}
+    print(
+        f"Loaded {len(index.works_by_id)} works, {len(inputs['editions'])} editions, "
+        f"{len(inputs['listings'])} listings in {time.perf_counter() - started:.1f}s"
     )
-    existing = {
-        r["items_seen_id"]
-        for r in (sb.table("retailer_listings").select("items_seen_id").execute().data or [])
-        if r.get("items_seen_id")
-    }
 
-    to_process = [i for i in items if i["id"] not in existing]
+    checkpoint = {"last_items_seen_id": 0, "upserted": 0}
+    if args.apply and not args.reset:
+        checkpoint = load_checkpoint(args.checkpoint)
+        if checkpoint["last_items_seen_id"]:
+            print(f"Resuming after items_seen id {checkpoint['last_items_seen_id']}")
+
+    to_process = sorted(
+        (i for i in items if i["id"] not in existing and i["id"] > checkpoint["last_items_seen_id"]),
+        key=lambda i: i["id"],
+    )
     print(f"items_seen with link: {len(items)}")
     print(f"already listed: {len(existing)}")
     print(f"to backfill: {len(to_process)}")
 
-    rows = []
+    stats = {"works_created": 0, "works_updated": 0, "editions_created": 0, "listings": 0, "failed": 0}
     skipped = []
-    for item in to_process:
-        title = item.get("name")
-        store = item.get("store")
-        link = item.get("link")
-        if not title or not store or not link:
-            skipped.append((item["id"], "missing fields"))
-            continue
-
-        author = author_for_item(sb, title, item.get("author"))
-        if not args.apply:
-            collection = collection_map.get(store)
-            if not collection:
-                skipped.append((item["id"], f"no collection for {store}"))
-                continue
-            edition_id = find_edition_id(sb, collection["publisher_id"], title)
-            if edition_id:
-                rows.append(item["id"])
-            else:
-                work_id = find_work_id(sb, title, author)
-                skipped.append((item["id"], f"would create work={not work_id}"))
-                rows.append(item["id"])
-            continue
-
-        resolved = ensure_catalog_for_item(
-            sb, title=title, store=store, author=author, collection_map=collection_map
-        )
-        if not resolved:
-            skipped.append((item["id"], f"catalog resolve failed ({store})"))
-            continue
-
-        rows.append(
-            build_retailer_listing_row(
-                edition_id=resolved["edition_id"],
-                collection_id=resolved["collection_id"],
-                items_seen_id=item["id"],
-                link=link,
-                in_stock=item.get("in_stock"),
-                price_cents=item.get("typed_price_cents"),
-            )
+    for start in range(0, len(to_process), args.batch_size):
+        items_batch = to_process[start:start + args.batch_size]
+        process_batch(
+            sb, index, collection_map, items_batch,
+            apply=args.apply, workers=args.workers, stats=stats, skipped=skipped,
         )
+        if args.apply:
+            checkpoint = {
+                "last_items_seen_id": items_batch[-1]["id"],
+                "upserted": checkpoint["upserted"] + len(items_batch),
+            }
+            save_checkpoint(args.checkpoint, checkpoint)
+        print(f"  processed {min(start + args.batch_size, len(to_process))}/{len(to_process)}")
 
+    verb = "Upserted" if args.apply else "Would upsert"
+    print(
+        f"{verb} {stats['listings']} retailer_listings "
+        f"(works: +{stats['works_created']} created, {stats['works_updated']} author updates; "
+        f"editions: +{stats['editions_created']}); skipped {len(skipped)}, failed rows {stats['failed']}"
+    )
+    for sid, reason in skipped[:15]:
+        print(f"  skip {sid}: {reason}")
     if not args.apply:
-        print(f"Would upsert {len(rows)} retailer_listings; skipped {len(skipped)}")
-        for sid, reason in skipped[:15]:
-            print(f"  skip {sid}: {reason}")
         print("\nDry run. Pass --apply to write.")
         return
-
-    if not rows:
-        print("Nothing to upsert.")
-        return
-
-    batch_size = 50
-    for i in range(0, len(rows), batch_size):
-        batch = rows[i : i + batch_size]
-        sb.table("retailer_listings").upsert(
-            batch, on_conflict="collection_id,retailer_url_normalized"
-        ).execute()
-        print(f"  upserted {min(i + batch_size, len(rows))}/{len(rows)}")
-
-    print(f"\nDone. Upserted {len(rows)}, skipped {len(skipped)}")
+    print(f"\nDone in {time.perf_counter() - started:.1f}s")
 
 
 if __name__ == "__main__":
@@ -1,20 +1,95 @@
 """
 Backfill watchlist.edition_id from retailer_listings.items_seen_id.
 
+Runs as one set-based transaction on a direct Postgres connection (same
+credentials as silver_quality_gate.py): every watchlist row is resolved to an
+edition in a temp table, then duplicates are removed with one DELETE ... USING
+and keepers are filled with one UPDATE ... FROM. A dry run computes the same
+counts and rolls back.
+
+Only meaningful before migration 016 drops watchlist.item_id; afterwards the
+script reports there is nothing to do.
+
+Prerequisites:
+  - SUPABASE_URL and SUPABASE_PASS env vars set.
+
 Usage:
   python scripts/backfill_watchlist_editions.py          # dry run
   python scripts/backfill_watchlist_editions.py --apply
 """
 
 import argparse
-import os
 import sys
-from pathlib import Path
 
-from dotenv import load_dotenv
-from supabase import create_client
+from silver_quality_gate import connect
+
+# One row per watchlist entry. `rank` 1 is the keeper of its
+# (user_id, edition_id) group: prefer rows that already have an edition_id,
+# then the oldest.
+RESOLVE_SQL = """
+CREATE TEMP TABLE watchlist_backfill ON COMMIT DROP AS
+WITH item_edition AS (
+  SELECT DISTINCT ON (items_seen_id) items_seen_id, edition_id
+  FROM public.retailer_listings
+  WHERE items_seen_id IS NOT NULL AND edition_id IS NOT NULL
+  ORDER BY items_seen_id, id
+),
+resolved AS (
+  SELECT
+    w.id,
+    w.user_id,
+    w.created_at,
+    w.edition_id AS current_edition_id,
+    coalesce(w.edition_id, ie.edition_id) AS edition_id
+  FROM public.watchlist w
+  LEFT JOIN item_edition ie ON ie.items_seen_id = w.item_id
+)
+SELECT
+  id,
+  current_edition_id,
+  edition_id,
+  row_number() OVER (
+    PARTITION BY user_id, edition_id
+    ORDER BY current_edition_id IS NULL, created_at, id
+  ) AS rank
+FROM resolved
+"""
 
-load_dotenv()
+COUNTS_SQL = """
+SELECT
+  count(*)::int,
+  count(current_edition_id)::int,
+  count(*) FILTER (WHERE edition_id IS NOT NULL AND rank = 1 AND current_edition_id IS NULL)::int,
+  count(*) FILTER (WHERE edition_id IS NOT NULL AND rank > 1)::int,
+  count(*) FILTER (WHERE edition_id IS NULL)::int
+FROM watchlist_backfill
+"""
+
+DELETE_SQL = """
+DELETE FROM public.watchlist w
+USING watchlist_backfill b
+WHERE w.id = b.id AND b.edition_id IS NOT NULL AND b.rank > 1
+"""
+
+UPDATE_SQL = """
+UPDATE public.watchlist w
+SET edition_id = b.edition_id
+FROM watchlist_backfill b
+WHERE w.id = b.id
+  AND b.rank = 1
+  AND b.current_edition_id IS NULL
+  AND b.edition_id IS NOT NULL
+"""
+
+
+def has_item_id(cur):
+    cur.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'watchlist' AND column_name = 'item_id'
+        """
+    )
+    return cur.fetchone() is not None
 
 
 def main():
@@ -22,76 +97,47 @@ def main():
     parser.add_argument("--apply", action="store_true")
     args = parser.parse_args()
 
-    sb = create_client(
-        os.environ["SUPABASE_URL"],
-        os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ["SUPABASE_KEY"],
-    )
-
-    watchlist = (
-        sb.table("watchlist")
-        .select("id, user_id, item_id, edition_id")
-        .execute()
-        .data
-        or []
-    )
-    listings = (
-        sb.table("retailer_listings")
-        .select("items_seen_id, edition_id")
-        .execute()
-        .data
-        or []
-    )
-    edition_by_item = {
-        r["items_seen_id"]: r["edition_id"]
-        for r in listings
-        if r.get("items_seen_id") and r.get("edition_id")
-    }
-
-    to_update = []
-    to_delete = []
-    skipped = []
-    groups = {}
-    for row in watchlist:
-        edition_id = row.get("edition_id") or edition_by_item.get(row["item_id"])
-        if not edition_id:
-            skipped.append(row)
-            continue
-        groups.setdefault((row["user_id"], edition_id), []).append(row)
-
-    for (_user_id, edition_id), rows in groups.items():
-        with_edition = [r for r in rows if r.get("edition_id")]
-        keeper = with_edition[0] if with_edition else rows[0]
-        for row in rows:
-            if row["id"] != keeper["id"]:
-                to_delete.append(row["id"])
-        if not keeper.get("edition_id"):
-            to_update.append({"id": keeper["id"], "edition_id": edition_id})
-
-    print(f"watchlist rows: {len(watchlist)}")
-    print(f"already have edition_id: {sum(1 for r in watchlist if r.get('edition_id'))}")
-    print(f"to backfill: {len(to_update)}")
-    print(f"duplicate rows to remove: {len(to_delete)}")
-    print(f"unmapped item_id: {len(skipped)}")
-
-    if not args.apply:
-        print("\nDry run. Pass --apply to write.")
-        return
-
-    for row_id in to_delete:
-        sb.table("watchlist").delete().eq("id", row_id).execute()
-
-    for row in to_update:
-        sb.table("watchlist").update({"edition_id": row["edition_id"]}).eq("id", row["id"]).execute()
-
-    remaining = (
-        sb.table("watchlist")
-        .select("id", count="exact")
-        .is_("edition_id", "null")
-        .execute()
-        .count
-    )
-    print(f"\nApplied {len(to_update)} updates. edition_id still null: {remaining}")
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            if not has_item_id(cur):
+                print("watchlist.item_id no longer exists (migration 016); nothing to backfill.")
+                return
+
+            if args.apply:
+                # Block concurrent watchlist writes so the plan stays valid until commit.
+                cur.execute("LOCK TABLE public.watchlist IN SHARE ROW EXCLUSIVE MODE")
+            cur.execute(RESOLVE_SQL)
+            cur.execute(COUNTS_SQL)
+            total, with_edition, to_update, to_delete, unmapped = cur.fetchone()
+
+            print(f"watchlist rows: {total}")
+            print(f"already have edition_id: {with_edition}")
+            print(f"to backfill: {to_update}")
+            print(f"duplicate rows to remove: {to_delete}")
+            print(f"unmapped item_id: {unmapped}")
+
+            if not args.apply:
+                conn.rollback()
+                print("\nDry run. Pass --apply to write.")
+                return
+
+            # Duplicates go first so the keeper update cannot hit watchlist_user_edition_uniq.
+            cur.execute(DELETE_SQL)
+            deleted = cur.rowcount
+            cur.execute(UPDATE_SQL)
+            updated = cur.rowcount
+            cur.execute("SELECT count(*)::int FROM public.watchlist WHERE edition_id IS NULL")
+            remaining = cur.fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"\nApplied {updated} updates, removed {deleted} duplicates. edition_id still null: {remaining}")
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -4,18 +4,25 @@ Backfill works.author from Open Library with a reviewable CSV step.
 Prerequisites:
   - SUPABASE_URL and SUPABASE_KEY (or SUPABASE_SERVICE_ROLE_KEY) env vars set.
 
+Both phases stream. `propose` pages null-author works by id, runs Open Library
+lookups concurrently through the on-disk HTTP cache, and appends each CSV row
+as it completes (an interrupted run keeps its rows; pass the CSV to --resume).
+`apply` reads approved rows in chunks, checks works_norm_uniq collisions with
+one query per chunk, and writes each chunk as a bulk upsert.
+
 Usage:
   python scripts/backfill_work_authors.py propose
-  python scripts/backfill_work_authors.py propose --limit 50
+  python scripts/backfill_work_authors.py propose --limit 50 --workers 8
   python scripts/backfill_work_authors.py apply --input out/work_author_proposals_....csv
 """
 
 import argparse
 import csv
+import itertools
 import os
-import random
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -25,13 +32,19 @@ from supabase import create_client
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
-from open_library import lookup_author, normalize_text, titles_match  # noqa: E402
+from batch_writer import write_rows  # noqa: E402
+from http_cache import CachedSession, limit_host  # noqa: E402
+from open_library import OL_SEARCH, lookup_author, normalize_text, titles_match  # noqa: E402
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
 OUT_DIR = ROOT / "out"
+CACHE_DIR = ROOT / ".http_cache"
+PAGE_SIZE = 1000
+# Titles per `in_("normalized_title", ...)` lookup; keeps the GET URL short.
+TITLE_LOOKUP_CHUNK_SIZE = 50
 
 CSV_FIELDS = [
     "work_id",
@@ -52,18 +65,24 @@ def get_supabase():
     return create_client(SUPABASE_URL, SUPABASE_KEY)
 
 
-def fetch_null_author_works(sb, limit=None, offset=0):
-    query = (
-        sb.table("works")
-        .select("id, title, normalized_title, author")
-        .is_("author", "null")
-        .order("id")
-    )
-    if limit is not None:
-        end = offset + limit - 1
-        query = query.range(offset, end)
-    resp = query.execute()
-    return resp.data or []
+def iter_null_author_works(sb, page_size=PAGE_SIZE):
+    last_id = 0
+    while True:
+        page = (
+            sb.table("works")
+            .select("id, title, normalized_title, author")
+            .is_("author", "null")
+            .gt("id", last_id)
+            .order("id")
+            .limit(page_size)
+            .execute()
+            .data
+            or []
+        )
+        yield from page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
 
 
 def load_resume_ids(csv_paths):
@@ -76,77 +95,162 @@ def load_resume_ids(csv_paths):
     return seen
 
 
+class Progress:
+    """Prints processed count and rate at most every `interval` seconds."""
+
+    def __init__(self, label, interval=5.0):
+        self.label = label
+        self.interval = interval
+        self.count = 0
+        self.started = self._last = time.monotonic()
+
+    def add(self, n=1):
+        self.count += n
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.print()
+
+    def print(self, final=False):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        prefix = "Done." if final else "..."
+        print(f"{prefix} {self.label}: {self.count} in {elapsed:.1f}s ({self.count / elapsed:.1f}/s)", flush=True)
+
+
+def propose_row(session, work):
+    title = work["title"]
+    result = None
+    try:
+        result = lookup_author(title, session=session)
+    except Exception as e:
+        print(f"    OL error for work_id={work['id']}: {e}", flush=True)
+    ol_author = result["author"] if result else ""
+    ol_title = result["ol_title"] if result else ""
+    return {
+        "work_id": work["id"],
+        "title": title,
+        "normalized_title": work.get("normalized_title") or "",
+        "ol_author": ol_author or "",
+        "ol_work_key": (result["ol_work_key"] if result else "") or "",
+        "ol_title": ol_title or "",
+        "ol_num_docs": result["num_docs"] if result else 0,
+        "approve": "y" if result and ol_author and titles_match(title, ol_title) else "",
+    }
+
+
 def cmd_propose(args):
     sb = get_supabase()
-    works = fetch_null_author_works(sb, limit=args.limit, offset=args.offset)
+    works = iter_null_author_works(sb)
+    works = itertools.islice(works, args.offset, args.offset + args.limit if args.limit is not None else None)
     if args.resume:
         skip_ids = load_resume_ids(args.resume)
-        works = [w for w in works if w["id"] not in skip_ids]
+        works = (w for w in works if w["id"] not in skip_ids)
 
-    print(f"Proposing authors for {len(works)} works (author is null).")
     OUT_DIR.mkdir(exist_ok=True)
     ts = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     out_path = OUT_DIR / f"work_author_proposals_{ts}.csv"
 
-    import requests
-
-    session = requests.Session()
-    rows = []
-    for i, work in enumerate(works, 1):
-        title = work["title"]
-        print(f"  [{i}/{len(works)}] {title[:60]}...")
-        result = None
-        try:
-            result = lookup_author(title, session=session)
-        except Exception as e:
-            print(f"    OL error: {e}")
-        ol_author = result["author"] if result else ""
-        ol_work_key = result["ol_work_key"] if result else ""
-        ol_title = result["ol_title"] if result else ""
-        ol_num_docs = result["num_docs"] if result else 0
-        approve = ""
-        if result and ol_author and titles_match(title, ol_title):
-            approve = "y"
-        rows.append({
-            "work_id": work["id"],
-            "title": title,
-            "normalized_title": work.get("normalized_title") or "",
-            "ol_author": ol_author or "",
-            "ol_work_key": ol_work_key or "",
-            "ol_title": ol_title or "",
-            "ol_num_docs": ol_num_docs,
-            "approve": approve,
-        })
-        time.sleep(random.uniform(0.2, 0.5))
+    session = CachedSession(CACHE_DIR)
+    limit_host(session, OL_SEARCH, args.workers)
 
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
+    print(f"Proposing authors for null-author works -> {out_path}", flush=True)
+    progress = Progress("works looked up")
+    auto = 0
+    with open(out_path, "w", newline="", encoding="utf-8") as f, ThreadPoolExecutor(args.workers) as pool:
         writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
         writer.writeheader()
-        writer.writerows(rows)
-
-    auto = sum(1 for r in rows if r["approve"] == "y")
-    print(f"\nWrote {len(rows)} proposals to {out_path}")
+        in_flight = set()
+        while True:
+            for work in works:
+                in_flight.add(pool.submit(propose_row, session, work))
+                if len(in_flight) >= args.workers * 2:
+                    break
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                row = future.result()
+                writer.writerow(row)
+                auto += row["approve"] == "y"
+            f.flush()
+            progress.add(len(done))
+
+    progress.print(final=True)
+    print(f"\nWrote {progress.count} proposals to {out_path} (cache hits: {session.hits})")
     print(f"Auto-approved (approve=y): {auto}")
     print("Review the CSV, set approve=y on rows you want applied, then run apply --input ...")
 
 
-def fetch_existing_work_keys(sb, normalized_title, normalized_author, exclude_id):
-    norm_author_key = normalized_author or ""
-    resp = (
-        sb.table("works")
-        .select("id, title, author")
-        .eq("normalized_title", normalized_title)
-        .execute()
-    )
-    collisions = []
-    for row in resp.data or []:
-        if row["id"] == exclude_id:
+def iter_approved_chunks(path, chunk_size):
+    with open(path, newline="", encoding="utf-8") as f:
+        approved = (r for r in csv.DictReader(f) if (r.get("approve") or "").strip().lower() == "y")
+        while True:
+            chunk = list(itertools.islice(approved, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def fetch_works_by_title(sb, normalized_titles):
+    """All works sharing any of these normalized titles, grouped by title."""
+    by_title = {}
+    titles = sorted(normalized_titles)
+    for start in range(0, len(titles), TITLE_LOOKUP_CHUNK_SIZE):
+        resp = (
+            sb.table("works")
+            .select("id, title, author, normalized_title, open_library_id")
+            .in_("normalized_title", titles[start:start + TITLE_LOOKUP_CHUNK_SIZE])
+            .execute()
+        )
+        for row in resp.data or []:
+            by_title.setdefault(row["normalized_title"], []).append(row)
+    return by_title
+
+
+def plan_chunk(sb, rows, claimed_keys):
+    """Split approved CSV rows into upsert rows and skipped rows (with reasons)."""
+    updates, skipped, candidates = [], [], []
+    for row in rows:
+        author = (row.get("ol_author") or "").strip()
+        if not author:
+            skipped.append({**row, "reason": "empty ol_author"})
+            continue
+        normalized_title = row.get("normalized_title") or normalize_text(row.get("title"))
+        candidates.append((row, author, normalized_title, normalize_text(author)))
+
+    existing = fetch_works_by_title(sb, {c[2] for c in candidates}) if candidates else {}
+    for row, author, normalized_title, normalized_author in candidates:
+        work_id = int(row["work_id"])
+        key = (normalized_title, normalized_author or "")
+        same_title = existing.get(normalized_title, [])
+        current = next((w for w in same_title if w["id"] == work_id), None)
+        collision = next(
+            (
+                w for w in same_title
+                if w["id"] != work_id
+                and (normalize_text(w["author"]) if w.get("author") else "") == key[1]
+            ),
+            None,
+        )
+        if collision:
+            skipped.append({**row, "reason": f"uniqueness collision with work_id={collision['id']}"})
             continue
-        row_author = row.get("author")
-        row_norm = normalize_text(row_author) if row_author else ""
-        if row_norm == norm_author_key:
-            collisions.append(row)
-    return collisions
+        if key in claimed_keys:
+            skipped.append({**row, "reason": f"uniqueness collision with work_id={claimed_keys[key]}"})
+            continue
+        if current is None:
+            skipped.append({**row, "reason": "work not found under normalized_title"})
+            continue
+        claimed_keys[key] = work_id
+        updates.append({
+            "id": work_id,
+            "title": current["title"],
+            "normalized_title": current["normalized_title"],
+            "author": author,
+            "normalized_author": normalized_author,
+            "open_library_id": (row.get("ol_work_key") or "").strip() or current.get("open_library_id"),
+        })
+    return updates, skipped
 
 
 def cmd_apply(args):
@@ -156,48 +260,32 @@ def cmd_apply(args):
         print(f"Error: input file not found: {input_path}")
         sys.exit(1)
 
-    with open(input_path, newline="", encoding="utf-8") as f:
-        rows = [r for r in csv.DictReader(f) if (r.get("approve") or "").strip().lower() == "y"]
-
-    if not rows:
-        print("No rows with approve=y found in CSV.")
-        return
-
-    print(f"Applying {len(rows)} approved author updates...")
     OUT_DIR.mkdir(exist_ok=True)
     ts = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     skipped_path = OUT_DIR / f"work_author_apply_skipped_{ts}.csv"
 
+    print(f"Applying approved author updates from {input_path} in chunks of {args.chunk_size}...")
+    progress = Progress("approved rows")
     applied = 0
     skipped = []
-    for row in rows:
-        work_id = int(row["work_id"])
-        author = (row.get("ol_author") or "").strip()
-        if not author:
-            skipped.append({**row, "reason": "empty ol_author"})
-            continue
-        normalized_author = normalize_text(author)
-        normalized_title = row.get("normalized_title") or normalize_text(row.get("title"))
-        ol_work_key = (row.get("ol_work_key") or "").strip() or None
-
-        collisions = fetch_existing_work_keys(sb, normalized_title, normalized_author, work_id)
-        if collisions:
-            skipped.append({
-                **row,
-                "reason": f"uniqueness collision with work_id={collisions[0]['id']}",
-            })
-            continue
-
-        update = {
-            "author": author,
-            "normalized_author": normalized_author,
-        }
-        if ol_work_key:
-            update["open_library_id"] = ol_work_key
-
-        sb.table("works").update(update).eq("id", work_id).execute()
-        applied += 1
-        print(f"  Updated work_id={work_id}: {author}")
+    claimed_keys = {}
+    for chunk in iter_approved_chunks(input_path, args.chunk_size):
+        updates, chunk_skipped = plan_chunk(sb, chunk, claimed_keys)
+        skipped.extend(chunk_skipped)
+        if updates:
+            result = write_rows(sb, "works", updates, upsert=True, on_conflict="id", max_workers=1)
+            applied += result.rows_written
+            failed_ids = {r["id"] for r in result.failed_rows}
+            skipped.extend(
+                {**r, "reason": f"write failed: {result.errors[0] if result.errors else ''}"}
+                for r in chunk if int(r["work_id"]) in failed_ids
+            )
+        progress.add(len(chunk))
+
+    if not progress.count:
+        print("No rows with approve=y found in CSV.")
+        return
+    progress.print(final=True)
 
     if skipped:
         with open(skipped_path, "w", newline="", encoding="utf-8") as f:
@@ -223,9 +311,11 @@ def main():
         default=[],
         help="Prior proposal CSV paths; skip work_ids already present",
     )
+    p_propose.add_argument("--workers", type=int, default=4, help="Concurrent Open Library lookups")
 
     p_apply = sub.add_parser("apply", help="Apply reviewed CSV to works table")
     p_apply.add_argument("--input", required=True, help="Reviewed proposals CSV path")
+    p_apply.add_argument("--chunk-size", type=int, default=200, help="Approved rows per bulk update")
 
     args = parser.parse_args()
     if args.command == "apply":
@@ -4,9 +4,15 @@ Repair corrupted normalized_title / normalized_author on works and editions.
 The initial backfill used a broken Postgres regexp that stripped the first
 character of each word. This script recomputes keys using silver_catalog.normalize_title.
 
+Both tables are streamed in id-keyset pages (no PostgREST row cap), keys are
+recomputed per page, and the post-fix keys are checked against works_norm_uniq
+and editions_norm_uniq in memory before anything is written. Updates go out as
+chunked bulk upserts on id.
+
 Usage:
   python scripts/fix_silver_normalization.py          # dry run
   python scripts/fix_silver_normalization.py --apply
+  python scripts/fix_silver_normalization.py --show 50   # more collision groups
 """
 
 import argparse
@@ -21,14 +27,75 @@ from supabase import create_client
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
-from silver_catalog import normalize_title  # noqa: E402
+from batch_writer import write_rows  # noqa: E402
+from silver_catalog import iter_pages, normalize_title  # noqa: E402
 
 load_dotenv()
 
+PAGE_SIZE = 1000
+
+
+def work_key(normalized_title, normalized_author):
+    # works_norm_uniq: (normalized_title, coalesce(normalized_author, ''))
+    return (normalized_title, normalized_author or "")
+
+
+def edition_key(row, normalized_title):
+    # editions_norm_uniq: (work_id, publisher_id, normalized_title, coalesce(edition_type, ''))
+    return (row["work_id"], row["publisher_id"], normalized_title, row.get("edition_type") or "")
+
+
+def scan_works(sb, page_size=PAGE_SIZE):
+    """Return (updates, {post-fix key: [(id, title, author)]}, total)."""
+    updates, keys, total = [], defaultdict(list), 0
+    columns = "id, title, author, normalized_title, normalized_author"
+    for page in iter_pages(sb, "works", columns, page_size):
+        total += len(page)
+        new_titles = [normalize_title(w["title"]) for w in page]
+        new_authors = [normalize_title(w["author"]) if w.get("author") else None for w in page]
+        for w, new_title, new_author in zip(page, new_titles, new_authors):
+            if new_title != w.get("normalized_title") or new_author != w.get("normalized_author"):
+                updates.append({
+                    "id": w["id"],
+                    "title": w["title"],
+                    "normalized_title": new_title,
+                    "normalized_author": new_author,
+                })
+            keys[work_key(new_title, new_author)].append((w["id"], w["title"], w.get("author")))
+    return updates, keys, total
+
+
+def scan_editions(sb, page_size=PAGE_SIZE):
+    """Return (updates, {post-fix key: [(id, title)]}, total)."""
+    updates, keys, total = [], defaultdict(list), 0
+    columns = "id, title, normalized_title, work_id, publisher_id, edition_type"
+    for page in iter_pages(sb, "editions", columns, page_size):
+        total += len(page)
+        new_titles = [normalize_title(e["title"]) for e in page]
+        for e, new_title in zip(page, new_titles):
+            if new_title != e.get("normalized_title"):
+                updates.append({"id": e["id"], "title": e["title"], "normalized_title": new_title})
+            keys[edition_key(e, new_title)].append((e["id"], e["title"]))
+    return updates, keys, total
+
+
+def print_collisions(label, collisions, show):
+    if not collisions:
+        return
+    print(f"\n{label} collisions (need manual merge), {len(collisions)} groups:")
+    for key, members in sorted(collisions.items(), key=lambda kv: -len(kv[1]))[:show]:
+        print(f"  {key}:")
+        for member in members:
+            print(f"    {member}")
+    if len(collisions) > show:
+        print(f"  ... {len(collisions) - show} more (--show N)")
+
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--apply", action="store_true")
+    parser.add_argument("--show", type=int, default=10, help="collision groups to print per table")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent upsert chunks")
     args = parser.parse_args()
 
     sb = create_client(
@@ -36,65 +103,17 @@ def main():
         os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ["SUPABASE_KEY"],
     )
 
-    works = sb.table("works").select("id, title, author, normalized_title, normalized_author").execute().data or []
-    editions = (
-        sb.table("editions")
-        .select("id, title, normalized_title, work_id, publisher_id, edition_type")
-        .execute()
-        .data
-        or []
-    )
+    work_updates, work_keys, work_total = scan_works(sb)
+    edition_updates, edition_keys, edition_total = scan_editions(sb)
+    work_collisions = {k: v for k, v in work_keys.items() if len(v) > 1}
+    edition_collisions = {k: v for k, v in edition_keys.items() if len(v) > 1}
 
-    work_updates = []
-    for w in works:
-        new_title = normalize_title(w["title"])
-        new_author = normalize_title(w.get("author")) if w.get("author") else None
-        if new_title != w.get("normalized_title") or new_author != w.get("normalized_author"):
-            work_updates.append({
-                "id": w["id"],
-                "normalized_title": new_title,
-                "normalized_author": new_author,
-            })
-
-    edition_updates = []
-    for e in editions:
-        new_title = normalize_title(e["title"])
-        if new_title != e.get("normalized_title"):
-            edition_updates.append({"id": e["id"], "normalized_title": new_title})
-
-    work_key_collisions = defaultdict(list)
-    for w in works:
-        wid = w["id"]
-        upd = next((u for u in work_updates if u["id"] == wid), None)
-        norm_title = upd["normalized_title"] if upd else w.get("normalized_title")
-        norm_author = upd["normalized_author"] if upd else w.get("normalized_author")
-        work_key_collisions[(norm_title, norm_author or "")].append(wid)
-
-    work_collisions = {k: v for k, v in work_key_collisions.items() if len(v) > 1}
-    edition_key_collisions = defaultdict(list)
-    for e in editions:
-        eid = e["id"]
-        upd = next((u for u in edition_updates if u["id"] == eid), None)
-        norm_title = upd["normalized_title"] if upd else e.get("normalized_title")
-        edition_key_collisions[
-            (e["work_id"], e["publisher_id"], norm_title, e.get("edition_type") or "")
-        ].append(eid)
-    edition_collisions = {k: v for k, v in edition_key_collisions.items() if len(v) > 1}
-
-    print(f"Works to update: {len(work_updates)} / {len(works)}")
-    print(f"Editions to update: {len(edition_updates)} / {len(editions)}")
+    print(f"Works to update: {len(work_updates)} / {work_total}")
+    print(f"Editions to update: {len(edition_updates)} / {edition_total}")
     print(f"Work key collisions after fix: {len(work_collisions)}")
     print(f"Edition key collisions after fix: {len(edition_collisions)}")
-
-    if work_collisions:
-        print("\nWork collisions (need manual merge):")
-        for key, ids in list(work_collisions.items())[:10]:
-            print(f"  {key}: work_ids={ids}")
-
-    if edition_collisions:
-        print("\nEdition collisions (need manual merge):")
-        for key, ids in list(edition_collisions.items())[:10]:
-            print(f"  {key}: edition_ids={ids}")
+    print_collisions("Work", work_collisions, args.show)
+    print_collisions("Edition", edition_collisions, args.show)
 
     if not args.apply:
         print("\nDry run. Pass --apply to write changes.")
@@ -104,17 +123,17 @@ def main():
         print("\nRefusing to apply while uniqueness collisions exist.")
         sys.exit(1)
 
-    for u in work_updates:
-        sb.table("works").update({
-            "normalized_title": u["normalized_title"],
-            "normalized_author": u["normalized_author"],
-        }).eq("id", u["id"]).execute()
-
-    for u in edition_updates:
-        sb.table("editions").update({
-            "normalized_title": u["normalized_title"],
-        }).eq("id", u["id"]).execute()
+    failed = 0
+    for table, rows in (("works", work_updates), ("editions", edition_updates)):
+        result = write_rows(sb, table, rows, upsert=True, on_conflict="id", max_workers=args.workers)
+        failed += result.rows_failed
+        print(f"  {table}: {result.rows_written} updated in {result.requests} requests, {result.rows_failed} failed")
+        for error in result.errors[:5]:
+            print(f"    {error}")
 
+    if failed:
+        print(f"\n{failed} rows failed; rerun to retry them.")
+        sys.exit(1)
     print("\nApplied normalization fixes.")
 
 
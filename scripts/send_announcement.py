@@ -1,16 +1,43 @@
+"""
+Send an announcement email to active users.
+
+Recipients are processed on a thread pool: unsubscribe links are signed
+tokens built locally when UNSUBSCRIBE_SIGNING_SECRET is set (otherwise Supabase
+Auth magic links, generated concurrently), and SES sends are spaced by a rate governor (the account's
+MaxSendRate unless --rate is given). Every successful send is appended to a
+checkpoint file before anything else happens, so rerunning the same
+announcement after a crash skips recipients who already got it. email_log rows
+are flushed in chunks during the run.
+
+Usage:
+  python scripts/send_announcement.py --subject "..." --body-file body.html --dry-run
+  python scripts/send_announcement.py --subject "..." --body-file body.html --workers 16
+"""
+
 import argparse
+import hashlib
 import json
 import os
 import re
 import sys
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from html import unescape
 from pathlib import Path
 
 import boto3
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 from supabase import create_client
 
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from batch_writer import write_rows  # noqa: E402
+from unsubscribe import unsubscribe_url  # noqa: E402
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -19,6 +46,13 @@ AWS_SES_REGION = os.getenv("AWS_SES_REGION")
 SES_FROM_ADDRESS = os.getenv("SES_FROM_ADDRESS")
 ADMIN_EMAILS = os.getenv("ADMIN_EMAILS", "[]")
 
+OUT_DIR = ROOT / "out"
+PAGE_SIZE = 1000
+EMAIL_LOG_CHUNK_SIZE = 200
+SEND_RETRIES = 3
+# SES throttling error codes worth backing off and retrying.
+THROTTLE_CODES = {"Throttling", "ThrottlingException", "MaximumSendingRateExceeded"}
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Send announcement email to active users.")
@@ -31,6 +65,13 @@ def parse_args():
         action="store_true",
         help="Send only to ADMIN_EMAILS from env (for local testing).",
     )
+    parser.add_argument("--workers", type=int, default=8, help="Recipients processed concurrently")
+    parser.add_argument("--rate", type=float, help="Max SES sends per second (default: account MaxSendRate)")
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help="Sent-recipient checkpoint file (default: derived from subject and body under out/)",
+    )
     return parser.parse_args()
 
 
@@ -86,15 +127,23 @@ def get_recipients(supabase, limit=None, admin_only=False):
         if missing:
             print(f"Warning: admin emails not found in profiles and skipped: {', '.join(missing)}")
     else:
-        response = (
-            supabase.table("profiles")
-            .select("id, email")
-            .eq("is_active", True)
-            .eq("pause_all_alerts", False)
-            .eq("receive_announcements", True)
-            .execute()
-        )
-        recipients = [row for row in (response.data or []) if row.get("email")]
+        recipients = []
+        last_id = None
+        while True:
+            query = (
+                supabase.table("profiles")
+                .select("id, email")
+                .eq("is_active", True)
+                .eq("pause_all_alerts", False)
+                .eq("receive_announcements", True)
+            )
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = query.order("id").limit(PAGE_SIZE).execute().data or []
+            recipients.extend(row for row in page if row.get("email"))
+            if len(page) < PAGE_SIZE:
+                break
+            last_id = page[-1]["id"]
 
     if limit is not None:
         recipients = recipients[:limit]
@@ -103,8 +152,104 @@ def get_recipients(supabase, limit=None, admin_only=False):
 
 def insert_email_logs(supabase, log_rows):
     if not log_rows:
-        return
-    supabase.table("email_log").insert(log_rows).execute()
+        return 0
+    result = write_rows(supabase, "email_log", log_rows)
+    for error in result.errors[:3]:
+        print(f"Warning: email_log write failed: {error}")
+    return result.rows_written
+
+
+class RateGovernor:
+    """Spaces calls across threads to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def ses_send_rate(ses_client, override=None):
+    if override:
+        return override
+    try:
+        return float(ses_client.get_send_quota()["MaxSendRate"])
+    except Exception as exc:
+        print(f"Warning: could not read SES send quota ({exc}); using 1/s")
+        return 1.0
+
+
+class SendCheckpoint:
+    """
+    Append-only JSONL of recipients already sent to, plus the run_id.
+
+    A line is written (and flushed) as soon as SES accepts a message, so a
+    rerun of the same announcement skips everyone in the file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.run_id = None
+        self.sent = set()
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if "run_id" in entry and self.run_id is None:
+                        self.run_id = entry["run_id"]
+                    if "user_id" in entry:
+                        self.sent.add(entry["user_id"])
+        self.resumed = self.run_id is not None
+        if not self.resumed:
+            self.run_id = str(uuid.uuid4())
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._append({"run_id": self.run_id})
+
+    def _append(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, user_id):
+        with self._lock:
+            self._append({"user_id": user_id})
+            self.sent.add(user_id)
+
+
+def default_checkpoint_path(subject, html_body, admin_only):
+    digest = hashlib.sha256(f"{admin_only}\0{subject}\0{html_body}".encode("utf-8")).hexdigest()[:12]
+    return OUT_DIR / f"announcement_{digest}.jsonl"
+
+
+def logged_user_ids(supabase, run_id):
+    """user_ids with a successful email_log row for run_id (keyset-paged)."""
+    logged, last_id = set(), 0
+    while True:
+        page = (
+            supabase.table("email_log")
+            .select("id, user_id")
+            .eq("run_id", run_id)
+            .eq("success", True)
+            .gt("id", last_id)
+            .order("id")
+            .limit(PAGE_SIZE)
+            .execute()
+            .data
+            or []
+        )
+        logged.update(row["user_id"] for row in page)
+        if len(page) < PAGE_SIZE:
+            return logged
+        last_id = page[-1]["id"]
 
 
 SES_CONFIGURATION_SET = os.getenv("SES_CONFIGURATION_SET")
@@ -124,7 +269,14 @@ def send_one_email(ses_client, to_email, subject, html_body, text_body):
     }
     if SES_CONFIGURATION_SET:
         kwargs["ConfigurationSetName"] = SES_CONFIGURATION_SET
-    ses_client.send_email(**kwargs)
+    for attempt in range(SEND_RETRIES + 1):
+        try:
+            ses_client.send_email(**kwargs)
+            return
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") not in THROTTLE_CODES or attempt == SEND_RETRIES:
+                raise
+            time.sleep(2 ** attempt)
 
 
 def render_unsubscribe_html(html_body, unsubscribe_url):
@@ -140,6 +292,50 @@ def render_unsubscribe_html(html_body, unsubscribe_url):
     )
 
 
+def generate_unsubscribe_url(supabase, user_id, to_email):
+    signed = unsubscribe_url(user_id, "announcements")
+    if signed:
+        return signed
+    response = supabase.auth.admin.generate_link(
+        {
+            "type": "magiclink",
+            "email": to_email,
+            "options": {
+                "redirect_to": "https://sffstock.com/preferences?unsubscribe=true"
+            },
+        }
+    )
+    return response.properties.action_link
+
+
+def deliver(supabase, ses_client, governor, checkpoint, recip, subject, html_body, text_body):
+    """Generate the unsubscribe link, send under the governor, checkpoint. Returns an email_log row."""
+    user_id = recip["id"]
+    to_email = recip["email"]
+    try:
+        recipient_unsubscribe_url = generate_unsubscribe_url(supabase, user_id, to_email)
+        recipient_html_body = render_unsubscribe_html(html_body, recipient_unsubscribe_url)
+        recipient_text_body = (
+            f"{text_body}\n\n"
+            f"To manage your preferences or unsubscribe: {recipient_unsubscribe_url}"
+        )
+        governor.wait()
+        send_one_email(ses_client, to_email, subject, recipient_html_body, recipient_text_body)
+        checkpoint.record(user_id)
+        print(f"Sent: {to_email}", flush=True)
+        error = None
+    except Exception as exc:
+        print(f"Failed: {to_email} ({exc})", flush=True)
+        error = str(exc)
+    return {
+        "user_id": user_id,
+        "run_id": checkpoint.run_id,
+        "subject": subject,
+        "success": error is None,
+        "error_message": error,
+    }
+
+
 def main():
     args = parse_args()
     validate_env()
@@ -158,69 +354,62 @@ def main():
 
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
     recipients = get_recipients(supabase, args.limit, admin_only=args.admin_only)
+    checkpoint_path = args.checkpoint or default_checkpoint_path(args.subject, html_body, args.admin_only)
 
     if args.dry_run:
+        already = SendCheckpoint(checkpoint_path).sent if checkpoint_path.exists() else set()
         print(f"DRY RUN - Subject: {args.subject}")
-        print(f"Recipients ({len(recipients)}):")
+        print(f"Recipients ({len(recipients)}, {sum(r['id'] in already for r in recipients)} already sent):")
         for recip in recipients:
-            print(f" - {recip['email']}")
+            print(f" - {recip['email']}{' (already sent)' if recip['id'] in already else ''}")
         print("Summary: 0 sent, 0 failed")
         return
 
+    checkpoint = SendCheckpoint(checkpoint_path)
+    pending = [r for r in recipients if r["id"] not in checkpoint.sent]
+    print(f"Checkpoint: {checkpoint_path} (run_id={checkpoint.run_id})")
+    if checkpoint.resumed:
+        print(f"Resuming: {len(recipients) - len(pending)} already sent, {len(pending)} remaining")
+        # Sends recorded before a crash may not have reached email_log yet.
+        unlogged = checkpoint.sent - logged_user_ids(supabase, checkpoint.run_id)
+        insert_email_logs(supabase, [
+            {"user_id": uid, "run_id": checkpoint.run_id, "subject": args.subject,
+             "success": True, "error_message": None}
+            for uid in sorted(unlogged)
+        ])
+
     ses_client = boto3.client("ses", region_name=AWS_SES_REGION)
-    run_id = str(uuid.uuid4())
+    rate = ses_send_rate(ses_client, args.rate)
+    governor = RateGovernor(rate)
+    print(f"Sending to {len(pending)} recipients at <= {rate:g}/s with {args.workers} workers")
 
     sent_count = 0
     failed_count = 0
     log_rows = []
+    started = time.monotonic()
 
-    for recip in recipients:
-        user_id = recip["id"]
-        to_email = recip["email"]
-
-        try:
-            response = supabase.auth.admin.generate_link(
-                {
-                    "type": "magiclink",
-                    "email": to_email,
-                    "options": {
-                        "redirect_to": "https://sffstock.com/preferences?unsubscribe=true"
-                    },
-                }
-            )
-            unsubscribe_url = response.properties.action_link
-            recipient_html_body = render_unsubscribe_html(html_body, unsubscribe_url)
-            recipient_text_body = (
-                f"{text_body}\n\n"
-                f"To manage your preferences or unsubscribe: {unsubscribe_url}"
-            )
-            send_one_email(ses_client, to_email, args.subject, recipient_html_body, recipient_text_body)
-            sent_count += 1
-            log_rows.append(
-                {
-                    "user_id": user_id,
-                    "run_id": run_id,
-                    "subject": args.subject,
-                    "success": True,
-                    "error_message": None,
-                }
-            )
-            print(f"Sent: {to_email}")
-        except Exception as exc:
-            failed_count += 1
-            log_rows.append(
-                {
-                    "user_id": user_id,
-                    "run_id": run_id,
-                    "subject": args.subject,
-                    "success": False,
-                    "error_message": str(exc),
-                }
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+        futures = [
+            pool.submit(
+                deliver, supabase, ses_client, governor, checkpoint, recip, args.subject, html_body, text_body
             )
-            print(f"Failed: {to_email} ({exc})")
+            for recip in pending
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            if row["success"]:
+                sent_count += 1
+            else:
+                failed_count += 1
+            log_rows.append(row)
+            if len(log_rows) >= EMAIL_LOG_CHUNK_SIZE:
+                insert_email_logs(supabase, log_rows)
+                log_rows = []
+                elapsed = time.monotonic() - started
+                print(f"... {done}/{len(pending)} processed ({done / elapsed:.1f}/s)", flush=True)
 
     insert_email_logs(supabase, log_rows)
-    print(f"Summary: {sent_count} sent, {failed_count} failed")
+    print(f"Summary: {sent_count} sent, {failed_count} failed in {time.monotonic() - started:.1f}s")
 
 
 if __name__ == "__main__":
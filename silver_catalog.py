@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 import re
+from collections import defaultdict
 from datetime import datetime, timezone
+from functools import lru_cache
 
 from open_library import normalize_text
 
@@ -45,29 +47,51 @@ _CLEAN_TITLE_PATTERNS = [
     r"\s*No Dust.*",
 ]
 
+# Every pattern strips from its match to the end of the line, so on a
+# single-line title applying them in turn is the same as cutting at the
+# leftmost match of any of them: one pass. `.` stops at newlines, so titles
+# with several lines keep the per-pattern, per-line passes.
+_CLEAN_TITLE_RE = re.compile("|".join(f"(?:{p})" for p in _CLEAN_TITLE_PATTERNS), re.IGNORECASE)
+_CLEAN_TITLE_RES = tuple(re.compile(p, re.IGNORECASE) for p in _CLEAN_TITLE_PATTERNS)
+_WHITESPACE_RE = re.compile(r"\s+")
 
+# Titles repeat across runs, stores and call paths (author overrides,
+# find_work_id, ensure_work); cache the per-title work.
+_TITLE_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=_TITLE_CACHE_SIZE)
 def normalize_title(title: str | None) -> str | None:
     return normalize_text(title)
 
 
+@lru_cache(maxsize=_TITLE_CACHE_SIZE)
 def clean_title(title: str | None) -> str | None:
     """Strip retailer/edition suffixes for catalog matching."""
     if not title:
         return None
-    t = title
-    for pattern in _CLEAN_TITLE_PATTERNS:
-        t = re.sub(pattern, "", t, flags=re.IGNORECASE)
-    return re.sub(r"\s+", " ", t).strip(" -;") or None
+    if "\n" in title:
+        t = title
+        for pattern in _CLEAN_TITLE_RES:
+            t = pattern.sub("", t)
+    else:
+        t = _CLEAN_TITLE_RE.sub("", title, count=1)
+    return _WHITESPACE_RE.sub(" ", t).strip(" -;") or None
 
 
-def title_lookup_variants(title: str | None) -> list[str]:
-    if not title:
-        return []
+@lru_cache(maxsize=_TITLE_CACHE_SIZE)
+def _title_lookup_variants(title: str) -> tuple[str, ...]:
     variants = []
     for candidate in (title, clean_title(title), title.split(";")[0].strip()):
         if candidate and candidate not in variants:
             variants.append(candidate)
-    return variants
+    return tuple(variants)
+
+
+def title_lookup_variants(title: str | None) -> list[str]:
+    if not title:
+        return []
+    return list(_title_lookup_variants(title))
 
 
 def normalize_url(link: str | None) -> str | None:
@@ -76,14 +100,45 @@ def normalize_url(link: str | None) -> str | None:
     return re.sub(r"/+$", "", link.split("?")[0].lower())
 
 
-def find_work_id(sb, title: str, author: str | None = None):
-    """Resolve a work by normalized title + author keys."""
+# resolve_work_id fuzzy tier: minimum trigram similarity on normalized titles.
+FUZZY_TITLE_MIN_SIMILARITY = 0.6
+
+
+def find_work_id(sb, title: str, author: str | None = None, *, fuzzy: bool = False):
+    """
+    Resolve a work by normalized title + author keys.
+
+    One `resolve_work_id` RPC checks every title variant (exact tiers first,
+    then trigram similarity when `fuzzy`). Only read/search callers should
+    pass `fuzzy=True`; writers must not attach rows to a merely similar work.
+    Falls back to the per-variant exact probes if the RPC is unavailable.
+    """
+    norm_titles = []
     for variant in title_lookup_variants(title):
-        norm_title = normalize_title(variant)
-        if not norm_title:
-            continue
-        norm_author = normalize_title(author) if author else None
+        norm = normalize_title(variant)
+        if norm and norm not in norm_titles:
+            norm_titles.append(norm)
+    if not norm_titles:
+        return None
+    norm_author = normalize_title(author) if author else None
 
+    try:
+        resp = sb.rpc(
+            "resolve_work_id",
+            {
+                "p_titles": norm_titles,
+                "p_author": norm_author,
+                "p_min_similarity": FUZZY_TITLE_MIN_SIMILARITY if fuzzy else None,
+            },
+        ).execute()
+    except Exception:
+        return _find_work_id_exact(sb, norm_titles, norm_author)
+    return resp.data[0]["work_id"] if resp.data else None
+
+
+def _find_work_id_exact(sb, norm_titles: list[str], norm_author: str | None):
+    """Per-variant exact probes (pre-RPC behaviour)."""
+    for norm_title in norm_titles:
         resp = (
             sb.table("works")
             .select("id, author")
@@ -121,6 +176,14 @@ def find_work_id(sb, title: str, author: str | None = None):
     return None
 
 
+def search_works(sb, query: str, limit: int = 20) -> list[dict]:
+    """Ranked title/author search (`search_catalog` RPC)."""
+    if not (query or "").strip():
+        return []
+    resp = sb.rpc("search_catalog", {"p_query": query, "p_limit": limit}).execute()
+    return resp.data or []
+
+
 def ensure_work(sb, title: str, author: str | None = None, open_library_id: str | None = None):
     """Return work id, creating the work when missing."""
     author = resolve_work_author(title, author)
@@ -128,7 +191,9 @@ def ensure_work(sb, title: str, author: str | None = None, open_library_id: str
     if not norm_title:
         return None
 
-    existing = find_work_id(sb, title, author)
+    # Exact tiers only: a trigram hit on write could merge distinct works
+    # with similar titles and then overwrite the matched work's author.
+    existing = find_work_id(sb, title, author, fuzzy=False)
     if existing:
         if author or open_library_id:
             update = {}
@@ -290,3 +355,92 @@ def build_retailer_listing_row(
         "price_cents": price_cents,
         "last_checked": datetime.now(timezone.utc).isoformat(),
     }
+
+
+def iter_pages(sb, table: str, columns: str, page_size: int = 1000):
+    """Yield a table in id-keyset pages (`columns` must include id)."""
+    last_id = 0
+    while True:
+        page = (
+            sb.table(table).select(columns).gt("id", last_id)
+            .order("id").limit(page_size).execute().data or []
+        )
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def fetch_all_rows(sb, table: str, columns: str, page_size: int = 1000) -> list[dict]:
+    """Read a whole table in id-keyset pages (`columns` must include id)."""
+    return [row for page in iter_pages(sb, table, columns, page_size) for row in page]
+
+
+class CatalogIndex:
+    """
+    In-memory works/editions with hash indexes on the normalized keys.
+
+    Lookups follow the exact tiers of `find_work_id` / `find_edition_id`
+    (no trigram tier), for bulk jobs that would otherwise issue several
+    queries per item. Call add_work/add_edition with inserted rows to keep
+    the index current.
+    """
+
+    WORK_COLUMNS = "id, title, author, normalized_title, normalized_author"
+    EDITION_COLUMNS = "id, work_id, publisher_id, normalized_title, edition_type"
+
+    def __init__(self, works: list[dict] | None = None, editions: list[dict] | None = None):
+        self.works_by_id: dict[int, dict] = {}
+        self._works_by_title: dict[str, list[dict]] = defaultdict(list)
+        self._editions: dict[tuple, int] = {}
+        for row in works or []:
+            self.add_work(row)
+        for row in editions or []:
+            self.add_edition(row)
+
+    @classmethod
+    def load(cls, sb, page_size: int = 1000) -> CatalogIndex:
+        return cls(
+            fetch_all_rows(sb, "works", cls.WORK_COLUMNS, page_size),
+            fetch_all_rows(sb, "editions", cls.EDITION_COLUMNS, page_size),
+        )
+
+    def add_work(self, row: dict) -> None:
+        previous = self.works_by_id.get(row["id"])
+        if previous:
+            self._works_by_title[previous["normalized_title"]].remove(previous)
+        self.works_by_id[row["id"]] = row
+        bucket = self._works_by_title[row["normalized_title"]]
+        bucket.append(row)
+        bucket.sort(key=lambda w: w["id"])
+
+    def add_edition(self, row: dict) -> None:
+        key = (row["publisher_id"], row["normalized_title"], row.get("edition_type"))
+        if key not in self._editions or row["id"] < self._editions[key]:
+            self._editions[key] = row["id"]
+
+    def find_work_id(self, title: str | None, author: str | None = None):
+        norm_author = normalize_title(author) if author else None
+        seen = set()
+        for variant in title_lookup_variants(title):
+            norm_title = normalize_title(variant)
+            if not norm_title or norm_title in seen:
+                continue
+            seen.add(norm_title)
+            candidates = self._works_by_title.get(norm_title, [])
+            for matches in (
+                lambda w: w["normalized_author"] == (norm_author or ""),
+                lambda w: norm_author is not None and w["normalized_author"] is None,
+                lambda w: w["author"] is not None,
+            ):
+                for work in candidates:
+                    if matches(work):
+                        return work["id"]
+        return None
+
+    def find_edition_id(self, publisher_id: int, title: str | None, edition_type: str | None = None):
+        norm_title = normalize_title(title)
+        if not norm_title:
+            return None
+        return self._editions.get((publisher_id, norm_title, edition_type))
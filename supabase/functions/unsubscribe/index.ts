@@ -0,0 +1,100 @@
+// One-click unsubscribe for signed tokens minted by unsubscribe.py.
+//
+// Token: `<payload>.<signature>` (base64url, no padding). The payload is
+// {"u": user_id, "s": scope, "e": expiry unix seconds}; the signature is
+// HMAC-SHA256(UNSUBSCRIBE_SIGNING_SECRET, payload).
+//
+// Accepts the token as ?token= (RFC 8058 one-click POST, or a plain GET) or
+// as {"token": "..."} in a JSON body (frontend). Deploy with --no-verify-jwt.
+
+import { createClient } from 'https://esm.sh/@supabase/supabase-js@2'
+
+const corsHeaders = {
+  'Access-Control-Allow-Origin': '*',
+  'Access-Control-Allow-Headers': 'authorization, x-client-info, apikey, content-type',
+  'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+}
+
+const SCOPE_UPDATES: Record<string, Record<string, boolean>> = {
+  alerts: { pause_all_alerts: true },
+  announcements: { receive_announcements: false },
+}
+
+function json(body: unknown, status = 200) {
+  return new Response(JSON.stringify(body), {
+    status,
+    headers: { ...corsHeaders, 'Content-Type': 'application/json' },
+  })
+}
+
+function base64UrlDecode(value: string): Uint8Array {
+  const padded = value.replace(/-/g, '+').replace(/_/g, '/') + '='.repeat((4 - (value.length % 4)) % 4)
+  return Uint8Array.from(atob(padded), (c) => c.charCodeAt(0))
+}
+
+async function verifyToken(token: string, secret: string) {
+  const parts = token.split('.')
+  if (parts.length !== 2) return null
+  const [payload, signature] = parts
+
+  const key = await crypto.subtle.importKey(
+    'raw',
+    new TextEncoder().encode(secret),
+    { name: 'HMAC', hash: 'SHA-256' },
+    false,
+    ['verify'],
+  )
+  let valid = false
+  try {
+    valid = await crypto.subtle.verify('HMAC', key, base64UrlDecode(signature), new TextEncoder().encode(payload))
+  } catch {
+    return null
+  }
+  if (!valid) return null
+
+  let data: { u?: string; s?: string; e?: number }
+  try {
+    data = JSON.parse(new TextDecoder().decode(base64UrlDecode(payload)))
+  } catch {
+    return null
+  }
+  if (!data.u || !data.s || !(data.s in SCOPE_UPDATES)) return null
+  if (!data.e || data.e < Date.now() / 1000) return null
+  return { userId: data.u, scope: data.s }
+}
+
+async function readToken(req: Request): Promise<string | null> {
+  const fromQuery = new URL(req.url).searchParams.get('token')
+  if (fromQuery) return fromQuery
+  if (req.method !== 'POST') return null
+  if (!(req.headers.get('content-type') ?? '').includes('application/json')) return null
+  try {
+    const body = await req.json()
+    return typeof body?.token === 'string' ? body.token : null
+  } catch {
+    return null
+  }
+}
+
+Deno.serve(async (req) => {
+  if (req.method === 'OPTIONS') return new Response('ok', { headers: corsHeaders })
+
+  const secret = Deno.env.get('UNSUBSCRIBE_SIGNING_SECRET')
+  if (!secret) return json({ error: 'unsubscribe is not configured' }, 500)
+
+  const token = await readToken(req)
+  const claims = token ? await verifyToken(token, secret) : null
+  if (!claims) return json({ error: 'invalid or expired token' }, 400)
+
+  const supabase = createClient(
+    Deno.env.get('SUPABASE_URL')!,
+    Deno.env.get('SUPABASE_SERVICE_ROLE_KEY')!,
+  )
+  const { error } = await supabase
+    .from('profiles')
+    .update(SCOPE_UPDATES[claims.scope])
+    .eq('id', claims.userId)
+  if (error) return json({ error: 'update failed' }, 500)
+
+  return json({ ok: true, scope: claims.scope })
+})
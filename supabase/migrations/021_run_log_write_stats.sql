@@ -0,0 +1,5 @@
+-- Per-table write outcome for each run (rows written / failed, chunks, latency).
+-- Populated by batch_writer.write_rows via lambda_function.update_run_log.
+
+ALTER TABLE public.run_log
+  ADD COLUMN IF NOT EXISTS write_stats jsonb;
@@ -0,0 +1,25 @@
+-- ============================================================
+-- Bronze delta writes: only new/changed items_seen rows are upserted.
+-- Unchanged rows get a cheap bulk last_seen_at touch instead.
+-- ============================================================
+
+ALTER TABLE public.items_seen
+  ADD COLUMN IF NOT EXISTS last_seen_at timestamptz;
+
+CREATE OR REPLACE FUNCTION public.touch_items_seen(p_item_ids bigint[])
+RETURNS integer
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH touched AS (
+    UPDATE public.items_seen
+    SET last_seen_at = now()
+    WHERE id = ANY(p_item_ids)
+    RETURNING 1
+  )
+  SELECT count(*)::integer FROM touched;
+$$;
+
+REVOKE ALL ON FUNCTION public.touch_items_seen(bigint[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.touch_items_seen(bigint[]) TO service_role;
@@ -0,0 +1,23 @@
+-- ============================================================
+-- Intra-day stock/price transitions (optional; SNAPSHOT_INTRADAY_TRANSITIONS=true).
+-- item_status_daily keeps the latest state per day; this table keeps each change.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.item_status_intraday (
+  id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  observed_at timestamptz NOT NULL DEFAULT now(),
+  snapshot_date date NOT NULL,
+  item_id bigint NOT NULL REFERENCES public.items_seen(id),
+  run_id text,
+  store text,
+  old_in_stock boolean,
+  in_stock boolean,
+  old_price text,
+  price text,
+  price_cents int
+);
+
+CREATE INDEX IF NOT EXISTS idx_item_status_intraday_item
+  ON public.item_status_intraday (item_id, observed_at DESC);
+
+ALTER TABLE public.item_status_intraday ENABLE ROW LEVEL SECURITY;
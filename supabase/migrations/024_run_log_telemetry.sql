@@ -0,0 +1,35 @@
+-- ============================================================
+-- Per-stage run telemetry: wall time, HTTP requests/bytes and
+-- PostgREST round trips per stage of check_for_updates.
+-- Populated by telemetry.py via lambda_function.update_run_log.
+-- ============================================================
+
+ALTER TABLE public.run_log
+  ADD COLUMN IF NOT EXISTS telemetry jsonb;
+
+-- One row per run per stage. Operational data: service_role only.
+CREATE OR REPLACE VIEW public.analytics_run_performance AS
+SELECT
+  rl.run_id,
+  rl.finished_at,
+  rl.status,
+  rl.items_scraped,
+  (rl.telemetry -> 'totals' ->> 'wall_ms')::numeric AS run_wall_ms,
+  s.key AS stage,
+  (s.value ->> 'wall_ms')::numeric AS wall_ms,
+  (s.value ->> 'calls')::int AS calls,
+  (s.value ->> 'http_requests')::int AS http_requests,
+  (s.value ->> 'http_bytes')::bigint AS http_bytes,
+  (s.value ->> 'db_requests')::int AS db_requests,
+  (s.value ->> 'db_bytes')::bigint AS db_bytes,
+  ROUND(
+    100.0 * (s.value ->> 'wall_ms')::numeric
+      / NULLIF((rl.telemetry -> 'totals' ->> 'wall_ms')::numeric, 0),
+    1
+  ) AS pct_of_run
+FROM public.run_log rl
+CROSS JOIN LATERAL jsonb_each(rl.telemetry -> 'stages') AS s(key, value)
+WHERE rl.telemetry IS NOT NULL;
+
+REVOKE ALL ON public.analytics_run_performance FROM anon, authenticated;
+GRANT SELECT ON public.analytics_run_performance TO service_role;
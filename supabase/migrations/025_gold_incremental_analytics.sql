@@ -0,0 +1,458 @@
+-- ============================================================
+-- Incrementally maintained Gold analytics tables.
+--
+-- The Wrapped / leaderboard views used to recompute gaps-and-islands
+-- windows over all of item_status_daily and item_events on every read.
+-- They now read small state tables that refresh_gold_analytics() advances
+-- at the end of each lambda run:
+--   * snapshot days are folded in once they are closed (< today, UTC);
+--     today's still-changing rows are overlaid at read time;
+--   * events are folded in by id watermark (item_events is append-only).
+-- Read cost scales with catalog size, not with history length.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.gold_refresh_state (
+  id boolean PRIMARY KEY DEFAULT true CHECK (id),
+  settled_through date,
+  last_event_id bigint NOT NULL DEFAULT 0,
+  refreshed_at timestamptz
+);
+
+INSERT INTO public.gold_refresh_state (id) VALUES (true) ON CONFLICT DO NOTHING;
+
+-- Streak state per item as of its last settled snapshot day.
+CREATE TABLE IF NOT EXISTS public.gold_item_streaks (
+  item_id bigint PRIMARY KEY REFERENCES public.items_seen(id),
+  last_snapshot_date date NOT NULL,
+  last_in_stock boolean NOT NULL,
+  current_streak_days integer NOT NULL,
+  longest_in_stock_days integer NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS public.gold_item_event_counts (
+  item_id bigint NOT NULL REFERENCES public.items_seen(id),
+  event_type text NOT NULL,
+  event_count bigint NOT NULL,
+  PRIMARY KEY (item_id, event_type)
+);
+
+CREATE INDEX IF NOT EXISTS idx_gold_item_event_counts_type
+  ON public.gold_item_event_counts (event_type, event_count DESC);
+
+CREATE TABLE IF NOT EXISTS public.gold_event_daily_counts (
+  day date NOT NULL,
+  event_type text NOT NULL,
+  store text NOT NULL,
+  event_count bigint NOT NULL,
+  PRIMARY KEY (day, event_type, store)
+);
+
+CREATE TABLE IF NOT EXISTS public.gold_price_drops (
+  event_id bigint PRIMARY KEY,
+  item_id bigint NOT NULL,
+  old_value text,
+  new_value text,
+  old_num numeric NOT NULL,
+  new_num numeric NOT NULL,
+  price_drop numeric NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_gold_price_drops_drop
+  ON public.gold_price_drops (price_drop DESC);
+
+-- Views run with owner privileges; no direct client access to the tables.
+ALTER TABLE public.gold_refresh_state ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.gold_item_streaks ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.gold_item_event_counts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.gold_event_daily_counts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.gold_price_drops ENABLE ROW LEVEL SECURITY;
+
+-- ------------------------------------------------------------
+-- Refresh: fold new closed snapshot days and new events into Gold.
+-- p_full => rebuild from scratch (initial backfill / repair).
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.refresh_gold_analytics(p_full boolean DEFAULT false)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_today date := (now() AT TIME ZONE 'UTC')::date;
+  v_state public.gold_refresh_state%ROWTYPE;
+  v_day date;
+  v_days integer := 0;
+  v_max_event_id bigint;
+  v_events integer := 0;
+BEGIN
+  SELECT * INTO v_state FROM public.gold_refresh_state WHERE id FOR UPDATE;
+
+  IF p_full THEN
+    TRUNCATE public.gold_item_streaks, public.gold_item_event_counts,
+             public.gold_event_daily_counts, public.gold_price_drops;
+    v_state.settled_through := NULL;
+    v_state.last_event_id := 0;
+  END IF;
+
+  -- Snapshot days, oldest first; each day extends or resets every item's streak.
+  FOR v_day IN
+    SELECT DISTINCT isd.snapshot_date
+    FROM public.item_status_daily isd
+    WHERE isd.snapshot_date > COALESCE(v_state.settled_through, '-infinity'::date)
+      AND isd.snapshot_date < v_today
+    ORDER BY 1
+  LOOP
+    INSERT INTO public.gold_item_streaks AS g (
+      item_id, last_snapshot_date, last_in_stock, current_streak_days, longest_in_stock_days
+    )
+    SELECT
+      isd.item_id,
+      v_day,
+      COALESCE(isd.in_stock, false),
+      CASE WHEN isd.in_stock IS TRUE THEN 1 ELSE 0 END,
+      CASE WHEN isd.in_stock IS TRUE THEN 1 ELSE 0 END
+    FROM public.item_status_daily isd
+    WHERE isd.snapshot_date = v_day
+    ON CONFLICT (item_id) DO UPDATE
+    SET
+      current_streak_days = CASE
+        WHEN NOT EXCLUDED.last_in_stock THEN 0
+        WHEN g.last_in_stock AND g.last_snapshot_date = v_day - 1 THEN g.current_streak_days + 1
+        ELSE 1
+      END,
+      longest_in_stock_days = GREATEST(
+        g.longest_in_stock_days,
+        CASE
+          WHEN NOT EXCLUDED.last_in_stock THEN 0
+          WHEN g.last_in_stock AND g.last_snapshot_date = v_day - 1 THEN g.current_streak_days + 1
+          ELSE 1
+        END
+      ),
+      last_snapshot_date = EXCLUDED.last_snapshot_date,
+      last_in_stock = EXCLUDED.last_in_stock;
+
+    v_days := v_days + 1;
+  END LOOP;
+
+  IF v_state.settled_through IS NULL OR v_state.settled_through < v_today - 1 THEN
+    v_state.settled_through := v_today - 1;
+  END IF;
+
+  -- Events since the watermark. Bounded by a fixed max id so every Gold table
+  -- sees the same set even if the lambda inserts more events meanwhile.
+  SELECT MAX(ie.id) INTO v_max_event_id
+  FROM public.item_events ie
+  WHERE ie.id > v_state.last_event_id;
+
+  IF v_max_event_id IS NOT NULL THEN
+    INSERT INTO public.gold_item_event_counts AS g (item_id, event_type, event_count)
+    SELECT ie.item_id, ie.event_type, COUNT(*)::bigint
+    FROM public.item_events ie
+    WHERE ie.id > v_state.last_event_id
+      AND ie.id <= v_max_event_id
+      AND ie.item_id IS NOT NULL
+      AND ie.event_type IS NOT NULL
+    GROUP BY ie.item_id, ie.event_type
+    ON CONFLICT (item_id, event_type) DO UPDATE
+    SET event_count = g.event_count + EXCLUDED.event_count;
+
+    INSERT INTO public.gold_event_daily_counts AS g (day, event_type, store, event_count)
+    SELECT
+      (ie.event_time AT TIME ZONE 'UTC')::date,
+      ie.event_type,
+      COALESCE(ie.store, 'Unknown'),
+      COUNT(*)::bigint
+    FROM public.item_events ie
+    WHERE ie.id > v_state.last_event_id
+      AND ie.id <= v_max_event_id
+      AND ie.event_type IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, event_type, store) DO UPDATE
+    SET event_count = g.event_count + EXCLUDED.event_count;
+
+    INSERT INTO public.gold_price_drops (
+      event_id, item_id, old_value, new_value, old_num, new_num, price_drop
+    )
+    SELECT event_id, item_id, old_value, new_value, old_num, new_num, old_num - new_num
+    FROM (
+      SELECT
+        ie.id AS event_id,
+        ie.item_id,
+        ie.old_value,
+        ie.new_value,
+        NULLIF(regexp_replace(COALESCE(ie.old_value, ''), '[^0-9.]', '', 'g'), '')::numeric AS old_num,
+        NULLIF(regexp_replace(COALESCE(ie.new_value, ''), '[^0-9.]', '', 'g'), '')::numeric AS new_num
+      FROM public.item_events ie
+      WHERE ie.id > v_state.last_event_id
+        AND ie.id <= v_max_event_id
+        AND ie.event_type = 'Price Change'
+        AND ie.item_id IS NOT NULL
+    ) parsed
+    WHERE old_num IS NOT NULL
+      AND new_num IS NOT NULL
+      AND new_num < old_num
+    ON CONFLICT (event_id) DO NOTHING;
+
+    SELECT COUNT(*)::integer INTO v_events
+    FROM public.item_events ie
+    WHERE ie.id > v_state.last_event_id
+      AND ie.id <= v_max_event_id;
+
+    v_state.last_event_id := v_max_event_id;
+  END IF;
+
+  UPDATE public.gold_refresh_state
+  SET
+    settled_through = v_state.settled_through,
+    last_event_id = v_state.last_event_id,
+    refreshed_at = now()
+  WHERE id;
+
+  RETURN jsonb_build_object(
+    'snapshot_days', v_days,
+    'events', v_events,
+    'settled_through', v_state.settled_through,
+    'last_event_id', v_state.last_event_id
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.refresh_gold_analytics(boolean) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.refresh_gold_analytics(boolean) TO service_role;
+
+-- ------------------------------------------------------------
+-- Settled streak state + today's (still changing) snapshot rows.
+-- ------------------------------------------------------------
+DROP VIEW IF EXISTS public.analytics_longest_in_stock;
+DROP VIEW IF EXISTS public.analytics_current_in_stock_streak;
+DROP VIEW IF EXISTS public.analytics_new_item_leaderboard;
+DROP VIEW IF EXISTS public.analytics_out_of_stock_leaderboard;
+DROP VIEW IF EXISTS public.analytics_restock_leaderboard;
+DROP VIEW IF EXISTS public.analytics_top_price_drops;
+DROP VIEW IF EXISTS public.analytics_event_volume_daily;
+DROP VIEW IF EXISTS public.analytics_store_event_totals;
+DROP VIEW IF EXISTS public.gold_item_streaks_live;
+
+CREATE VIEW public.gold_item_streaks_live AS
+SELECT
+  s.item_id,
+  s.current_streak_days,
+  GREATEST(s.settled_longest, s.current_streak_days) AS longest_in_stock_days
+FROM (
+  SELECT
+    COALESCE(g.item_id, t.item_id) AS item_id,
+    COALESCE(g.longest_in_stock_days, 0) AS settled_longest,
+    CASE
+      WHEN t.item_id IS NULL THEN g.current_streak_days
+      WHEN t.in_stock IS NOT TRUE THEN 0
+      WHEN g.last_in_stock AND g.last_snapshot_date = t.snapshot_date - 1 THEN g.current_streak_days + 1
+      ELSE 1
+    END AS current_streak_days
+  FROM public.gold_item_streaks g
+  FULL OUTER JOIN (
+    SELECT isd.item_id, isd.snapshot_date, isd.in_stock
+    FROM public.item_status_daily isd
+    WHERE isd.snapshot_date = (now() AT TIME ZONE 'UTC')::date
+  ) t ON t.item_id = g.item_id
+) s;
+
+-- Longest consecutive in-stock run (snapshot days) per edition, all time.
+CREATE VIEW public.analytics_longest_in_stock AS
+SELECT *
+FROM (
+  WITH edition_item AS (
+    SELECT DISTINCT ON (rl.edition_id)
+      rl.edition_id,
+      sl.longest_in_stock_days,
+      rl.items_seen_id AS item_id,
+      rl.collection_id,
+      rl.retailer_url AS link
+    FROM public.gold_item_streaks_live sl
+    INNER JOIN public.retailer_listings rl ON rl.items_seen_id = sl.item_id
+    WHERE sl.longest_in_stock_days > 0
+    ORDER BY rl.edition_id, sl.longest_in_stock_days DESC, rl.items_seen_id
+  )
+  SELECT
+    ei.edition_id,
+    ei.item_id,
+    ei.longest_in_stock_days,
+    w.title AS name,
+    w.author,
+    p.name AS publisher,
+    c.store_name AS store,
+    ei.link
+  FROM edition_item ei
+  INNER JOIN public.editions e ON e.id = ei.edition_id
+  INNER JOIN public.works w ON w.id = e.work_id
+  LEFT JOIN public.publishers p ON p.id = e.publisher_id
+  LEFT JOIN public.collections c ON c.id = ei.collection_id
+  ORDER BY ei.longest_in_stock_days DESC
+  LIMIT 10
+) q;
+
+-- Ongoing in-stock streak for editions currently in stock (ends on latest snapshot day).
+CREATE VIEW public.analytics_current_in_stock_streak AS
+SELECT *
+FROM (
+  WITH edition_item AS (
+    SELECT DISTINCT ON (rl.edition_id)
+      rl.edition_id,
+      sl.current_streak_days,
+      rl.items_seen_id AS item_id,
+      rl.collection_id,
+      rl.retailer_url AS link
+    FROM public.gold_item_streaks_live sl
+    INNER JOIN public.retailer_listings rl ON rl.items_seen_id = sl.item_id
+    WHERE sl.current_streak_days > 0
+    ORDER BY rl.edition_id, sl.current_streak_days DESC, rl.items_seen_id
+  )
+  SELECT
+    ei.edition_id,
+    ei.item_id,
+    ei.current_streak_days,
+    w.title AS name,
+    w.author,
+    p.name AS publisher,
+    c.store_name AS store,
+    ei.link
+  FROM edition_item ei
+  INNER JOIN public.editions e ON e.id = ei.edition_id
+  INNER JOIN public.works w ON w.id = e.work_id
+  LEFT JOIN public.publishers p ON p.id = e.publisher_id
+  LEFT JOIN public.collections c ON c.id = ei.collection_id
+  ORDER BY ei.current_streak_days DESC
+  LIMIT 10
+) q;
+
+CREATE VIEW public.analytics_restock_leaderboard AS
+SELECT *
+FROM (
+  SELECT
+    e.id AS edition_id,
+    w.id AS work_id,
+    SUM(gc.event_count)::bigint AS restock_count,
+    MAX(w.title) AS name,
+    MAX(w.author) AS author,
+    MAX(p.name) AS publisher,
+    MAX(c.store_name) AS store,
+    MAX(rl.retailer_url) AS link,
+    MAX(gc.item_id) AS item_id
+  FROM public.gold_item_event_counts gc
+  INNER JOIN public.retailer_listings rl ON rl.items_seen_id = gc.item_id
+  INNER JOIN public.editions e ON e.id = rl.edition_id
+  INNER JOIN public.works w ON w.id = e.work_id
+  LEFT JOIN public.publishers p ON p.id = e.publisher_id
+  LEFT JOIN public.collections c ON c.id = rl.collection_id
+  WHERE gc.event_type = 'Restocked'
+  GROUP BY e.id, w.id
+  ORDER BY restock_count DESC
+  LIMIT 10
+) q;
+
+CREATE VIEW public.analytics_new_item_leaderboard AS
+SELECT *
+FROM (
+  SELECT
+    e.id AS edition_id,
+    w.id AS work_id,
+    SUM(gc.event_count)::bigint AS new_item_count,
+    MAX(w.title) AS name,
+    MAX(w.author) AS author,
+    MAX(p.name) AS publisher,
+    MAX(c.store_name) AS store,
+    MAX(rl.retailer_url) AS link,
+    MAX(gc.item_id) AS item_id
+  FROM public.gold_item_event_counts gc
+  INNER JOIN public.retailer_listings rl ON rl.items_seen_id = gc.item_id
+  INNER JOIN public.editions e ON e.id = rl.edition_id
+  INNER JOIN public.works w ON w.id = e.work_id
+  LEFT JOIN public.publishers p ON p.id = e.publisher_id
+  LEFT JOIN public.collections c ON c.id = rl.collection_id
+  WHERE gc.event_type = 'New Item'
+  GROUP BY e.id, w.id
+  ORDER BY new_item_count DESC
+  LIMIT 10
+) q;
+
+CREATE VIEW public.analytics_out_of_stock_leaderboard AS
+SELECT *
+FROM (
+  SELECT
+    e.id AS edition_id,
+    w.id AS work_id,
+    SUM(gc.event_count)::bigint AS out_of_stock_count,
+    MAX(w.title) AS name,
+    MAX(w.author) AS author,
+    MAX(p.name) AS publisher,
+    MAX(c.store_name) AS store,
+    MAX(rl.retailer_url) AS link,
+    MAX(gc.item_id) AS item_id
+  FROM public.gold_item_event_counts gc
+  INNER JOIN public.retailer_listings rl ON rl.items_seen_id = gc.item_id
+  INNER JOIN public.editions e ON e.id = rl.edition_id
+  INNER JOIN public.works w ON w.id = e.work_id
+  LEFT JOIN public.publishers p ON p.id = e.publisher_id
+  LEFT JOIN public.collections c ON c.id = rl.collection_id
+  WHERE gc.event_type = 'Out of Stock'
+  GROUP BY e.id, w.id
+  ORDER BY out_of_stock_count DESC
+  LIMIT 10
+) q;
+
+CREATE VIEW public.analytics_top_price_drops AS
+SELECT *
+FROM (
+  SELECT
+    d.event_id,
+    d.item_id,
+    e.id AS edition_id,
+    d.old_value,
+    d.new_value,
+    d.old_num,
+    d.new_num,
+    d.price_drop,
+    w.title AS name,
+    w.author,
+    p2.name AS publisher,
+    c.store_name AS store,
+    rl.retailer_url AS link
+  FROM public.gold_price_drops d
+  INNER JOIN public.retailer_listings rl ON rl.items_seen_id = d.item_id
+  INNER JOIN public.editions e ON e.id = rl.edition_id
+  INNER JOIN public.works w ON w.id = e.work_id
+  LEFT JOIN public.publishers p2 ON p2.id = e.publisher_id
+  LEFT JOIN public.collections c ON c.id = rl.collection_id
+  ORDER BY d.price_drop DESC
+  LIMIT 10
+) q;
+
+CREATE VIEW public.analytics_event_volume_daily AS
+SELECT
+  dc.day,
+  dc.event_type,
+  SUM(dc.event_count)::bigint AS event_count
+FROM public.gold_event_daily_counts dc
+WHERE dc.event_type <> 'Unknown Change'
+GROUP BY 1, 2
+ORDER BY 1, 2;
+
+CREATE VIEW public.analytics_store_event_totals AS
+SELECT
+  dc.store,
+  SUM(dc.event_count)::bigint AS event_count
+FROM public.gold_event_daily_counts dc
+WHERE dc.event_type <> 'Unknown Change'
+GROUP BY 1
+ORDER BY event_count DESC;
+
+GRANT SELECT ON public.analytics_longest_in_stock TO anon, authenticated;
+GRANT SELECT ON public.analytics_current_in_stock_streak TO anon, authenticated;
+GRANT SELECT ON public.analytics_restock_leaderboard TO anon, authenticated;
+GRANT SELECT ON public.analytics_new_item_leaderboard TO anon, authenticated;
+GRANT SELECT ON public.analytics_out_of_stock_leaderboard TO anon, authenticated;
+GRANT SELECT ON public.analytics_top_price_drops TO anon, authenticated;
+GRANT SELECT ON public.analytics_event_volume_daily TO anon, authenticated;
+GRANT SELECT ON public.analytics_store_event_totals TO anon, authenticated;
+
+-- Initial backfill.
+SELECT public.refresh_gold_analytics(true);
@@ -0,0 +1,33 @@
+-- ============================================================
+-- Lookup indexes for the Silver/Gold read paths.
+-- 012 only created uniqueness indexes; the catalog views, the lambda
+-- (fetch_edition_ids_by_link) and engagement click attribution filter
+-- and join on the columns below. tests/test_query_plans.py guards them.
+-- ============================================================
+
+-- catalog_listings / catalog_events / analytics joins: rl.items_seen_id = item id
+CREATE INDEX IF NOT EXISTS idx_retailer_listings_items_seen_id
+  ON public.retailer_listings (items_seen_id);
+
+-- fetch_edition_ids_by_link and engagement_lambda click -> listing lookup
+CREATE INDEX IF NOT EXISTS idx_retailer_listings_retailer_url
+  ON public.retailer_listings (retailer_url);
+
+-- retailer_listings -> editions -> works joins
+CREATE INDEX IF NOT EXISTS idx_retailer_listings_edition_id
+  ON public.retailer_listings (edition_id);
+
+CREATE INDEX IF NOT EXISTS idx_editions_work_id
+  ON public.editions (work_id);
+
+-- Per-item event history (catalog_events filtered by item, newest first)
+CREATE INDEX IF NOT EXISTS idx_item_events_item_time
+  ON public.item_events (item_id, event_time DESC);
+
+-- Recent-activity feeds and the 30-day summary window
+CREATE INDEX IF NOT EXISTS idx_item_events_event_time
+  ON public.item_events (event_time DESC);
+
+-- Per-item snapshot history (the unique index leads with snapshot_date)
+CREATE INDEX IF NOT EXISTS idx_item_status_daily_item_date
+  ON public.item_status_daily (item_id, snapshot_date);
@@ -0,0 +1,184 @@
+-- ============================================================
+-- Keyset-paginated catalog read API (RPC) for the frontend.
+--
+-- Pages are keyed on (name, id) for listings and (event_time, id) for
+-- events, so page N costs the same as page 1. Filters run server-side and
+-- only the columns the pages render are returned. Pass the last row's key
+-- back as p_after_* / p_before_* to fetch the next page.
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION public.catalog_listings_page(
+  p_store text DEFAULT NULL,
+  p_in_stock boolean DEFAULT NULL,
+  p_author text DEFAULT NULL,
+  p_search text DEFAULT NULL,
+  p_active_since timestamptz DEFAULT NULL,
+  p_edition_ids bigint[] DEFAULT NULL,
+  p_after_name text DEFAULT NULL,
+  p_after_id bigint DEFAULT NULL,
+  p_limit integer DEFAULT 50
+)
+RETURNS TABLE (
+  id bigint,
+  edition_id bigint,
+  name text,
+  author text,
+  price text,
+  store text,
+  link text,
+  in_stock boolean,
+  last_in_stock timestamptz,
+  isbn text,
+  cover_url text,
+  open_library_id text
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT
+    cl.id::bigint,
+    cl.edition_id::bigint,
+    cl.name,
+    cl.author,
+    cl.price,
+    cl.store,
+    cl.link,
+    cl.in_stock,
+    cl.last_in_stock::timestamptz,
+    cl.isbn,
+    cl.cover_url,
+    cl.open_library_id
+  FROM public.catalog_listings cl
+  WHERE (p_store IS NULL OR cl.store = p_store)
+    AND (p_in_stock IS NULL OR cl.in_stock IS NOT DISTINCT FROM p_in_stock)
+    AND (p_author IS NULL OR btrim(cl.author) = p_author)
+    AND (
+      p_search IS NULL
+      OR cl.name ILIKE '%' || p_search || '%'
+      OR cl.author ILIKE '%' || p_search || '%'
+    )
+    AND (p_active_since IS NULL OR cl.in_stock IS TRUE OR cl.last_in_stock >= p_active_since)
+    AND (p_edition_ids IS NULL OR cl.edition_id = ANY(p_edition_ids))
+    AND (p_after_name IS NULL OR (cl.name, cl.id) > (p_after_name, p_after_id))
+  ORDER BY cl.name, cl.id
+  LIMIT LEAST(GREATEST(p_limit, 1), 500);
+$$;
+
+-- Exact count up to p_exact_limit rows, planner estimate beyond that
+-- (the same trade-off as PostgREST's count=estimated).
+CREATE OR REPLACE FUNCTION public.catalog_listings_count(
+  p_store text DEFAULT NULL,
+  p_in_stock boolean DEFAULT NULL,
+  p_author text DEFAULT NULL,
+  p_search text DEFAULT NULL,
+  p_active_since timestamptz DEFAULT NULL,
+  p_exact_limit integer DEFAULT 5000
+)
+RETURNS bigint
+LANGUAGE plpgsql
+STABLE
+SET search_path = public
+AS $$
+DECLARE
+  v_where text;
+  v_count bigint;
+  v_plan json;
+BEGIN
+  v_where := format(
+    $w$
+    WHERE (%1$L::text IS NULL OR cl.store = %1$L)
+      AND (%2$L::boolean IS NULL OR cl.in_stock IS NOT DISTINCT FROM %2$L::boolean)
+      AND (%3$L::text IS NULL OR btrim(cl.author) = %3$L)
+      AND (
+        %4$L::text IS NULL
+        OR cl.name ILIKE '%%' || %4$L || '%%'
+        OR cl.author ILIKE '%%' || %4$L || '%%'
+      )
+      AND (%5$L::timestamptz IS NULL OR cl.in_stock IS TRUE OR cl.last_in_stock >= %5$L::timestamptz)
+    $w$,
+    p_store, p_in_stock, p_author, p_search, p_active_since
+  );
+
+  EXECUTE format(
+    'SELECT count(*) FROM (SELECT 1 FROM public.catalog_listings cl %s LIMIT %s) q',
+    v_where, p_exact_limit + 1
+  ) INTO v_count;
+
+  IF v_count <= p_exact_limit THEN
+    RETURN v_count;
+  END IF;
+
+  EXECUTE format('EXPLAIN (FORMAT JSON) SELECT 1 FROM public.catalog_listings cl %s', v_where)
+    INTO v_plan;
+  RETURN GREATEST((v_plan -> 0 -> 'Plan' ->> 'Plan Rows')::bigint, v_count);
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.catalog_events_page(
+  p_store text DEFAULT NULL,
+  p_event_types text[] DEFAULT NULL,
+  p_item_id bigint DEFAULT NULL,
+  p_before_time timestamptz DEFAULT NULL,
+  p_before_id bigint DEFAULT NULL,
+  p_limit integer DEFAULT 20
+)
+RETURNS TABLE (
+  id bigint,
+  item_id bigint,
+  edition_id bigint,
+  event_type text,
+  store text,
+  event_time timestamptz,
+  in_stock boolean,
+  old_value text,
+  new_value text,
+  name text,
+  author text,
+  link text
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT
+    ce.id::bigint,
+    ce.item_id::bigint,
+    ce.edition_id::bigint,
+    ce.event_type,
+    ce.store,
+    ce.event_time::timestamptz,
+    ce.in_stock,
+    ce.old_value,
+    ce.new_value,
+    ce.name,
+    ce.author,
+    ce.link
+  FROM public.catalog_events ce
+  WHERE ce.event_type <> 'Unknown Change'
+    AND (p_store IS NULL OR ce.store = p_store)
+    AND (p_event_types IS NULL OR ce.event_type = ANY(p_event_types))
+    AND (p_item_id IS NULL OR ce.item_id = p_item_id)
+    AND (p_before_time IS NULL OR (ce.event_time, ce.id) < (p_before_time, p_before_id))
+  ORDER BY ce.event_time DESC, ce.id DESC
+  LIMIT LEAST(GREATEST(p_limit, 1), 500);
+$$;
+
+-- Store names for filter dropdowns (no need to page the catalogue for them).
+CREATE OR REPLACE FUNCTION public.catalog_stores()
+RETURNS TABLE (store text)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT c.store_name
+  FROM public.collections c
+  WHERE EXISTS (SELECT 1 FROM public.retailer_listings rl WHERE rl.collection_id = c.id)
+  ORDER BY 1;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.catalog_listings_page(text, boolean, text, text, timestamptz, bigint[], text, bigint, integer) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.catalog_listings_count(text, boolean, text, text, timestamptz, integer) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.catalog_events_page(text, text[], bigint, timestamptz, bigint, integer) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.catalog_stores() TO anon, authenticated;
@@ -0,0 +1,165 @@
+-- ============================================================
+-- Catalog search: full-text + trigram indexes over works/editions,
+-- a ranked search RPC, and a one-query fuzzy work resolver used by
+-- silver_catalog.find_work_id.
+-- ============================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA extensions;
+
+-- 'simple' config: titles are proper nouns and invented words; stemming and
+-- English stop-word removal hurt more than they help here.
+ALTER TABLE public.works
+  ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce(author, '')), 'B')
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_works_search_vector
+  ON public.works USING gin (search_vector);
+
+-- Fuzzy matching on normalized keys (resolver + search ranking)
+CREATE INDEX IF NOT EXISTS idx_works_normalized_title_trgm
+  ON public.works USING gin (normalized_title extensions.gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_works_normalized_author_trgm
+  ON public.works USING gin (normalized_author extensions.gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_editions_normalized_title_trgm
+  ON public.editions USING gin (normalized_title extensions.gin_trgm_ops);
+
+-- Substring (ILIKE '%q%') filters in catalog_listings_page
+CREATE INDEX IF NOT EXISTS idx_works_title_trgm
+  ON public.works USING gin (title extensions.gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_works_author_trgm
+  ON public.works USING gin (author extensions.gin_trgm_ops);
+
+-- ------------------------------------------------------------
+-- Ranked search over works (title/author), best edition per work.
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.search_catalog(p_query text, p_limit integer DEFAULT 20)
+RETURNS TABLE (
+  work_id bigint,
+  edition_id bigint,
+  title text,
+  author text,
+  rank real
+)
+LANGUAGE sql
+STABLE
+SET search_path = public, extensions
+AS $$
+  WITH q AS (
+    SELECT
+      websearch_to_tsquery('simple', p_query) AS tsq,
+      btrim(regexp_replace(lower(btrim(p_query)), '[^a-z0-9]+', ' ', 'g')) AS norm
+  ),
+  matches AS (
+    SELECT
+      w.id,
+      w.title,
+      w.author,
+      (
+        ts_rank(w.search_vector, q.tsq)
+        + GREATEST(
+            similarity(w.normalized_title, q.norm),
+            similarity(coalesce(w.normalized_author, ''), q.norm)
+          )
+      )::real AS rank
+    FROM public.works w, q
+    WHERE q.norm <> ''
+      AND (
+        w.search_vector @@ q.tsq
+        OR w.normalized_title % q.norm
+        OR w.normalized_author % q.norm
+      )
+    ORDER BY rank DESC, w.id
+    LIMIT LEAST(GREATEST(p_limit, 1), 100)
+  )
+  SELECT
+    m.id::bigint,
+    (
+      SELECT e.id::bigint
+      FROM public.editions e
+      WHERE e.work_id = m.id
+      ORDER BY e.id
+      LIMIT 1
+    ) AS edition_id,
+    m.title,
+    m.author,
+    m.rank
+  FROM matches m
+  ORDER BY m.rank DESC, m.id;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.search_catalog(text, integer) TO anon, authenticated;
+
+-- ------------------------------------------------------------
+-- Work resolver: all title variants in one indexed query.
+-- p_titles are normalized variants in priority order; p_author is the
+-- normalized author (or NULL). Exact tiers mirror the previous per-variant
+-- probes. The fuzzy tier (skipped when p_min_similarity is NULL) applies
+-- only when nothing matches exactly, and needs compatible authors and
+-- identical digits (so "Book 1" never resolves to "Book 2").
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.resolve_work_id(
+  p_titles text[],
+  p_author text DEFAULT NULL,
+  p_min_similarity real DEFAULT 0.6
+)
+RETURNS TABLE (
+  work_id bigint,
+  match_tier integer,
+  score real
+)
+LANGUAGE sql
+STABLE
+SET search_path = public, extensions
+AS $$
+  WITH v AS (
+    SELECT t AS norm_title, ord
+    FROM unnest(p_titles) WITH ORDINALITY AS u(t, ord)
+    WHERE t IS NOT NULL AND t <> ''
+  ),
+  exact AS (
+    SELECT
+      w.id,
+      v.ord,
+      CASE
+        WHEN w.normalized_author = coalesce(p_author, '') THEN 1
+        WHEN p_author IS NOT NULL AND w.normalized_author IS NULL THEN 2
+        WHEN w.author IS NOT NULL THEN 3
+      END AS tier,
+      1.0::real AS score
+    FROM v
+    INNER JOIN public.works w ON w.normalized_title = v.norm_title
+  ),
+  fuzzy AS (
+    SELECT
+      w.id,
+      v.ord,
+      4 AS tier,
+      similarity(w.normalized_title, v.norm_title) AS score
+    FROM v
+    INNER JOIN public.works w ON w.normalized_title % v.norm_title
+    WHERE p_min_similarity IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM exact WHERE exact.tier IS NOT NULL)
+      AND similarity(w.normalized_title, v.norm_title) >= p_min_similarity
+      AND (p_author IS NULL OR w.normalized_author IS NULL OR w.normalized_author = p_author)
+      AND regexp_replace(w.normalized_title, '[^0-9]', '', 'g')
+        = regexp_replace(v.norm_title, '[^0-9]', '', 'g')
+  ),
+  candidates AS (
+    SELECT * FROM exact WHERE tier IS NOT NULL
+    UNION ALL
+    SELECT * FROM fuzzy
+  )
+  SELECT c.id::bigint, c.tier, c.score
+  FROM candidates c
+  ORDER BY (c.tier = 4), c.score DESC, c.ord, c.tier, c.id
+  LIMIT 1;
+$$;
+
+REVOKE ALL ON FUNCTION public.resolve_work_id(text[], text, real) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.resolve_work_id(text[], text, real) TO service_role;
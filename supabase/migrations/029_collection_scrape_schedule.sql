@@ -0,0 +1,31 @@
+-- ============================================================
+-- Store registry: collections drive what the Lambda scrapes.
+-- Each active collection with a scrape_url is scraped by `scraper`
+-- (a key of lambda_function.STORE_CHECKS) at most every
+-- scrape_interval_minutes (NULL = every run). scrape_priority orders
+-- scraping and picks the canonical store when one product is listed
+-- in several collections (lower wins). last_scraped_at is advanced by
+-- the Lambda after each successful scrape.
+-- ============================================================
+
+ALTER TABLE public.collections
+  ADD COLUMN IF NOT EXISTS scraper text,
+  ADD COLUMN IF NOT EXISTS scrape_priority int NOT NULL DEFAULT 100,
+  ADD COLUMN IF NOT EXISTS scrape_interval_minutes int
+    CHECK (scrape_interval_minutes IS NULL OR scrape_interval_minutes > 0),
+  ADD COLUMN IF NOT EXISTS last_scraped_at timestamptz;
+
+-- Current stores, in the precedence previously hard-coded in lambda_function.py.
+-- Intervals stay NULL so behaviour is unchanged until someone sets them.
+UPDATE public.collections c
+SET scrape_url = COALESCE(c.scrape_url, v.scrape_url),
+    scraper = COALESCE(c.scraper, v.scraper),
+    scrape_priority = v.scrape_priority
+FROM (VALUES
+  ('Broken Binding - To The Stars',   'broken_binding', 'https://thebrokenbindingsub.com/collections/to-the-stars',  0),
+  ('Broken Binding - The Infirmary',  'broken_binding', 'https://thebrokenbindingsub.com/collections/the-infirmary', 1),
+  ('Broken Binding - Dragon''s Hoard', 'broken_binding', 'https://thebrokenbindingsub.com/collections/dragons-hoard', 2),
+  ('Broken Binding - The Graveyard',  'broken_binding', 'https://thebrokenbindingsub.com/collections/the-graveyard',  3),
+  ('Folio Society - Sci-Fi & Fantasy', 'folio_society', 'https://www.foliosociety.com/usa/sci-fi-fantasy',          1000)
+) AS v(store_name, scraper, scrape_url, scrape_priority)
+WHERE c.store_name = v.store_name;
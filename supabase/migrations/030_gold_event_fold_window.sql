@@ -0,0 +1,183 @@
+-- ============================================================
+-- Gold event folding: trailing window instead of a strict id watermark.
+--
+-- 025 folded item_events with id > last_event_id up to MAX(id). Sequence
+-- ids can commit out of order (overlapping lambda runs, batch_writer's
+-- concurrent chunk inserts), so an event committed after a higher id had
+-- been folded was skipped for good and the Gold counts undercounted.
+--
+-- last_event_id is now a low-water mark that only moves past events older
+-- than a 5-minute safety lag. Every refresh re-scans the ids above it and
+-- skips the ones already recorded in gold_folded_events, so each event is
+-- counted exactly once whenever it commits.
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS public.gold_folded_events (
+  event_id bigint PRIMARY KEY
+);
+
+ALTER TABLE public.gold_folded_events ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.refresh_gold_analytics(p_full boolean DEFAULT false)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_today date := (now() AT TIME ZONE 'UTC')::date;
+  v_state public.gold_refresh_state%ROWTYPE;
+  v_day date;
+  v_days integer := 0;
+  v_new_event_ids bigint[];
+  v_low_water bigint;
+  v_events integer := 0;
+BEGIN
+  SELECT * INTO v_state FROM public.gold_refresh_state WHERE id FOR UPDATE;
+
+  IF p_full THEN
+    TRUNCATE public.gold_item_streaks, public.gold_item_event_counts,
+             public.gold_event_daily_counts, public.gold_price_drops,
+             public.gold_folded_events;
+    v_state.settled_through := NULL;
+    v_state.last_event_id := 0;
+  END IF;
+
+  -- Snapshot days, oldest first; each day extends or resets every item's streak.
+  FOR v_day IN
+    SELECT DISTINCT isd.snapshot_date
+    FROM public.item_status_daily isd
+    WHERE isd.snapshot_date > COALESCE(v_state.settled_through, '-infinity'::date)
+      AND isd.snapshot_date < v_today
+    ORDER BY 1
+  LOOP
+    INSERT INTO public.gold_item_streaks AS g (
+      item_id, last_snapshot_date, last_in_stock, current_streak_days, longest_in_stock_days
+    )
+    SELECT
+      isd.item_id,
+      v_day,
+      COALESCE(isd.in_stock, false),
+      CASE WHEN isd.in_stock IS TRUE THEN 1 ELSE 0 END,
+      CASE WHEN isd.in_stock IS TRUE THEN 1 ELSE 0 END
+    FROM public.item_status_daily isd
+    WHERE isd.snapshot_date = v_day
+    ON CONFLICT (item_id) DO UPDATE
+    SET
+      current_streak_days = CASE
+        WHEN NOT EXCLUDED.last_in_stock THEN 0
+        WHEN g.last_in_stock AND g.last_snapshot_date = v_day - 1 THEN g.current_streak_days + 1
+        ELSE 1
+      END,
+      longest_in_stock_days = GREATEST(
+        g.longest_in_stock_days,
+        CASE
+          WHEN NOT EXCLUDED.last_in_stock THEN 0
+          WHEN g.last_in_stock AND g.last_snapshot_date = v_day - 1 THEN g.current_streak_days + 1
+          ELSE 1
+        END
+      ),
+      last_snapshot_date = EXCLUDED.last_snapshot_date,
+      last_in_stock = EXCLUDED.last_in_stock;
+
+    v_days := v_days + 1;
+  END LOOP;
+
+  IF v_state.settled_through IS NULL OR v_state.settled_through < v_today - 1 THEN
+    v_state.settled_through := v_today - 1;
+  END IF;
+
+  -- Events above the low-water mark that haven't been folded yet. Fixed up
+  -- front so every Gold table sees the same set even if the lambda inserts
+  -- more events meanwhile.
+  SELECT array_agg(ie.id) INTO v_new_event_ids
+  FROM public.item_events ie
+  WHERE ie.id > v_state.last_event_id
+    AND NOT EXISTS (
+      SELECT 1 FROM public.gold_folded_events f WHERE f.event_id = ie.id
+    );
+
+  IF v_new_event_ids IS NOT NULL THEN
+    INSERT INTO public.gold_folded_events (event_id)
+    SELECT unnest(v_new_event_ids)
+    ON CONFLICT (event_id) DO NOTHING;
+
+    INSERT INTO public.gold_item_event_counts AS g (item_id, event_type, event_count)
+    SELECT ie.item_id, ie.event_type, COUNT(*)::bigint
+    FROM public.item_events ie
+    WHERE ie.id = ANY (v_new_event_ids)
+      AND ie.item_id IS NOT NULL
+      AND ie.event_type IS NOT NULL
+    GROUP BY ie.item_id, ie.event_type
+    ON CONFLICT (item_id, event_type) DO UPDATE
+    SET event_count = g.event_count + EXCLUDED.event_count;
+
+    INSERT INTO public.gold_event_daily_counts AS g (day, event_type, store, event_count)
+    SELECT
+      (ie.event_time AT TIME ZONE 'UTC')::date,
+      ie.event_type,
+      COALESCE(ie.store, 'Unknown'),
+      COUNT(*)::bigint
+    FROM public.item_events ie
+    WHERE ie.id = ANY (v_new_event_ids)
+      AND ie.event_type IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, event_type, store) DO UPDATE
+    SET event_count = g.event_count + EXCLUDED.event_count;
+
+    INSERT INTO public.gold_price_drops (
+      event_id, item_id, old_value, new_value, old_num, new_num, price_drop
+    )
+    SELECT event_id, item_id, old_value, new_value, old_num, new_num, old_num - new_num
+    FROM (
+      SELECT
+        ie.id AS event_id,
+        ie.item_id,
+        ie.old_value,
+        ie.new_value,
+        NULLIF(regexp_replace(COALESCE(ie.old_value, ''), '[^0-9.]', '', 'g'), '')::numeric AS old_num,
+        NULLIF(regexp_replace(COALESCE(ie.new_value, ''), '[^0-9.]', '', 'g'), '')::numeric AS new_num
+      FROM public.item_events ie
+      WHERE ie.id = ANY (v_new_event_ids)
+        AND ie.event_type = 'Price Change'
+        AND ie.item_id IS NOT NULL
+    ) parsed
+    WHERE old_num IS NOT NULL
+      AND new_num IS NOT NULL
+      AND new_num < old_num
+    ON CONFLICT (event_id) DO NOTHING;
+
+    v_events := cardinality(v_new_event_ids);
+  END IF;
+
+  -- Advance the low-water mark only past events older than the safety lag;
+  -- by then any lower id still in flight has committed and been folded above.
+  -- Folded ids at or below it are no longer needed for dedupe.
+  SELECT MAX(ie.id) INTO v_low_water
+  FROM public.item_events ie
+  WHERE ie.id > v_state.last_event_id
+    AND ie.event_time < now() - interval '5 minutes';
+
+  IF v_low_water IS NOT NULL THEN
+    v_state.last_event_id := v_low_water;
+    DELETE FROM public.gold_folded_events WHERE event_id <= v_low_water;
+  END IF;
+
+  UPDATE public.gold_refresh_state
+  SET
+    settled_through = v_state.settled_through,
+    last_event_id = v_state.last_event_id,
+    refreshed_at = now()
+  WHERE id;
+
+  RETURN jsonb_build_object(
+    'snapshot_days', v_days,
+    'events', v_events,
+    'settled_through', v_state.settled_through,
+    'last_event_id', v_state.last_event_id
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.refresh_gold_analytics(boolean) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.refresh_gold_analytics(boolean) TO service_role;
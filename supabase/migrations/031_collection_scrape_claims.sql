@@ -0,0 +1,56 @@
+-- ============================================================
+-- Atomic per-collection scrape claims.
+--
+-- With a 1-minute schedule a run can still be going when the next one
+-- starts. Both would see the same collections as due, diff against the same
+-- items_seen snapshot and insert/email the same events. A run now claims
+-- its due collections in one UPDATE: last_scraped_at moves to now() and a
+-- lease (scrape_lease_until) keeps overlapping runs off them until the run
+-- releases it, or until it expires if the Lambda dies mid-run (15 minutes
+-- is the Lambda timeout ceiling).
+-- ============================================================
+
+ALTER TABLE public.collections
+  ADD COLUMN IF NOT EXISTS scrape_lease_until timestamptz;
+
+-- Claims the given collections that are unleased and due (or all unleased
+-- ones when p_force). Returns the claimed ids with their previous
+-- last_scraped_at so the caller can restore it if the run writes nothing.
+CREATE OR REPLACE FUNCTION public.claim_due_collections(
+  p_ids int[],
+  p_force boolean DEFAULT false,
+  p_slack_seconds integer DEFAULT 30,
+  p_lease_minutes integer DEFAULT 15
+)
+RETURNS TABLE (id int, previous_scraped_at timestamptz)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  -- FOR UPDATE serializes overlapping claims: the second waits, then sees
+  -- the first run's lease and claims nothing.
+  WITH locked AS (
+    SELECT c.id, c.last_scraped_at
+    FROM public.collections c
+    WHERE c.id = ANY(p_ids)
+    FOR UPDATE
+  )
+  UPDATE public.collections c
+  SET last_scraped_at = now(),
+      scrape_lease_until = now() + make_interval(mins => p_lease_minutes)
+  FROM locked
+  WHERE c.id = locked.id
+    AND (c.scrape_lease_until IS NULL OR c.scrape_lease_until < now())
+    AND (
+      p_force
+      OR c.scrape_interval_minutes IS NULL
+      OR c.last_scraped_at IS NULL
+      OR c.last_scraped_at <= now()
+        - make_interval(mins => c.scrape_interval_minutes)
+        + make_interval(secs => p_slack_seconds)
+    )
+  RETURNING c.id, locked.last_scraped_at;
+$$;
+
+REVOKE ALL ON FUNCTION public.claim_due_collections(int[], boolean, integer, integer) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.claim_due_collections(int[], boolean, integer, integer) TO service_role;
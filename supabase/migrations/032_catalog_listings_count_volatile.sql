@@ -0,0 +1,9 @@
+-- ============================================================
+-- catalog_listings_count falls back to the planner estimate via
+-- EXECUTE 'EXPLAIN ...' once a filter matches more than p_exact_limit
+-- rows. Postgres refuses EXPLAIN inside a non-volatile function, so the
+-- STABLE declaration in 027 made every large count raise instead of
+-- returning the estimate.
+-- ============================================================
+
+ALTER FUNCTION public.catalog_listings_count(text, boolean, text, text, timestamptz, integer) VOLATILE;
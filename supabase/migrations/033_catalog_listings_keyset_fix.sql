@@ -0,0 +1,139 @@
+-- ============================================================
+-- Fixes to the catalog_listings read API from 027.
+--
+-- catalog_listings_page was keyed on (name, id), but `id` is the
+-- items_seen id and one item can back several retailer listings, so rows
+-- sharing both could be skipped or repeated across pages. Pages are now
+-- keyed on (name, listing_id), the retailer_listings primary key, and the
+-- page returns listing_id so the client can pass it back as p_after_id.
+--
+-- p_search was spliced into ILIKE patterns unescaped, so '%', '_' and '\'
+-- in a search acted as wildcards. escape_like() escapes them first.
+-- ============================================================
+
+-- Escapes LIKE/ILIKE metacharacters (default escape character '\').
+CREATE OR REPLACE FUNCTION public.escape_like(p_value text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+STRICT
+SET search_path = public
+AS $$
+  SELECT replace(replace(replace(p_value, '\', '\\'), '%', '\%'), '_', '\_');
+$$;
+
+-- The return type changes, so the function has to be dropped first.
+DROP FUNCTION IF EXISTS public.catalog_listings_page(text, boolean, text, text, timestamptz, bigint[], text, bigint, integer);
+
+CREATE FUNCTION public.catalog_listings_page(
+  p_store text DEFAULT NULL,
+  p_in_stock boolean DEFAULT NULL,
+  p_author text DEFAULT NULL,
+  p_search text DEFAULT NULL,
+  p_active_since timestamptz DEFAULT NULL,
+  p_edition_ids bigint[] DEFAULT NULL,
+  p_after_name text DEFAULT NULL,
+  p_after_id bigint DEFAULT NULL,
+  p_limit integer DEFAULT 50
+)
+RETURNS TABLE (
+  id bigint,
+  listing_id bigint,
+  edition_id bigint,
+  name text,
+  author text,
+  price text,
+  store text,
+  link text,
+  in_stock boolean,
+  last_in_stock timestamptz,
+  isbn text,
+  cover_url text,
+  open_library_id text
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT
+    cl.id::bigint,
+    cl.listing_id::bigint,
+    cl.edition_id::bigint,
+    cl.name,
+    cl.author,
+    cl.price,
+    cl.store,
+    cl.link,
+    cl.in_stock,
+    cl.last_in_stock::timestamptz,
+    cl.isbn,
+    cl.cover_url,
+    cl.open_library_id
+  FROM public.catalog_listings cl
+  WHERE (p_store IS NULL OR cl.store = p_store)
+    AND (p_in_stock IS NULL OR cl.in_stock IS NOT DISTINCT FROM p_in_stock)
+    AND (p_author IS NULL OR btrim(cl.author) = p_author)
+    AND (
+      p_search IS NULL
+      OR cl.name ILIKE '%' || public.escape_like(p_search) || '%'
+      OR cl.author ILIKE '%' || public.escape_like(p_search) || '%'
+    )
+    AND (p_active_since IS NULL OR cl.in_stock IS TRUE OR cl.last_in_stock >= p_active_since)
+    AND (p_edition_ids IS NULL OR cl.edition_id = ANY(p_edition_ids))
+    AND (p_after_name IS NULL OR (cl.name, cl.listing_id) > (p_after_name, p_after_id))
+  ORDER BY cl.name, cl.listing_id
+  LIMIT LEAST(GREATEST(p_limit, 1), 500);
+$$;
+
+-- Same as 027/032 apart from the escaped search; stays VOLATILE for EXPLAIN.
+CREATE OR REPLACE FUNCTION public.catalog_listings_count(
+  p_store text DEFAULT NULL,
+  p_in_stock boolean DEFAULT NULL,
+  p_author text DEFAULT NULL,
+  p_search text DEFAULT NULL,
+  p_active_since timestamptz DEFAULT NULL,
+  p_exact_limit integer DEFAULT 5000
+)
+RETURNS bigint
+LANGUAGE plpgsql
+VOLATILE
+SET search_path = public
+AS $$
+DECLARE
+  v_where text;
+  v_count bigint;
+  v_plan json;
+BEGIN
+  v_where := format(
+    $w$
+    WHERE (%1$L::text IS NULL OR cl.store = %1$L)
+      AND (%2$L::boolean IS NULL OR cl.in_stock IS NOT DISTINCT FROM %2$L::boolean)
+      AND (%3$L::text IS NULL OR btrim(cl.author) = %3$L)
+      AND (
+        %4$L::text IS NULL
+        OR cl.name ILIKE '%%' || public.escape_like(%4$L) || '%%'
+        OR cl.author ILIKE '%%' || public.escape_like(%4$L) || '%%'
+      )
+      AND (%5$L::timestamptz IS NULL OR cl.in_stock IS TRUE OR cl.last_in_stock >= %5$L::timestamptz)
+    $w$,
+    p_store, p_in_stock, p_author, p_search, p_active_since
+  );
+
+  EXECUTE format(
+    'SELECT count(*) FROM (SELECT 1 FROM public.catalog_listings cl %s LIMIT %s) q',
+    v_where, p_exact_limit + 1
+  ) INTO v_count;
+
+  IF v_count <= p_exact_limit THEN
+    RETURN v_count;
+  END IF;
+
+  EXECUTE format('EXPLAIN (FORMAT JSON) SELECT 1 FROM public.catalog_listings cl %s', v_where)
+    INTO v_plan;
+  RETURN GREATEST((v_plan -> 0 -> 'Plan' ->> 'Plan Rows')::bigint, v_count);
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.escape_like(text) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.catalog_listings_page(text, boolean, text, text, timestamptz, bigint[], text, bigint, integer) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.catalog_listings_count(text, boolean, text, text, timestamptz, integer) TO anon, authenticated;
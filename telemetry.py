@@ -0,0 +1,156 @@
+"""Per-run stage timing plus HTTP and database round-trip counters (stored in run_log.telemetry)."""
+
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import requests
+
+# requests.Session.send covers the scrapers and Open Library (requests.get goes
+# through a Session too); httpx.Client.send covers supabase-py / PostgREST, plus
+# the scrapers' optional HTTP/2 backend, whose clients set `telemetry_kind`.
+_orig_requests_send = requests.Session.send
+_orig_httpx_send = httpx.Client.send
+
+_lock = threading.Lock()
+_active: RunTelemetry | None = None
+
+
+def _empty_counters() -> dict:
+    return {
+        "wall_ms": 0.0,
+        "calls": 0,
+        "http_requests": 0,
+        "http_bytes": 0,
+        "db_requests": 0,
+        "db_bytes": 0,
+    }
+
+
+class RunTelemetry:
+    """
+    Counters for one run, keyed by stage name.
+
+    Requests are attributed to the innermost open stage (or "other"), so stage
+    counters sum to the run total; wall time of an outer stage includes its
+    nested stages.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started = time.perf_counter()
+        self.stages: dict[str, dict] = {}
+        self._stack: list[str] = []
+
+    def _counters(self, name: str) -> dict:
+        return self.stages.setdefault(name, _empty_counters())
+
+    @contextmanager
+    def stage(self, name: str):
+        with _lock:
+            self._stack.append(name)
+            self._counters(name)["calls"] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with _lock:
+                self._counters(name)["wall_ms"] += elapsed
+                self._stack.pop()
+
+    def record(self, kind: str, nbytes: int) -> None:
+        with _lock:
+            counters = self._counters(self._stack[-1] if self._stack else "other")
+            counters[f"{kind}_requests"] += 1
+            counters[f"{kind}_bytes"] += nbytes
+
+    def summary(self) -> dict:
+        with _lock:
+            stages = {
+                name: {**c, "wall_ms": round(c["wall_ms"], 1)} for name, c in self.stages.items()
+            }
+        totals = _empty_counters()
+        for c in stages.values():
+            for key in ("http_requests", "http_bytes", "db_requests", "db_bytes"):
+                totals[key] += c[key]
+        totals["wall_ms"] = round((time.perf_counter() - self.started) * 1000, 1)
+        del totals["calls"]
+        return {"totals": totals, "stages": stages}
+
+
+def _response_bytes(resp, streamed: bool) -> int:
+    if not streamed:
+        return len(resp.content or b"")
+    try:
+        return int(resp.headers.get("Content-Length") or 0)
+    except ValueError:
+        return 0
+
+
+@functools.wraps(_orig_requests_send)
+def _requests_send(self, request, **kwargs):
+    resp = _orig_requests_send(self, request, **kwargs)
+    tel = _active
+    if tel is not None:
+        tel.record("http", _response_bytes(resp, bool(kwargs.get("stream"))))
+    return resp
+
+
+@functools.wraps(_orig_httpx_send)
+def _httpx_send(self, request, *args, **kwargs):
+    resp = _orig_httpx_send(self, request, *args, **kwargs)
+    tel = _active
+    if tel is not None:
+        kind = getattr(self, "telemetry_kind", "db")
+        tel.record(kind, _response_bytes(resp, bool(kwargs.get("stream"))))
+    return resp
+
+
+def install_hooks() -> None:
+    """Count outgoing requests. Idempotent; counting is a no-op outside a run."""
+    requests.Session.send = _requests_send
+    httpx.Client.send = _httpx_send
+
+
+def start_run(run_id: str) -> RunTelemetry:
+    global _active
+    install_hooks()
+    _active = RunTelemetry(run_id)
+    return _active
+
+
+def finish_run(run_id: str) -> dict | None:
+    """Close the active run and return its summary (None if `run_id` is not active)."""
+    global _active
+    tel = _active
+    if tel is None or tel.run_id != run_id:
+        return None
+    _active = None
+    return tel.summary()
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as `name` on the active run; no-op when no run is active."""
+    tel = _active
+    if tel is None:
+        yield
+        return
+    with tel.stage(name):
+        yield
+
+
+def timed(name: str):
+    """Decorator form of `stage`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
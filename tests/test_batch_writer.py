@@ -0,0 +1,169 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+import httpx
+from postgrest.exceptions import APIError
+
+import batch_writer as bw
+
+_UNIQUE_VIOLATION = APIError({"code": "23505", "message": "duplicate key value"})
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class _FakeQuery:
+    def __init__(self, table, rows, returning, fail_if):
+        self._table = table
+        self._rows = rows
+        self._returning = returning
+        self._fail_if = fail_if
+
+    def execute(self):
+        self._table.calls.append(list(self._rows))
+        if any(self._fail_if(r) for r in self._rows):
+            raise self._table.error
+        self._table.written.extend(self._rows)
+        if self._returning == "minimal":
+            return _FakeResponse([])
+        return _FakeResponse([{"id": r["n"] * 10, **r} for r in self._rows])
+
+
+class _FakeTable:
+    def __init__(self, fail_if, error):
+        self.fail_if = fail_if
+        self.error = error
+        self.calls = []
+        self.written = []
+        self.lock = threading.Lock()
+
+    def insert(self, rows, returning=None):
+        return _FakeQuery(self, rows, str(returning), self.fail_if)
+
+    def upsert(self, rows, on_conflict="", returning=None):
+        self.on_conflict = on_conflict
+        return _FakeQuery(self, rows, str(returning), self.fail_if)
+
+
+class _FakeClient:
+    def __init__(self, fail_if=lambda r: False, error=_UNIQUE_VIOLATION):
+        self.tbl = _FakeTable(fail_if, error)
+
+    def table(self, name):
+        return self.tbl
+
+
+class TestChunkRows(unittest.TestCase):
+
+    def test_chunks_by_row_count(self):
+        rows = [{"n": i} for i in range(7)]
+        chunks = bw.chunk_rows(rows, max_rows=3, max_bytes=10_000)
+        self.assertEqual([len(c) for c in chunks], [3, 3, 1])
+
+    def test_chunks_by_payload_bytes(self):
+        rows = [{"blob": "x" * 100} for _ in range(5)]
+        size = bw.row_size_bytes(rows[0])
+        chunks = bw.chunk_rows(rows, max_rows=100, max_bytes=2 + size * 2)
+        self.assertEqual([len(c) for c in chunks], [2, 2, 1])
+
+    def test_oversized_row_gets_own_chunk(self):
+        rows = [{"blob": "x" * 500}, {"n": 1}]
+        chunks = bw.chunk_rows(rows, max_rows=100, max_bytes=50)
+        self.assertEqual(len(chunks), 2)
+
+    def test_align_columns_fills_missing_keys(self):
+        aligned = bw.align_columns([{"a": 1}, {"b": 2}])
+        self.assertEqual(aligned, [{"a": 1, "b": None}, {"a": None, "b": 2}])
+
+
+class TestWriteRows(unittest.TestCase):
+
+    def test_returns_rows_in_input_order_across_chunks(self):
+        sb = _FakeClient()
+        rows = [{"n": i} for i in range(10)]
+        result = bw.write_rows(sb, "t", rows, returning="*", max_rows=3, max_workers=4)
+        self.assertEqual([r["n"] for r in result.returned], list(range(10)))
+        self.assertEqual(result.rows_written, 10)
+        self.assertEqual(result.rows_failed, 0)
+        self.assertEqual(result.chunks, 4)
+
+    def test_bisects_to_isolate_bad_row(self):
+        sb = _FakeClient(fail_if=lambda r: r["n"] == 5)
+        rows = [{"n": i} for i in range(8)]
+        with patch.object(bw.time, "sleep"):
+            result = bw.write_rows(sb, "t", rows, max_rows=8)
+        self.assertEqual(result.rows_written, 7)
+        self.assertEqual(result.rows_failed, 1)
+        self.assertEqual(result.failed_rows, [{"n": 5}])
+        self.assertEqual(sorted(r["n"] for r in sb.tbl.written), [0, 1, 2, 3, 4, 6, 7])
+
+    def test_retries_transient_chunk_failure(self):
+        attempts = {"count": 0}
+
+        def flaky(_row):
+            attempts["count"] += 1
+            return attempts["count"] == 1
+
+        sb = _FakeClient(fail_if=flaky, error=httpx.ReadTimeout("timed out"))
+        with patch.object(bw.time, "sleep") as sleep:
+            result = bw.write_rows(sb, "t", [{"n": 1}], upsert=True, on_conflict="n")
+        self.assertEqual(result.rows_written, 1)
+        self.assertEqual(result.requests, 2)
+        sleep.assert_called_once()
+        self.assertEqual(sb.tbl.on_conflict, "n")
+
+    def test_outage_fails_chunk_once_without_bisecting(self):
+        sb = _FakeClient(fail_if=lambda r: True, error=APIError({"code": 503, "message": "unavailable"}))
+        rows = [{"n": i} for i in range(8)]
+        with patch.object(bw.time, "sleep"):
+            result = bw.write_rows(sb, "t", rows, upsert=True, on_conflict="n", max_rows=8)
+        self.assertEqual(result.requests, 2)  # one retry, no bisection
+        self.assertEqual(result.rows_failed, 8)
+        self.assertEqual(len(result.errors), 1)
+
+    def test_insert_not_resent_after_ambiguous_timeout(self):
+        sb = _FakeClient(fail_if=lambda r: True, error=httpx.ReadTimeout("timed out"))
+        with patch.object(bw.time, "sleep"):
+            result = bw.write_rows(sb, "t", [{"n": 1}, {"n": 2}])
+        self.assertEqual(result.requests, 1)
+        self.assertEqual(result.rows_failed, 2)
+
+    def test_insert_resent_when_connection_never_opened(self):
+        attempts = {"count": 0}
+
+        def flaky(_row):
+            attempts["count"] += 1
+            return attempts["count"] == 1
+
+        sb = _FakeClient(fail_if=flaky, error=httpx.ConnectError("refused"))
+        with patch.object(bw.time, "sleep"):
+            result = bw.write_rows(sb, "t", [{"n": 1}])
+        self.assertEqual(result.rows_written, 1)
+        self.assertEqual(result.requests, 2)
+
+    def test_auth_error_is_not_retried(self):
+        sb = _FakeClient(fail_if=lambda r: True, error=APIError({"code": "PGRST301", "message": "JWT expired"}))
+        with patch.object(bw.time, "sleep") as sleep:
+            result = bw.write_rows(sb, "t", [{"n": 1}, {"n": 2}], upsert=True)
+        self.assertEqual(result.requests, 1)
+        sleep.assert_not_called()
+
+    def test_empty_rows_is_noop(self):
+        sb = _FakeClient()
+        result = bw.write_rows(sb, "t", [])
+        self.assertEqual(result.rows_written, 0)
+        self.assertEqual(sb.tbl.calls, [])
+
+    def test_merge_write_stats_accumulates_per_table(self):
+        stats = {}
+        bw.merge_write_stats(stats, bw.BatchResult(table="t", rows_written=2, chunks=1, requests=1))
+        bw.merge_write_stats(stats, bw.BatchResult(table="t", rows_written=3, rows_failed=1))
+        self.assertEqual(stats["t"]["rows_written"], 5)
+        self.assertEqual(stats["t"]["rows_failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,11 @@ from unittest import mock
 import requests
 from bs4 import BeautifulSoup
 
+import rate_limiter
+from rate_limiter import MAX_BACKOFF_SECONDS
 import scrapers.broken_binding_sf as bb
+from scrapers.check_private_sales import private_sale_report
+from scrapers.product_cache import ProductCache, product_handle
 from scrapers.broken_binding_sf import (
     author_from_shopify_json,
     cover_and_isbn_from_shopify_json,
@@ -133,14 +137,14 @@ class TestGetWithRetry(unittest.TestCase):
         ok = _FakeResponse(200)
         throttled = _FakeResponse(429, headers={"Retry-After": "7"})
         session = _FakeSession([throttled, ok])
-        with mock.patch.object(bb.time, "sleep") as sleep:
+        with mock.patch.object(rate_limiter.time, "sleep") as sleep:
             result = _get_with_retry(session, "https://x/p.js", max_retries=3)
         self.assertIs(result, ok)
         sleep.assert_called_once_with(7.0)
 
     def test_does_not_retry_404(self):
         session = _FakeSession([_FakeResponse(404)])
-        with mock.patch.object(bb.time, "sleep"):
+        with mock.patch.object(rate_limiter.time, "sleep"):
             with self.assertRaises(requests.HTTPError):
                 _get_with_retry(session, "https://x/p.js", max_retries=3)
         self.assertEqual(len(session.urls), 1)
@@ -149,9 +153,74 @@ class TestGetWithRetry(unittest.TestCase):
         throttled = _FakeResponse(429, headers={"Retry-After": "999"})
         ok = _FakeResponse(200)
         session = _FakeSession([throttled, ok])
-        with mock.patch.object(bb.time, "sleep") as sleep:
+        with mock.patch.object(rate_limiter.time, "sleep") as sleep:
             _get_with_retry(session, "https://x/p.js", max_retries=3)
-        sleep.assert_called_once_with(float(bb.MAX_BACKOFF_SECONDS))
+        sleep.assert_called_once_with(float(MAX_BACKOFF_SECONDS))
+
+
+def _collection_html(handles):
+    items = "".join(
+        f'<li class="grid__item"><h3 class="card__heading">'
+        f'<a class="full-unstyled-link" href="/products/{h}">{h.title()}</a></h3>'
+        f'<span class="price-item--regular">$10.00</span></li>'
+        for h in handles
+    )
+    return f"<ul>{items}</ul>".encode()
+
+
+class _PageResponse:
+    def __init__(self, content=b"", data=None):
+        self.content = content
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class TestProductCache(unittest.TestCase):
+
+    def test_product_handle(self):
+        self.assertEqual(product_handle("https://x.com/products/dune?variant=1"), "dune")
+        self.assertEqual(product_handle("https://x.com/collections/a/products/dune.js"), "dune")
+
+    def test_scrape_fetches_each_product_once_and_feeds_report(self):
+        # "shared" appears in every collection; "secret" is a Private Sale.
+        collections = {"to-the-stars": ["shared", "secret"]}
+        docs = {
+            "shared": {"available": True, "tags": ["Fantasy"]},
+            "secret": {"available": True, "tags": ["Private Sale"]},
+        }
+        js_urls = []
+
+        def fake_get(session, url, **kwargs):
+            if url.endswith(".js"):
+                js_urls.append(url)
+                return _PageResponse(data=docs[product_handle(url)])
+            if "?page=1" in url:
+                name = url.split("/collections/")[1].split("?")[0]
+                return _PageResponse(_collection_html(collections.get(name, ["shared"])))
+            return _PageResponse(b"<ul></ul>")
+
+        cache = ProductCache()
+        with mock.patch.object(bb, "_get_with_retry", side_effect=fake_get), \
+                mock.patch.object(rate_limiter.time, "sleep"):
+            products = bb.broken_binding_checks(cache)
+
+        self.assertEqual(sorted(js_urls), [
+            "https://thebrokenbindingsub.com/products/secret.js",
+            "https://thebrokenbindingsub.com/products/shared.js",
+        ])
+        self.assertEqual(len(products), 4)
+        self.assertEqual(cache.hits, 3)
+
+        with mock.patch.object(bb, "_get_with_retry") as no_http:
+            report = private_sale_report(cache)
+        no_http.assert_not_called()
+        self.assertEqual(len(report), 5)
+        self.assertEqual(
+            [r["url"] for r in report if r["private_sale"]],
+            ["https://thebrokenbindingsub.com/products/secret"],
+        )
 
 
 if __name__ == "__main__":
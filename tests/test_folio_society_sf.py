@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+import requests
+from bs4 import BeautifulSoup
+
+import scrapers.folio_society_sf as folio
+from scrapers.folio_society_sf import extract_product_details, fetch_product_details
+
+
+class _PageResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+_JSON_LD_PAGE = b"""
+<html><head>
+<script type="application/ld+json">
+{"@context": "https://schema.org", "@graph": [
+  {"@type": "BreadcrumbList"},
+  {"@type": "Product", "name": "Dune", "author": {"@type": "Person", "name": "Frank Herbert"},
+   "gtin13": "978-0-441-17271-9", "image": ["//cdn.folio/dune.jpg"]}
+]}
+</script>
+</head><body></body></html>
+"""
+
+_TABLE_PAGE = b"""
+<html><head><meta property="og:image" content="https://cdn.folio/hobbit.jpg"></head>
+<body><table>
+  <tr><th>Author</th><td>J. R. R. Tolkien</td></tr>
+  <tr><th>ISBN:</th><td>9780261102217</td></tr>
+</table></body></html>
+"""
+
+
+class TestExtractProductDetails(unittest.TestCase):
+
+    def test_json_ld_product(self):
+        details = extract_product_details(BeautifulSoup(_JSON_LD_PAGE, "html.parser"))
+        self.assertEqual(details, {
+            "author": "Frank Herbert",
+            "isbn": "9780441172719",
+            "cover_url": "https://cdn.folio/dune.jpg",
+        })
+
+    def test_attributes_table_and_og_image(self):
+        details = extract_product_details(BeautifulSoup(_TABLE_PAGE, "html.parser"))
+        self.assertEqual(details, {
+            "author": "J. R. R. Tolkien",
+            "isbn": "9780261102217",
+            "cover_url": "https://cdn.folio/hobbit.jpg",
+        })
+
+    def test_missing_everything(self):
+        details = extract_product_details(BeautifulSoup(b"<html></html>", "html.parser"))
+        self.assertEqual(details, {"author": None, "isbn": None, "cover_url": None})
+
+
+class TestFetchProductDetails(unittest.TestCase):
+
+    def setUp(self):
+        folio._detail_cache.clear()
+        self.addCleanup(folio._detail_cache.clear)
+
+    def test_fetches_once_then_serves_from_cache(self):
+        pages = {"https://f/dune": _JSON_LD_PAGE, "https://f/hobbit": _TABLE_PAGE}
+        fetched = []
+
+        def fake_get(session, url, **kwargs):
+            fetched.append(url)
+            if url not in pages:
+                raise requests.HTTPError("404")
+            return _PageResponse(pages[url])
+
+        with mock.patch.object(folio, "_get_with_retry", side_effect=fake_get):
+            first = fetch_product_details(["https://f/dune", "https://f/hobbit", "https://f/gone"])
+            second = fetch_product_details(["https://f/dune", "https://f/gone"])
+
+        self.assertEqual(set(first), {"https://f/dune", "https://f/hobbit"})
+        self.assertEqual(first["https://f/hobbit"]["author"], "J. R. R. Tolkien")
+        self.assertEqual(second, {"https://f/dune": first["https://f/dune"]})
+        # Failures aren't cached, so the missing page is retried on the next call.
+        self.assertEqual(sorted(fetched), sorted([
+            "https://f/dune", "https://f/hobbit", "https://f/gone", "https://f/gone",
+        ]))
+
+
+if __name__ == "__main__":
+    unittest.main()
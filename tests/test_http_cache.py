@@ -0,0 +1,99 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import requests
+from requests.adapters import BaseAdapter
+
+from http_cache import CachedSession, HostLimitAdapter
+
+
+class _FakeAdapter(BaseAdapter):
+    def __init__(self, status=200, body=b'{"ok": true}'):
+        super().__init__()
+        self.status = status
+        self.body = body
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        resp = requests.Response()
+        resp.status_code = self.status
+        resp._content = self.body
+        resp.headers["Content-Type"] = "application/json"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
+
+
+class TestCachedSession(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _session(self, adapter, **kwargs):
+        session = CachedSession(self.tmp.name, **kwargs)
+        session.mount("https://", adapter)
+        return session
+
+    def test_repeat_get_served_from_disk(self):
+        adapter = _FakeAdapter()
+        first = self._session(adapter).get("https://example.com/p.json", params={"a": 1})
+        second = self._session(adapter).get("https://example.com/p.json", params={"a": 1})
+
+        self.assertEqual(adapter.calls, 1)
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.json(), {"ok": True})
+
+    def test_errors_and_expired_entries_are_refetched(self):
+        failing = _FakeAdapter(status=429)
+        session = self._session(failing)
+        session.get("https://example.com/x")
+        session.get("https://example.com/x")
+        self.assertEqual(failing.calls, 2)
+
+        adapter = _FakeAdapter()
+        session = self._session(adapter, ttl_seconds=0)
+        session.get("https://example.com/y")
+        time.sleep(0.01)
+        session.get("https://example.com/y")
+        self.assertEqual(adapter.calls, 2)
+
+
+class TestHostLimitAdapter(unittest.TestCase):
+
+    def test_bounds_in_flight_requests(self):
+        adapter = HostLimitAdapter(2)
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def fake_send(request, **kwargs):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+        threads = []
+        with patch("requests.adapters.HTTPAdapter.send", lambda self, r, **kw: fake_send(r)):
+            for _ in range(6):
+                t = threading.Thread(target=adapter.send, args=(None,))
+                t.start()
+                threads.append(t)
+            for t in threads:
+                t.join()
+        self.assertEqual(peak, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
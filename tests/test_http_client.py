@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+
+import httpx
+import requests
+
+import http_client
+from http_client import Http2Session, open_session
+
+
+@unittest.skipIf(http_client.httpx is None, "httpx/h2 not installed")
+class TestHttp2Session(unittest.TestCase):
+
+    def _session(self, handler):
+        session = Http2Session(transport=httpx.MockTransport(handler))
+        self.addCleanup(session.close)
+        return session
+
+    def test_get_returns_requests_response(self):
+        seen = {}
+
+        def handler(request):
+            seen["url"] = str(request.url)
+            seen["headers"] = request.headers
+            return httpx.Response(429, headers={"Retry-After": "3"}, json={"ok": False})
+
+        session = self._session(handler)
+        session.headers.update({"User-Agent": "bot"})
+        resp = session.get("https://shop.example/p.js", params={"page": 2}, timeout=5)
+
+        self.assertIsInstance(resp, requests.Response)
+        self.assertEqual(seen["url"], "https://shop.example/p.js?page=2")
+        self.assertEqual(seen["headers"]["user-agent"], "bot")
+        self.assertEqual(resp.headers["retry-after"], "3")
+        self.assertEqual(resp.json(), {"ok": False})
+        with self.assertRaises(requests.HTTPError):
+            resp.raise_for_status()
+
+    def test_transport_errors_raise_requests_exceptions(self):
+        def timeout(request):
+            raise httpx.ReadTimeout("slow", request=request)
+
+        def refused(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        with self.assertRaises(requests.Timeout):
+            self._session(timeout).get("https://shop.example/")
+        with self.assertRaises(requests.ConnectionError):
+            self._session(refused).get("https://shop.example/")
+
+
+class TestOpenSession(unittest.TestCase):
+
+    def test_defaults_to_requests(self):
+        with mock.patch.dict("os.environ", {}, clear=True):
+            with open_session({"User-Agent": "bot"}) as session:
+                self.assertIsInstance(session, requests.Session)
+                self.assertEqual(session.headers["User-Agent"], "bot")
+
+    def test_http2_falls_back_without_httpx(self):
+        with mock.patch.object(http_client, "httpx", None), \
+                mock.patch.dict("os.environ", {http_client.BACKEND_ENV: "http2"}):
+            with open_session() as session:
+                self.assertIsInstance(session, requests.Session)
+
+
+if __name__ == "__main__":
+    unittest.main()
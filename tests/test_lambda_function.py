@@ -1,8 +1,15 @@
 import json
+import threading
 import unittest
-from unittest.mock import patch, MagicMock
+from datetime import datetime, timedelta, timezone
+from unittest.mock import ANY, patch, MagicMock
 
 import lambda_function as lf
+from batch_writer import BatchResult
+from scrapers.registry import DEFAULT_SOURCES, SourceClaim, StoreSource
+
+_claim_store_sources = lf.claim_store_sources
+_release_store_sources = lf.release_store_sources
 
 
 class TestParsePriceCents(unittest.TestCase):
@@ -141,6 +148,182 @@ class TestLoadCatalogState(unittest.TestCase):
         self.assertEqual(items, [])
 
 
+class TestPersistBronze(unittest.TestCase):
+
+    @patch.object(lf, "fetch_item_ids_by_link")
+    @patch.object(lf, "write_rows")
+    @patch.object(lf, "get_supabase")
+    def test_ids_come_from_upsert_response(self, _mock_get_sb, mock_write, mock_fetch):
+        mock_write.return_value = BatchResult(
+            table="items_seen",
+            rows_written=2,
+            returned=[{"id": 1, "link": "https://a"}, {"id": 2, "link": "https://b"}],
+        )
+        items = [{"link": "https://a"}, {"link": "https://b"}]
+
+        result = lf.persist_bronze(items, "test-run-id")
+
+        self.assertEqual(result, {"https://a": 1, "https://b": 2})
+        self.assertEqual(mock_write.call_args[1]["returning"], "id, link")
+        mock_fetch.assert_not_called()
+
+    @patch.object(lf, "fetch_item_ids_by_link")
+    @patch.object(lf, "write_rows")
+    @patch.object(lf, "get_supabase")
+    def test_looks_up_only_links_missing_from_response(self, _mock_get_sb, mock_write, mock_fetch):
+        mock_write.return_value = BatchResult(
+            table="items_seen",
+            rows_written=1,
+            rows_failed=1,
+            returned=[{"id": 1, "link": "https://a"}],
+        )
+        mock_fetch.return_value = {"https://b": 2}
+
+        result = lf.persist_bronze([{"link": "https://a"}, {"link": "https://b"}], "test-run-id")
+
+        self.assertEqual(result, {"https://a": 1, "https://b": 2})
+        mock_fetch.assert_called_once_with(["https://b"], "test-run-id")
+
+
+class TestPersistBronzeChanges(unittest.TestCase):
+
+    @patch.object(lf, "touch_items_seen")
+    @patch.object(lf, "fetch_item_ids_by_link")
+    @patch.object(lf, "persist_bronze")
+    def test_upserts_only_changed_and_touches_rest(self, mock_persist, mock_fetch, mock_touch):
+        mock_persist.return_value = {"https://new": 3}
+        mock_fetch.return_value = {"https://nostate": 4}
+        items = [
+            {"link": "https://same", "name": "Same"},
+            {"link": "https://new", "name": "New"},
+            {"link": "https://nostate", "name": "No id in snapshot"},
+        ]
+        seen_by_link = {"https://same": {"id": 1, "name": "Same"}}
+
+        result = lf.persist_bronze_changes(items, {"https://new"}, seen_by_link, "test-run-id")
+
+        self.assertEqual(result, {"https://same": 1, "https://new": 3, "https://nostate": 4})
+        upserted = mock_persist.call_args[0][0]
+        self.assertEqual([r["link"] for r in upserted], ["https://new"])
+        self.assertIn("last_seen_at", upserted[0])
+        mock_fetch.assert_called_once_with(["https://nostate"], "test-run-id")
+        self.assertEqual(sorted(mock_touch.call_args[0][0]), [1, 4])
+
+
+class TestInsertDailySnapshots(unittest.TestCase):
+
+    ITEMS = [
+        {"link": "https://same", "store": "S", "in_stock": True, "price": "$10.00"},
+        {"link": "https://moved", "store": "S", "in_stock": False, "price": "$10.00"},
+        {"link": "https://new", "store": "S", "in_stock": True, "price": "$20.00"},
+    ]
+    LINK_TO_ID = {"https://same": 1, "https://moved": 2, "https://new": 3}
+    TODAY = {
+        1: {"in_stock": True, "price": "$10.00"},
+        2: {"in_stock": True, "price": "$10.00"},
+    }
+
+    @patch.object(lf, "load_today_snapshots")
+    @patch.object(lf, "write_rows")
+    @patch.object(lf, "get_supabase")
+    def test_sends_only_new_and_changed_items(self, _mock_get_sb, mock_write, mock_load):
+        mock_load.return_value = self.TODAY
+        mock_write.return_value = BatchResult(table="item_status_daily", rows_written=2)
+
+        lf.insert_daily_snapshots(self.ITEMS, self.LINK_TO_ID, "test-run-id")
+
+        mock_write.assert_called_once()
+        rows = mock_write.call_args[0][2]
+        self.assertEqual([r["item_id"] for r in rows], [2, 3])
+        self.assertTrue(all("snapshot_date" in r for r in rows))
+
+    @patch.object(lf, "load_today_snapshots")
+    @patch.object(lf, "write_rows")
+    @patch.object(lf, "get_supabase")
+    def test_no_write_when_nothing_changed(self, _mock_get_sb, mock_write, mock_load):
+        mock_load.return_value = {**self.TODAY, 2: {"in_stock": False, "price": "$10.00"},
+                                  3: {"in_stock": True, "price": "$20.00"}}
+
+        lf.insert_daily_snapshots(self.ITEMS, self.LINK_TO_ID, "test-run-id")
+
+        mock_write.assert_not_called()
+
+    @patch.object(lf, "load_today_snapshots")
+    @patch.object(lf, "write_rows")
+    @patch.object(lf, "get_supabase")
+    def test_records_intraday_transitions_when_enabled(self, _mock_get_sb, mock_write, mock_load):
+        mock_load.return_value = self.TODAY
+        mock_write.return_value = BatchResult(table="item_status_daily", rows_written=1)
+
+        with patch.object(lf, "record_intraday_transitions", True):
+            lf.insert_daily_snapshots(self.ITEMS, self.LINK_TO_ID, "test-run-id")
+
+        self.assertEqual(mock_write.call_count, 2)
+        self.assertEqual(mock_write.call_args_list[1][0][1], "item_status_intraday")
+        transitions = mock_write.call_args_list[1][0][2]
+        self.assertEqual([t["item_id"] for t in transitions], [2])
+        self.assertTrue(transitions[0]["old_in_stock"])
+
+    @patch.object(lf, "load_today_snapshots", return_value=None)
+    @patch.object(lf, "write_rows")
+    @patch.object(lf, "get_supabase")
+    def test_falls_back_to_full_upsert_when_load_fails(self, _mock_get_sb, mock_write, _mock_load):
+        mock_write.return_value = BatchResult(table="item_status_daily", rows_written=3)
+
+        lf.insert_daily_snapshots(self.ITEMS, self.LINK_TO_ID, "test-run-id")
+
+        self.assertEqual(len(mock_write.call_args[0][2]), 3)
+
+
+class _CollectionsDB:
+    """Supabase stand-in for collection claims only.
+
+    The claim RPC is atomic under a lock, as the row locks make it in
+    migration 031; every source here is on the every-run schedule, so only
+    the lease decides what is claimed.
+    """
+
+    def __init__(self, sources):
+        self.rows = {
+            s.collection_id: {"last_scraped_at": None, "scrape_lease_until": None} for s in sources
+        }
+        self._lock = threading.Lock()
+
+    def _claim(self, params):
+        now = datetime.now(timezone.utc)
+        claimed = []
+        with self._lock:
+            for collection_id in params["p_ids"]:
+                row = self.rows[collection_id]
+                if row["scrape_lease_until"] and row["scrape_lease_until"] > now:
+                    continue
+                claimed.append({"id": collection_id, "previous_scraped_at": row["last_scraped_at"]})
+                row.update(last_scraped_at=now, scrape_lease_until=now + timedelta(minutes=15))
+        return MagicMock(data=claimed)
+
+    def rpc(self, name, params):
+        call = MagicMock()
+        call.execute.side_effect = lambda: self._claim(params)
+        return call
+
+    def table(self, name):
+        db = self
+        query = MagicMock()
+
+        def update(values):
+            def in_(column, ids):
+                def execute():
+                    with db._lock:
+                        for collection_id in ids:
+                            db.rows[collection_id].update(values)
+                    return MagicMock(data=[])
+                return MagicMock(execute=execute)
+            return MagicMock(in_=in_)
+
+        query.update.side_effect = update
+        return query
+
+
 class TestCheckForUpdates(unittest.TestCase):
 
     def _patch_all(self, run_mode="prod"):
@@ -160,18 +343,25 @@ class TestCheckForUpdates(unittest.TestCase):
             "persist_bronze": patch.object(lf, "persist_bronze"),
             "persist_silver_catalog": patch.object(lf, "persist_silver_catalog"),
             "fetch_item_ids_by_link": patch.object(lf, "fetch_item_ids_by_link"),
+            "touch_items_seen": patch.object(lf, "touch_items_seen"),
+            "refresh_gold_analytics": patch.object(lf, "refresh_gold_analytics"),
             "insert_events": patch.object(lf, "insert_events"),
             "insert_email_log": patch.object(lf, "insert_email_log"),
             "insert_email_log_events": patch.object(lf, "insert_email_log_events"),
             "insert_run_log": patch.object(lf, "insert_run_log"),
             "update_run_log": patch.object(lf, "update_run_log"),
             "insert_daily_snapshots": patch.object(lf, "insert_daily_snapshots"),
+            "fetch_folio_details": patch.object(lf, "fetch_folio_details"),
+            "lookup_author": patch.object(lf, "lookup_author"),
+            "load_store_sources": patch.object(lf, "load_store_sources"),
+            "claim_store_sources": patch.object(lf, "claim_store_sources"),
+            "release_store_sources": patch.object(lf, "release_store_sources"),
         }
         store_checks_patcher = patch.dict(
             lf.STORE_CHECKS,
             {
-                "Broken Binding": MagicMock(name="broken_binding_checks_mock"),
-                "Folio Society - Sci-Fi & Fantasy": MagicMock(name="folio_society_checks_mock"),
+                "broken_binding": MagicMock(name="broken_binding_checks_mock"),
+                "folio_society": MagicMock(name="folio_society_checks_mock"),
             },
             clear=True,
         )
@@ -184,15 +374,19 @@ class TestCheckForUpdates(unittest.TestCase):
         mocks["store_checks"] = lf.STORE_CHECKS
         # Backward compatibility for existing tests that set
         # m["broken_binding_checks"].return_value.
-        mocks["broken_binding_checks"] = mocks["store_checks"]["Broken Binding"]
+        mocks["broken_binding_checks"] = mocks["store_checks"]["broken_binding"]
         mocks["insert_events"].return_value = []
         mocks["insert_email_log"].return_value = []
         mocks["get_store_preferences_for_users"].return_value = {}
         mocks["get_event_preferences_for_users"].return_value = {}
         mocks["get_watchlist_for_users"].return_value = {}
         mocks["fetch_edition_ids_by_link"].return_value = {}
-        mocks["store_checks"]["Broken Binding"].return_value = []
-        mocks["store_checks"]["Folio Society - Sci-Fi & Fantasy"].return_value = []
+        mocks["fetch_folio_details"].return_value = {}
+        mocks["lookup_author"].return_value = None
+        mocks["load_store_sources"].return_value = list(DEFAULT_SOURCES)
+        mocks["claim_store_sources"].side_effect = lambda sources, run_id, **kw: SourceClaim(list(sources))
+        mocks["store_checks"]["broken_binding"].return_value = []
+        mocks["store_checks"]["folio_society"].return_value = []
 
         def persist_side_effect(items, run_id):
             links = [item["link"] for item in items if item.get("link")]
@@ -261,9 +455,71 @@ class TestCheckForUpdates(unittest.TestCase):
 
         m["send_email"].assert_not_called()
         m["persist_bronze"].assert_called_once()
+        self.assertEqual(m["persist_bronze"].call_args[0][0], [])
+        m["touch_items_seen"].assert_called_once()
         m["persist_silver_catalog"].assert_called_once()
         m["insert_daily_snapshots"].assert_called_once()
 
+    def test_author_only_change_is_upserted_without_event(self):
+        m = self._patch_all()
+        m["get_recipients_for_run"].return_value = [self._recip("a@test.com")]
+        m["load_catalog_state"].return_value = [
+            {"id": 1, "name": "Dune", "price": "$10", "store": "UK", "link": "https://dune",
+             "in_stock": True, "author": None},
+            {"id": 2, "name": "Same", "price": "$10", "store": "UK", "link": "https://same",
+             "in_stock": True, "author": "A"},
+        ]
+        m["broken_binding_checks"].return_value = [
+            {"name": "Dune", "price": "$10", "store": "UK", "link": "https://dune",
+             "in_stock": True, "author": "Frank Herbert"},
+            {"name": "Same", "price": "$10", "store": "UK", "link": "https://same",
+             "in_stock": True, "author": "A"},
+        ]
+        m["fetch_item_ids_by_link"].return_value = {"https://dune": 1}
+
+        lf.check_for_updates()
+
+        upserted = m["persist_bronze"].call_args[0][0]
+        self.assertEqual([i["link"] for i in upserted], ["https://dune"])
+        self.assertEqual(upserted[0]["author"], "Frank Herbert")
+        self.assertEqual(m["insert_events"].call_args[0][0], [])
+        m["send_email"].assert_not_called()
+
+    def test_folio_details_fetched_for_new_and_changed_links_only(self):
+        m = self._patch_all()
+        folio = "Folio Society - Sci-Fi & Fantasy"
+        m["load_catalog_state"].return_value = [
+            {"name": "Same", "price": "$10", "store": folio, "link": "https://f/same", "in_stock": True},
+            {"name": "Moved", "price": "$10", "store": folio, "link": "https://f/moved", "in_stock": True},
+        ]
+        m["store_checks"]["folio_society"].return_value = [
+            {"name": "Same", "price": "$10", "store": folio, "link": "https://f/same", "in_stock": True, "author": None},
+            {"name": "Moved", "price": "$12", "store": folio, "link": "https://f/moved", "in_stock": True, "author": None},
+            {"name": "Dune", "price": "$90", "store": folio, "link": "https://f/dune", "in_stock": True, "author": None},
+        ]
+        m["broken_binding_checks"].return_value = [
+            {"name": "BB", "price": "$5", "store": "UK", "link": "https://bb", "in_stock": True,
+             "author": "A", "isbn": "9780000000001", "cover_url": "https://c/bb.jpg"},
+        ]
+        m["fetch_folio_details"].return_value = {
+            "https://f/dune": {"author": "Frank Herbert", "isbn": "9780441172719", "cover_url": "https://c/dune.jpg"},
+        }
+        m["fetch_item_ids_by_link"].return_value = {}
+
+        lf.check_for_updates()
+
+        self.assertEqual(
+            sorted(m["fetch_folio_details"].call_args[0][0]), ["https://f/dune", "https://f/moved"]
+        )
+        m["lookup_author"].assert_not_called()
+        bronze_items = {i["link"]: i for i in m["persist_bronze"].call_args[0][0]}
+        self.assertEqual(bronze_items["https://f/dune"]["author"], "Frank Herbert")
+        self.assertNotIn("isbn", bronze_items["https://f/dune"])
+
+        media_by_link = m["persist_silver_catalog"].call_args[0][3]
+        self.assertEqual(media_by_link["https://f/dune"]["isbn"], "9780441172719")
+        self.assertEqual(media_by_link["https://bb"]["cover_url"], "https://c/bb.jpg")
+
     def test_price_change_includes_store_and_in_stock(self):
         m = self._patch_all()
         m["get_recipients_for_run"].return_value = [self._recip("a@test.com")]
@@ -437,10 +693,11 @@ class TestCheckForUpdates(unittest.TestCase):
         m["send_email"].side_effect = lambda *a, **k: call_order.append("email") or "msg-1"
         m["persist_silver_catalog"].side_effect = lambda *a, **k: call_order.append("silver")
         m["insert_daily_snapshots"].side_effect = lambda *a, **k: call_order.append("snapshots")
+        m["refresh_gold_analytics"].side_effect = lambda *a, **k: call_order.append("gold")
 
         lf.check_for_updates()
 
-        self.assertEqual(call_order, ["email", "silver", "snapshots"])
+        self.assertEqual(call_order, ["email", "silver", "snapshots", "gold"])
 
     def test_daily_snapshots_called_with_all_items(self):
         m = self._patch_all()
@@ -624,11 +881,156 @@ class TestCheckForUpdates(unittest.TestCase):
         m["persist_silver_catalog"].assert_not_called()
         m["insert_events"].assert_not_called()
         m["insert_daily_snapshots"].assert_not_called()
+        m["refresh_gold_analytics"].assert_not_called()
         m["insert_email_log"].assert_not_called()
         m["insert_email_log_events"].assert_not_called()
         m["insert_run_log"].assert_not_called()
         m["update_run_log"].assert_not_called()
 
+    def _sources(self, interval_minutes, minutes_ago):
+        """Default sources with the Graveyard and Folio on an interval, last scraped `minutes_ago`."""
+        last = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+        return [
+            StoreSource(s.store_name, s.scraper, s.scrape_url, s.priority, interval_minutes, last, i)
+            if s.store_name in {"Broken Binding - The Graveyard", lf.FOLIO_STORE_NAME}
+            else StoreSource(s.store_name, s.scraper, s.scrape_url, s.priority, collection_id=i)
+            for i, s in enumerate(DEFAULT_SOURCES)
+        ]
+
+    def test_only_due_collections_are_scraped(self):
+        m = self._patch_all()
+        m["load_store_sources"].return_value = self._sources(interval_minutes=60, minutes_ago=10)
+        m["broken_binding_checks"].return_value = [
+            {"name": "Book", "price": "$10", "store": "Broken Binding - To The Stars",
+             "link": "https://x", "in_stock": True},
+        ]
+        m["fetch_item_ids_by_link"].return_value = {"https://x": 1}
+
+        lf.check_for_updates()
+
+        stores = [t["store"] for t in m["broken_binding_checks"].call_args[1]["collections"]]
+        self.assertEqual(stores, [
+            "Broken Binding - To The Stars",
+            "Broken Binding - The Infirmary",
+            "Broken Binding - Dragon's Hoard",
+        ])
+        m["store_checks"]["folio_society"].assert_not_called()
+        claimed = m["claim_store_sources"].call_args[0][0]
+        self.assertEqual([s.store_name for s in claimed], stores)
+        claim = m["release_store_sources"].call_args[0][0]
+        self.assertTrue(claim.items_written)
+
+    def test_nothing_due_skips_run(self):
+        m = self._patch_all()
+        m["load_store_sources"].return_value = [
+            s for s in self._sources(interval_minutes=60, minutes_ago=10) if s.interval_minutes
+        ]
+
+        lf.check_for_updates()
+
+        m["broken_binding_checks"].assert_not_called()
+        m["store_checks"]["folio_society"].assert_not_called()
+        m["insert_run_log"].assert_not_called()
+        m["update_run_log"].assert_not_called()
+        m["claim_store_sources"].assert_not_called()
+
+    def test_store_filter_forces_scrape_of_collection_not_due(self):
+        m = self._patch_all()
+        m["load_store_sources"].return_value = self._sources(interval_minutes=60, minutes_ago=10)
+
+        lf.check_for_updates(store_filter=lf.FOLIO_STORE_NAME)
+
+        m["broken_binding_checks"].assert_not_called()
+        folio_targets = m["store_checks"]["folio_society"].call_args[1]["collections"]
+        self.assertEqual([t["store"] for t in folio_targets], [lf.FOLIO_STORE_NAME])
+        with self.assertRaises(ValueError):
+            lf.check_for_updates(store_filter="Nope")
+
+    def test_partial_run_keeps_membership_of_unscraped_collection(self):
+        m = self._patch_all()
+        sources = self._sources(interval_minutes=60, minutes_ago=10)
+        # To The Stars (highest precedence) isn't due this run.
+        sources[0] = StoreSource(
+            sources[0].store_name, "broken_binding", sources[0].scrape_url, 0, 60,
+            datetime.now(timezone.utc), 0,
+        )
+        m["load_store_sources"].return_value = sources
+        m["load_catalog_state"].return_value = [
+            {"name": "Book", "price": "$10", "store": "Broken Binding - To The Stars",
+             "link": "https://x", "in_stock": True},
+        ]
+        m["broken_binding_checks"].return_value = [
+            {"name": "Book", "price": "$10", "store": "Broken Binding - The Infirmary",
+             "link": "https://x", "in_stock": True},
+        ]
+        m["fetch_item_ids_by_link"].return_value = {"https://x": 1}
+
+        lf.check_for_updates()
+
+        m["insert_events"].assert_called_once_with([], ANY)
+        self.assertEqual(m["persist_bronze"].call_args[0][0], [])
+
+    def test_overlapping_runs_claim_each_collection_once(self):
+        m = self._patch_all()
+        sources = [
+            StoreSource(s.store_name, s.scraper, s.scrape_url, s.priority, collection_id=i + 1)
+            for i, s in enumerate(DEFAULT_SOURCES)
+        ]
+        db = _CollectionsDB(sources)
+        m["load_store_sources"].return_value = sources
+        m["claim_store_sources"].side_effect = _claim_store_sources
+        m["release_store_sources"].side_effect = _release_store_sources
+        get_sb = patch.object(lf, "get_supabase", return_value=db)
+        get_sb.start()
+        self.addCleanup(get_sb.stop)
+
+        overlapping = threading.Thread(target=lf.check_for_updates)
+
+        def first_scrape(collections):
+            # A second invocation starts while the first is still scraping.
+            if not overlapping.is_alive() and overlapping.ident is None:
+                overlapping.start()
+                overlapping.join()
+            return [{"name": "Book", "price": "$10", "store": collections[0]["store"],
+                     "link": "https://x", "in_stock": True}]
+
+        m["broken_binding_checks"].side_effect = first_scrape
+        m["fetch_item_ids_by_link"].return_value = {"https://x": 1}
+        m["insert_events"].return_value = [{"id": 10, "item_id": 1, "event_type": "New Item"}]
+
+        lf.check_for_updates()
+
+        m["broken_binding_checks"].assert_called_once()
+        m["store_checks"]["folio_society"].assert_called_once()
+        m["insert_run_log"].assert_called_once()
+        m["insert_events"].assert_called_once()
+        # Released after the run, with last_scraped_at kept because items were written.
+        for row in db.rows.values():
+            self.assertIsNone(row["scrape_lease_until"])
+            self.assertIsNotNone(row["last_scraped_at"])
+
+    def test_claim_restored_when_run_writes_nothing(self):
+        m = self._patch_all()
+        sources = [
+            StoreSource(s.store_name, s.scraper, s.scrape_url, s.priority, collection_id=i + 1)
+            for i, s in enumerate(DEFAULT_SOURCES)
+        ]
+        db = _CollectionsDB(sources)
+        m["load_store_sources"].return_value = sources
+        m["claim_store_sources"].side_effect = _claim_store_sources
+        m["release_store_sources"].side_effect = _release_store_sources
+        get_sb = patch.object(lf, "get_supabase", return_value=db)
+        get_sb.start()
+        self.addCleanup(get_sb.stop)
+        m["broken_binding_checks"].side_effect = RuntimeError("scrape blew up")
+
+        with self.assertRaises(RuntimeError):
+            lf.check_for_updates()
+
+        for row in db.rows.values():
+            self.assertIsNone(row["scrape_lease_until"])
+            self.assertIsNone(row["last_scraped_at"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,149 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+import rate_limiter
+from rate_limiter import AdaptiveLimiter, get_with_retry, limiter_for
+
+
+class _Response:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            err = requests.HTTPError(f"{self.status_code} error")
+            err.response = self
+            raise err
+
+
+class _Session:
+    def __init__(self, responses):
+        self._responses = list(responses)
+        self.calls = []
+
+    def get(self, url, timeout=None, **kwargs):
+        self.calls.append((url, kwargs))
+        item = self._responses.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+
+    def _complete(self, limiter, status):
+        limiter.release(limiter.acquire(), status)
+
+    def test_fast_successes_grow_window_up_to_cap(self):
+        limiter = AdaptiveLimiter(max_concurrent=4)
+        for _ in range(50):
+            self._complete(limiter, 200)
+        self.assertEqual(limiter.limit, 4.0)
+
+    def test_throttle_halves_window_once_per_event(self):
+        limiter = AdaptiveLimiter(max_concurrent=8, initial=8)
+        first = limiter.acquire()
+        # Two requests in flight when the host starts refusing: one halving, not two.
+        acquired, done = threading.Event(), threading.Event()
+
+        def second():
+            started = limiter.acquire()
+            acquired.set()
+            done.wait()
+            limiter.release(started, 429)
+
+        t = threading.Thread(target=second)
+        t.start()
+        acquired.wait()
+        limiter.release(first, 429)
+        done.set()
+        t.join()
+        self.assertEqual(limiter.limit, 4.0)
+        self.assertEqual(limiter.throttled, 2)
+
+        self._complete(limiter, 503)
+        self.assertEqual(limiter.limit, 2.0)
+
+    def test_slow_response_counts_as_congestion(self):
+        limiter = AdaptiveLimiter(max_concurrent=4, initial=4, slow_seconds=0.0)
+        started = limiter.acquire()
+        time.sleep(0.01)
+        limiter.release(started, 200)
+        self.assertEqual(limiter.limit, 2.0)
+
+    def test_window_bounds_in_flight(self):
+        limiter = AdaptiveLimiter(max_concurrent=2, initial=2)
+        active = peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal active, peak
+            started = limiter.acquire()
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            limiter.release(started)
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(peak, 2)
+
+    def test_acquire_is_reentrant_per_thread(self):
+        limiter = AdaptiveLimiter(max_concurrent=1)
+        outer = limiter.acquire()
+        self.assertIsNone(limiter.acquire())
+        limiter.release(None)
+        self.assertEqual(limiter.in_flight, 1)
+        limiter.release(outer, 200)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_pause_holds_other_requests(self):
+        limiter = AdaptiveLimiter(max_concurrent=2, initial=2)
+        limiter.pause(0.05)
+        started = time.monotonic()
+        limiter.release(limiter.acquire(), 200)
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+
+class TestGetWithRetry(unittest.TestCase):
+
+    def setUp(self):
+        rate_limiter.reset_limiters()
+        self.addCleanup(rate_limiter.reset_limiters)
+
+    def test_retry_after_pauses_host_until_success(self):
+        session = _Session([_Response(429, {"Retry-After": "2"}), _Response(200)])
+        with mock.patch.object(rate_limiter.time, "sleep") as sleep:
+            get_with_retry(session, "https://shop.example/p.js", params={"a": 1})
+        sleep.assert_called_once_with(2.0)
+        self.assertEqual(session.calls[0], ("https://shop.example/p.js", {"params": {"a": 1}}))
+        limiter = limiter_for("https://shop.example/other")
+        self.assertEqual(limiter.blocked_until, 0.0)
+        self.assertEqual(limiter.throttled, 1)
+
+    def test_connection_errors_back_off_then_raise(self):
+        session = _Session([requests.ConnectionError("boom")] * 2)
+        with mock.patch.object(rate_limiter.time, "sleep") as sleep:
+            with self.assertRaises(requests.ConnectionError):
+                get_with_retry(session, "https://shop.example/p.js", max_retries=2)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(limiter_for("shop.example").in_flight, 0)
+
+    def test_limiters_are_per_host(self):
+        self.assertIs(limiter_for("https://a.example/x"), limiter_for("https://A.example/y"))
+        self.assertIsNot(limiter_for("https://a.example/x"), limiter_for("https://b.example/x"))
+
+
+if __name__ == "__main__":
+    unittest.main()
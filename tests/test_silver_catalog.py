@@ -1,6 +1,19 @@
+import re
 import unittest
+from unittest.mock import MagicMock
 
-from silver_catalog import _normalize_isbn, clean_title, normalize_title, normalize_url
+from silver_catalog import (
+    _CLEAN_TITLE_PATTERNS,
+    CatalogIndex,
+    _normalize_isbn,
+    clean_title,
+    ensure_work,
+    find_work_id,
+    iter_pages,
+    normalize_title,
+    normalize_url,
+    title_lookup_variants,
+)
 
 
 class TestSilverCatalog(unittest.TestCase):
@@ -22,6 +35,31 @@ class TestSilverCatalog(unittest.TestCase):
             "Sistah Samurai",
         )
 
+    def test_clean_title_matches_sequential_patterns(self):
+        def sequential(title):
+            for pattern in _CLEAN_TITLE_PATTERNS:
+                title = re.sub(pattern, "", title, flags=re.IGNORECASE)
+            return re.sub(r"\s+", " ", title).strip(" -;") or None
+
+        for title in (
+            "Dune",
+            "The Stand - Deluxe Edition with Slipcase - Leftover",
+            "Mistborn Box Set - Signed & Numbered",
+            "Red Rising; Books 1-3 - 2nd Printing",
+            "Lies of Locke Lamora - Slightly Damaged",
+            "The Stand - Deluxe Edition\nwith Slipcase",
+            "Dune - Unsigned\nMessiah - Leftover\nChildren of Dune",
+            "Mistborn\nBox Bundle - Signed; Books 1-3",
+        ):
+            with self.subTest(title=title):
+                self.assertEqual(clean_title(title), sequential(title))
+
+    def test_title_lookup_variants_returns_fresh_list(self):
+        variants = title_lookup_variants("Red Rising; Books 1-3 - 2nd Printing")
+        self.assertEqual(variants, ["Red Rising; Books 1-3 - 2nd Printing", "Red Rising"])
+        variants.append("mutated")
+        self.assertNotIn("mutated", title_lookup_variants("Red Rising; Books 1-3 - 2nd Printing"))
+
     def test_normalize_url(self):
         self.assertEqual(
             normalize_url("https://example.com/foo/?x=1"),
@@ -33,5 +71,99 @@ class TestSilverCatalog(unittest.TestCase):
         self.assertIsNone(_normalize_isbn(""))
 
 
+class TestFindWorkId(unittest.TestCase):
+
+    def test_resolves_all_variants_in_one_rpc(self):
+        sb = MagicMock()
+        sb.rpc.return_value.execute.return_value.data = [{"work_id": 7, "match_tier": 4, "score": 0.8}]
+
+        work_id = find_work_id(sb, "Sistah Samurai - TBB Press Edition", "Jane Author", fuzzy=True)
+
+        self.assertEqual(work_id, 7)
+        sb.rpc.assert_called_once()
+        name, params = sb.rpc.call_args[0]
+        self.assertEqual(name, "resolve_work_id")
+        self.assertEqual(params["p_titles"], ["sistah samurai tbb press edition", "sistah samurai"])
+        self.assertEqual(params["p_author"], "jane author")
+        self.assertEqual(params["p_min_similarity"], 0.6)
+        sb.table.assert_not_called()
+
+    def test_exact_only_by_default(self):
+        sb = MagicMock()
+        sb.rpc.return_value.execute.return_value.data = []
+
+        self.assertIsNone(find_work_id(sb, "Dune"))
+        self.assertIsNone(sb.rpc.call_args[0][1]["p_min_similarity"])
+
+    def test_ensure_work_never_accepts_fuzzy_match(self):
+        sb = MagicMock()
+        sb.rpc.return_value.execute.return_value.data = []
+        sb.table.return_value.insert.return_value.execute.return_value.data = [{"id": 11}]
+
+        self.assertEqual(ensure_work(sb, "Dune Messiah", "Frank Herbert"), 11)
+        self.assertIsNone(sb.rpc.call_args[0][1]["p_min_similarity"])
+
+    def test_falls_back_to_exact_probes_when_rpc_fails(self):
+        sb = MagicMock()
+        sb.rpc.return_value.execute.side_effect = Exception("function not found")
+        query = sb.table.return_value.select.return_value.eq.return_value.eq.return_value
+        query.limit.return_value.execute.return_value.data = [{"id": 3, "author": None}]
+
+        self.assertEqual(find_work_id(sb, "Dune"), 3)
+
+
+class TestIterPages(unittest.TestCase):
+
+    def test_pages_by_id_keyset(self):
+        sb = MagicMock()
+        query = sb.table.return_value.select.return_value.gt.return_value.order.return_value.limit.return_value
+        query.execute.side_effect = [
+            MagicMock(data=[{"id": 1}, {"id": 4}]),
+            MagicMock(data=[{"id": 9}]),
+        ]
+
+        pages = list(iter_pages(sb, "works", "id", page_size=2))
+
+        self.assertEqual(pages, [[{"id": 1}, {"id": 4}], [{"id": 9}]])
+        gt = sb.table.return_value.select.return_value.gt
+        self.assertEqual([c.args for c in gt.call_args_list], [("id", 0), ("id", 4)])
+
+
+class TestCatalogIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CatalogIndex(
+            works=[
+                {"id": 1, "title": "Dune", "author": "Frank Herbert",
+                 "normalized_title": "dune", "normalized_author": "frank herbert"},
+                {"id": 2, "title": "Dune", "author": None,
+                 "normalized_title": "dune", "normalized_author": None},
+                {"id": 3, "title": "Red Rising", "author": "Pierce Brown",
+                 "normalized_title": "red rising", "normalized_author": "pierce brown"},
+            ],
+            editions=[
+                {"id": 10, "work_id": 3, "publisher_id": 5, "normalized_title": "red rising",
+                 "edition_type": None},
+            ],
+        )
+
+    def test_work_tiers_follow_find_work_id(self):
+        self.assertEqual(self.index.find_work_id("Dune", "Frank Herbert"), 1)
+        self.assertEqual(self.index.find_work_id("Dune", "Someone Else"), 2)
+        self.assertEqual(self.index.find_work_id("Dune"), 1)
+        self.assertEqual(self.index.find_work_id("Red Rising; Books 1-3 - 2nd Printing"), 3)
+        self.assertIsNone(self.index.find_work_id("Golden Son"))
+
+    def test_added_rows_are_found(self):
+        self.index.add_work({"id": 4, "title": "Golden Son", "author": None,
+                             "normalized_title": "golden son", "normalized_author": None})
+        self.index.add_edition({"id": 11, "work_id": 4, "publisher_id": 5,
+                                "normalized_title": "golden son", "edition_type": None})
+        self.assertEqual(self.index.find_work_id("Golden Son", "Pierce Brown"), 4)
+        self.assertEqual(self.index.find_edition_id(5, "Golden Son"), 11)
+        self.assertEqual(self.index.find_edition_id(5, "Red Rising"), 10)
+        self.assertIsNone(self.index.find_edition_id(6, "Red Rising"))
+
+
 if __name__ == "__main__":
     unittest.main()
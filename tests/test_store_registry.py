@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from scrapers.registry import (
+    DEFAULT_SOURCES,
+    StoreSource,
+    due_sources,
+    source_from_row,
+    store_precedence,
+    targets_for,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class TestStoreSource(unittest.TestCase):
+
+    def test_is_due(self):
+        def source(interval, minutes_ago):
+            last = None if minutes_ago is None else NOW - timedelta(minutes=minutes_ago)
+            return StoreSource("S", "broken_binding", "https://s", interval_minutes=interval, last_scraped_at=last)
+
+        self.assertTrue(source(None, 0).is_due(NOW))
+        self.assertTrue(source(60, None).is_due(NOW))
+        self.assertFalse(source(60, 30).is_due(NOW))
+        self.assertTrue(source(60, 60).is_due(NOW))
+        # Within the slack of a 1-minute schedule tick.
+        self.assertTrue(source(5, 4.6).is_due(NOW))
+
+    def test_source_from_row(self):
+        source = source_from_row({
+            "id": 7,
+            "store_name": "Hot Drop",
+            "scraper": "broken_binding",
+            "scrape_url": "https://s/hot",
+            "scrape_priority": None,
+            "scrape_interval_minutes": 1,
+            "last_scraped_at": "2026-03-01T11:59:00+00:00",
+        })
+        self.assertEqual(source.priority, 100)
+        self.assertEqual(source.collection_id, 7)
+        self.assertEqual(source.last_scraped_at, NOW - timedelta(minutes=1))
+        self.assertIsNone(source_from_row({"store_name": "No URL", "scraper": "broken_binding"}))
+
+
+class TestRegistryHelpers(unittest.TestCase):
+
+    def test_defaults_keep_previous_precedence(self):
+        precedence = store_precedence(DEFAULT_SOURCES)
+        self.assertEqual(
+            sorted(precedence, key=precedence.get),
+            [
+                "Broken Binding - To The Stars",
+                "Broken Binding - The Infirmary",
+                "Broken Binding - Dragon's Hoard",
+                "Broken Binding - The Graveyard",
+                "Folio Society - Sci-Fi & Fantasy",
+            ],
+        )
+
+    def test_due_sources_and_targets_in_priority_order(self):
+        sources = [
+            StoreSource("Slow", "broken_binding", "https://s/slow", priority=5, interval_minutes=60,
+                        last_scraped_at=NOW - timedelta(minutes=5)),
+            StoreSource("B", "broken_binding", "https://s/b", priority=2),
+            StoreSource("A", "broken_binding", "https://s/a", priority=1),
+            StoreSource("F", "folio_society", "https://f", priority=0),
+        ]
+        due = due_sources(sources, NOW)
+        self.assertEqual([s.store_name for s in due], ["F", "A", "B"])
+        self.assertEqual(
+            targets_for(due, "broken_binding"),
+            [{"url": "https://s/a", "store": "A"}, {"url": "https://s/b", "store": "B"}],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
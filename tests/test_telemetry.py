@@ -0,0 +1,79 @@
+import unittest
+
+import httpx
+import requests
+
+import telemetry
+
+
+class _FakeResponse:
+    def __init__(self, content=b"", headers=None):
+        self.content = content
+        self.headers = headers or {}
+
+
+class TestRunTelemetry(unittest.TestCase):
+
+    def tearDown(self):
+        telemetry._active = None
+
+    def test_requests_attributed_to_innermost_stage(self):
+        tel = telemetry.start_run("run-1")
+        with telemetry.stage("notify"):
+            tel.record("db", 10)
+            with telemetry.stage("notify.preferences"):
+                tel.record("db", 5)
+                tel.record("http", 100)
+        tel.record("db", 1)
+
+        summary = telemetry.finish_run("run-1")
+
+        self.assertEqual(summary["stages"]["notify"]["db_requests"], 1)
+        self.assertEqual(summary["stages"]["notify.preferences"]["db_bytes"], 5)
+        self.assertEqual(summary["stages"]["notify.preferences"]["http_bytes"], 100)
+        self.assertEqual(summary["stages"]["other"]["db_requests"], 1)
+        self.assertEqual(summary["totals"]["db_requests"], 3)
+        self.assertEqual(summary["totals"]["http_requests"], 1)
+
+    def test_stage_is_noop_without_active_run(self):
+        with telemetry.stage("scrape"):
+            pass
+        self.assertIsNone(telemetry.finish_run("run-1"))
+
+    def test_timed_decorator_counts_calls(self):
+        @telemetry.timed("work")
+        def work():
+            return 42
+
+        telemetry.start_run("run-2")
+        self.assertEqual(work(), 42)
+        work()
+        summary = telemetry.finish_run("run-2")
+        self.assertEqual(summary["stages"]["work"]["calls"], 2)
+
+    def test_finish_run_ignores_other_run_ids(self):
+        telemetry.start_run("run-3")
+        self.assertIsNone(telemetry.finish_run("other"))
+        self.assertIsNotNone(telemetry.finish_run("run-3"))
+
+    def test_hooks_count_http_and_db_responses(self):
+        telemetry.start_run("run-4")
+        orig_requests, orig_httpx = telemetry._orig_requests_send, telemetry._orig_httpx_send
+        try:
+            telemetry._orig_requests_send = lambda *a, **k: _FakeResponse(b"x" * 7)
+            telemetry._orig_httpx_send = lambda *a, **k: _FakeResponse(b"[]")
+            with telemetry.stage("scrape"):
+                requests.Session.send(None, None)
+                httpx.Client.send(None, None)
+                requests.Session.send(None, None, stream=True)
+        finally:
+            telemetry._orig_requests_send, telemetry._orig_httpx_send = orig_requests, orig_httpx
+        counters = telemetry.finish_run("run-4")["stages"]["scrape"]
+        self.assertEqual(counters["http_requests"], 2)
+        self.assertEqual(counters["http_bytes"], 7)
+        self.assertEqual(counters["db_requests"], 1)
+        self.assertEqual(counters["db_bytes"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import patch
+
+import unsubscribe
+from unsubscribe import make_token, unsubscribe_footer_html, unsubscribe_url, verify_token
+
+SECRET = "test-secret"
+NOW = 1_700_000_000
+
+
+class TestUnsubscribeTokens(unittest.TestCase):
+    def test_round_trip(self):
+        token = make_token("user-1", "announcements", secret=SECRET, ttl_seconds=60, now=NOW)
+        claims = verify_token(token, secret=SECRET, now=NOW + 30)
+        self.assertEqual(claims, {"user_id": "user-1", "scope": "announcements", "expires": NOW + 60})
+
+    def test_rejects_tampered_payload(self):
+        token = make_token("user-1", secret=SECRET, now=NOW)
+        other = make_token("user-2", secret=SECRET, now=NOW)
+        forged = f"{other.split('.')[0]}.{token.split('.')[1]}"
+        self.assertIsNone(verify_token(forged, secret=SECRET, now=NOW))
+
+    def test_rejects_wrong_secret_and_expired(self):
+        token = make_token("user-1", secret=SECRET, ttl_seconds=60, now=NOW)
+        self.assertIsNone(verify_token(token, secret="other", now=NOW))
+        self.assertIsNone(verify_token(token, secret=SECRET, now=NOW + 61))
+
+    def test_rejects_malformed(self):
+        for token in ("", "abc", "a.b.c", "not-base64!.sig"):
+            self.assertIsNone(verify_token(token, secret=SECRET, now=NOW))
+
+    def test_unknown_scope(self):
+        with self.assertRaises(ValueError):
+            make_token("user-1", "everything", secret=SECRET)
+
+    def test_footer_empty_without_secret(self):
+        with patch.object(unsubscribe, "UNSUBSCRIBE_SIGNING_SECRET", None):
+            self.assertIsNone(unsubscribe_url("user-1"))
+            self.assertEqual(unsubscribe_footer_html("user-1"), "")
+        with patch.object(unsubscribe, "UNSUBSCRIBE_SIGNING_SECRET", SECRET):
+            self.assertIn("unsubscribe=true&token=", unsubscribe_footer_html("user-1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Stateless, HMAC-signed unsubscribe tokens.
+
+A token is `<payload>.<signature>`, both base64url without padding. The payload
+is compact JSON {"u": user_id, "s": scope, "e": expiry (unix seconds)} and the
+signature is HMAC-SHA256 over the encoded payload with UNSUBSCRIBE_SIGNING_SECRET.
+Tokens are verified and applied by the `unsubscribe` Edge Function
+(supabase/functions/unsubscribe), so building a link costs no network call.
+
+Scopes: "alerts" pauses all stock alerts, "announcements" stops announcements.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+UNSUBSCRIBE_SIGNING_SECRET = os.getenv("UNSUBSCRIBE_SIGNING_SECRET")
+UNSUBSCRIBE_TOKEN_TTL_DAYS = int(os.getenv("UNSUBSCRIBE_TOKEN_TTL_DAYS", "90"))
+PREFERENCES_URL = "https://sffstock.com/preferences"
+
+SCOPES = ("alerts", "announcements")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str, secret: str) -> str:
+    return _b64encode(hmac.new(secret.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def make_token(
+    user_id: str,
+    scope: str = "alerts",
+    *,
+    secret: str | None = None,
+    ttl_seconds: int | None = None,
+    now: float | None = None,
+) -> str:
+    if scope not in SCOPES:
+        raise ValueError(f"unknown unsubscribe scope: {scope}")
+    secret = secret or UNSUBSCRIBE_SIGNING_SECRET
+    if not secret:
+        raise ValueError("UNSUBSCRIBE_SIGNING_SECRET is not set")
+    if ttl_seconds is None:
+        ttl_seconds = UNSUBSCRIBE_TOKEN_TTL_DAYS * 86400
+    expires = int((now if now is not None else time.time()) + ttl_seconds)
+    payload = _b64encode(json.dumps({"u": str(user_id), "s": scope, "e": expires}, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload, secret)}"
+
+
+def verify_token(token: str, *, secret: str | None = None, now: float | None = None) -> dict | None:
+    """Return {"user_id", "scope", "expires"} for a valid, unexpired token, else None."""
+    secret = secret or UNSUBSCRIBE_SIGNING_SECRET
+    if not secret or not token or token.count(".") != 1:
+        return None
+    payload, signature = token.split(".")
+    if not hmac.compare_digest(signature, _sign(payload, secret)):
+        return None
+    try:
+        data = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if data.get("s") not in SCOPES or not data.get("u"):
+        return None
+    if int(data.get("e", 0)) < (now if now is not None else time.time()):
+        return None
+    return {"user_id": data["u"], "scope": data["s"], "expires": int(data["e"])}
+
+
+def unsubscribe_url(user_id: str, scope: str = "alerts") -> str | None:
+    """One-click unsubscribe link, or None when no signing secret is configured."""
+    if not UNSUBSCRIBE_SIGNING_SECRET:
+        return None
+    return f"{PREFERENCES_URL}?unsubscribe=true&token={make_token(user_id, scope)}"
+
+
+def unsubscribe_footer_html(user_id: str, scope: str = "alerts") -> str:
+    url = unsubscribe_url(user_id, scope)
+    if not url:
+        return ""
+    return (
+        '<p style="margin-top: 32px; font-size: 12px; color: #888;">'
+        f'Don\'t want these emails? <a href="{url}">Unsubscribe</a> or '
+        f'<a href="{PREFERENCES_URL}">manage your preferences</a>.</p>'
+    )